@@ -1,54 +1,530 @@
-from flask import Flask, request, redirect, url_for, render_template_string, make_response
+from flask import (Flask, request, redirect, url_for, make_response, jsonify, Response, stream_with_context,
+                   g, has_request_context)
+from markupsafe import Markup
 import sqlite3
-import requests
 import datetime
+import threading
+import time
+import queue
+import contextlib
+import atexit
+import base64
+import bisect
+import json
+import hashlib
+import os
+import random
+import cProfile
+import pstats
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from itertools import repeat
+
+from chart import HistoryColumns, parse_chart
+from colstore import ColumnStore, iso_to_epoch_day
+from compare import compare_series, reorder
+from indicators import INDICATOR_COLUMNS, IndicatorState
+from metrics import Registry
+from export import COMPRESSIONS, FORMATS, export_stream
+from singleflight import SingleFlight
+from upstream import YahooClient
+from scheduler import RefreshScheduler
+from writebehind import WriteBehindCounter
 
 app = Flask(__name__)
 DATABASE = 'stocks.db'
 
+# Segundos durante los que el histórico guardado se considera fresco.
+CACHE_TTL = 15 * 60
+# Si es True, los datos vencidos se sirven de inmediato y se refrescan en segundo plano.
+STALE_WHILE_REVALIDATE = True
+# Días ya guardados que se vuelven a pedir en cada actualización incremental,
+# para recoger correcciones tardías de Yahoo.
+DELTA_OVERLAP_DAYS = 2
+
+# Rangos aceptados en /company/<ticker>?range= y días de calendario que abarcan (None = todo).
+RANGE_DAYS = {
+    '1d': 1, '5d': 5, '1mo': 31, '3mo': 92, '6mo': 183,
+    '1y': 366, '2y': 731, '5y': 1827, '10y': 3653, 'max': None,
+}
+DEFAULT_RANGE = '1y'
+# Velas diarias guardadas en `history`; las semanales y mensuales se materializan a partir de ellas.
+DAILY_INTERVALS = ['1d', '1wk', '1mo']
+# Velas intradía, guardadas aparte en `history_intraday`.
+INTRADAY_INTERVALS = ['1m', '5m', '15m', '30m', '60m']
+# Intervalo por defecto de los rangos largos, para no enviar miles de filas diarias.
+DEFAULT_INTERVALS = {'5y': '1wk', '10y': '1mo', 'max': '1mo'}
+# Rango que se descarga (y máximo que se muestra) para cada intervalo intradía, según los límites de Yahoo.
+INTRADAY_RANGES = {'1m': '5d', '5m': '1mo', '15m': '1mo', '30m': '1mo', '60m': '1mo'}
+INTRADAY_TTL = 60
+INTRADAY_RETENTION_DAYS = 60
+# Expresión SQL del inicio del periodo de cada vela agregada.
+AGGREGATE_BUCKETS = {
+    '1wk': "date(date, 'weekday 0', '-6 days')",
+    '1mo': "strftime('%Y-%m-01', date)",
+}
+# Velas más recientes que quedan fuera del punto de control de los indicadores; deben
+# cubrir los días que una actualización incremental puede corregir.
+INDICATOR_CHECKPOINT_LAG = DELTA_OVERLAP_DAYS + 3
+
+# Cliente compartido para Yahoo Finance: timeouts (conexión, lectura) en segundos,
+# reintentos ante 429/5xx y tasa máxima de peticiones por segundo.
+yahoo = YahooClient(connect_timeout=3.05, read_timeout=10, retries=3, rate=5, burst=10)
+
+# Conexiones SQLite reutilizables que se mantienen abiertas entre peticiones.
+DB_POOL_SIZE = 8
+DB_PRAGMAS = (
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA cache_size=-16000",
+    "PRAGMA mmap_size=268435456",
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA busy_timeout=5000",
+)
+
+# Almacenamiento del que se lee el histórico diario (páginas y descarga de
+# /company/<ticker>, get_history_from_db y /compare): 'sqlite' (tabla history) o
+# 'columnar' (colstore.py en COLUMNAR_ROOT). La tabla se sigue escribiendo: es la
+# fuente de los agregados, los indicadores, /export y /screener. La copia columnar
+# de cada ticker se construye desde ella al leerla, guarda la versión de datos
+# (fetches.updated_at) de la que salió y se reconstruye si no coincide.
+HISTORY_BACKEND = 'sqlite'
+COLUMNAR_ROOT = 'colstore'
+colstore = ColumnStore(COLUMNAR_ROOT)
+
+# Registro de consultas: las visitas se acumulan en memoria y se escriben en lote
+# cada QUERY_LOG_FLUSH_INTERVAL segundos o al juntar QUERY_LOG_MAX_PENDING tickers.
+QUERY_LOG_FLUSH_INTERVAL = 2.0
+QUERY_LOG_MAX_PENDING = 100
+
+# Métricas expuestas en /metrics (formato de texto de Prometheus).
+metrics_registry = Registry()
+REQUEST_SECONDS = metrics_registry.histogram(
+    'finquery_request_seconds', 'Duración de las peticiones HTTP hasta entregar la respuesta.',
+    ('route', 'method', 'status'))
+STAGE_SECONDS = metrics_registry.histogram(
+    'finquery_stage_seconds', 'Duración de cada etapa (upstream, parse, save, query, render, compare).',
+    ('route', 'stage'))
+SQLITE_LOCK_WAIT_SECONDS = metrics_registry.histogram(
+    'finquery_sqlite_lock_wait_seconds', 'Espera hasta obtener el bloqueo de escritura de SQLite.',
+    ('route',), buckets=(0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0))
+CACHE_REQUESTS = metrics_registry.counter(
+    'finquery_cache_requests_total', 'Consultas a las cachés según su resultado.', ('cache', 'result'))
+ERRORS = metrics_registry.counter('finquery_errors_total', 'Errores según su tipo.', ('kind',))
+# Fracción de peticiones que se perfilan con cProfile (0 = desactivado) y carpeta donde
+# se guarda cada perfil (.prof para pstats/snakeviz y un resumen .txt).
+PROFILE_SAMPLE_RATE = 0.0
+PROFILE_DIR = 'profiles'
+
+# Actualización en segundo plano de los tickers del carrusel y de los más consultados.
+REFRESH_ENABLED = True
+REFRESH_WORKERS = 2
+REFRESH_QUEUE_SIZE = 32
+REFRESH_INTERVAL = 60
+# Máximo de descargas a Yahoo por minuto hechas por el planificador.
+REFRESH_BUDGET_PER_MINUTE = 20
+# Fracción de CACHE_TTL a partir de la cual un ticker se refresca por adelantado.
+REFRESH_AHEAD = 0.8
+
+COMPANIES = [
+    {"name": "Apple Inc.", "ticker": "AAPL", "image": "apple.png"},
+    {"name": "Alphabet Inc.", "ticker": "GOOGL", "image": "google.png"},
+    {"name": "Microsoft Corp.", "ticker": "MSFT", "image": "microsoft.png"},
+    {"name": "Amazon.com Inc.", "ticker": "AMZN", "image": "amazon.png"},
+    {"name": "Meta Platforms Inc.", "ticker": "META", "image": "facebook.png"},
+    {"name": "Tesla Inc.", "ticker": "TSLA", "image": "tesla.png"},
+    {"name": "Netflix Inc.", "ticker": "NFLX", "image": "netflix.png"},
+    {"name": "NVIDIA Corp.", "ticker": "NVDA", "image": "nvidia.png"},
+    {"name": "Intel Corp.", "ticker": "INTC", "image": "intel.png"},
+    {"name": "Adobe Inc.", "ticker": "ADBE", "image": "adobe.png"}
+]
+
+# Max-age para archivos estáticos pedidos con huella (?v=<hash>); su URL cambia con el contenido.
+STATIC_MAX_AGE = 365 * 24 * 3600
+
+# Columnas por las que se puede ordenar el histórico; cada una tiene su índice.
+SORT_COLUMNS = ['date', 'open', 'high', 'low', 'close', 'adj_close', 'volume']
+# Filas por página en /company/<ticker> (modificable con ?limit=).
+PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+# Filas leídas por bloque y tamaño aproximado (caracteres) de cada bloque enviado al descargar.
+STREAM_FETCH_SIZE = 500
+STREAM_CHUNK_SIZE = 64 * 1024
+# /compare: máximo de tickers por comparación, descargas simultáneas y comparaciones cacheadas.
+# Con un hilo por ticker una comparación descarga todos sus tickers a la vez; el ritmo
+# de peticiones a Yahoo lo limita yahoo.limiter.
+MAX_COMPARE_TICKERS = 10
+COMPARE_WORKERS = MAX_COMPARE_TICKERS
+COMPARE_CACHE_SIZE = 64
+# Resumen por ticker (tabla ticker_summary) que consulta /screener: días de calendario
+# del máximo y mínimo de 52 semanas, sesiones del volumen medio y ventanas de rentabilidad.
+SUMMARY_HIGH_LOW_DAYS = 365
+SUMMARY_AVG_VOLUME_SESSIONS = 63
+SUMMARY_RETURN_WINDOWS = {'1w': 7, '1mo': 31, '3mo': 92, '6mo': 183, '1y': 366}
+SUMMARY_COLUMNS = ['date', 'close', 'prev_close', 'change_pct', 'volume', 'avg_volume', 'rel_volume',
+                   'high_52w', 'low_52w', 'from_high', 'from_low'] + [f'return_{w}' for w in SUMMARY_RETURN_WINDOWS]
+# Columnas por las que /screener filtra (min_<columna>, max_<columna>) y ordena; todas tienen índice.
+SCREENER_COLUMNS = [column for column in SUMMARY_COLUMNS if column not in ('date', 'prev_close')]
+SCREENER_PAGE_SIZE = 50
+MAX_SCREENER_PAGE_SIZE = 500
+# Consultas predefinidas de /screener?preset=: (filtros, columna de orden, orden).
+SCREENER_PRESETS = {
+    'gainers': ({}, 'change_pct', 'DESC'),
+    'losers': ({}, 'change_pct', 'ASC'),
+    'most_active': ({}, 'volume', 'DESC'),
+    'unusual_volume': ({'min_avg_volume': 100_000}, 'rel_volume', 'DESC'),
+    'new_highs': ({'min_from_high': -0.01}, 'from_high', 'DESC'),
+    'new_lows': ({'max_from_low': 0.01}, 'from_low', 'ASC'),
+}
+
+_db_pool = queue.LifoQueue(maxsize=DB_POOL_SIZE)
+
+
+def _connect():
+    conn = sqlite3.connect(DATABASE, timeout=5, check_same_thread=False, cached_statements=256)
+    for pragma in DB_PRAGMAS:
+        conn.execute(pragma)
+    return conn
+
+def _current_route():
+    if has_request_context():
+        return request.endpoint or 'unknown'
+    return 'background'
+
+def stage(name):
+    """Mide la duración de un bloque como etapa `name` de la ruta actual."""
+    return STAGE_SECONDS.time(route=_current_route(), stage=name)
+
+@contextlib.contextmanager
+def get_db(immediate=False):
+    """
+    Entrega una conexión del pool (o abre una nueva si está vacío) dentro de una
+    transacción: se confirma al salir del bloque y se revierte si hay una excepción.
+    Al reutilizar conexiones también se reutilizan sus sentencias preparadas.
+    Con `immediate` la transacción toma el bloqueo de escritura al empezar
+    (BEGIN IMMEDIATE) y la espera se registra en SQLITE_LOCK_WAIT_SECONDS.
+    """
+    try:
+        database, conn = _db_pool.get_nowait()
+        if database != DATABASE:
+            conn.close()
+            conn = _connect()
+    except queue.Empty:
+        conn = _connect()
+    try:
+        with conn:
+            if immediate:
+                start = time.perf_counter()
+                conn.execute("BEGIN IMMEDIATE")
+                SQLITE_LOCK_WAIT_SECONDS.observe(time.perf_counter() - start, route=_current_route())
+            yield conn
+    finally:
+        try:
+            _db_pool.put_nowait((DATABASE, conn))
+        except queue.Full:
+            conn.close()
+
+def close_db_pool():
+    while True:
+        try:
+            _, conn = _db_pool.get_nowait()
+        except queue.Empty:
+            return
+        conn.close()
+
 
 def init_db():
-    conn = sqlite3.connect(DATABASE)
-    c = conn.cursor()
+    with get_db() as conn:
+        c = conn.cursor()
+        _migrate_history(c)
+        c.execute('''
+            CREATE TABLE IF NOT EXISTS history (
+                ticker TEXT NOT NULL,
+                date TEXT NOT NULL,
+                open REAL,
+                high REAL,
+                low REAL,
+                close REAL,
+                adj_close REAL,
+                volume INTEGER,
+                PRIMARY KEY (ticker, date)
+            ) WITHOUT ROWID
+        ''')
+        # La clave primaria (ticker, date) ya sirve el orden por fecha; el resto de
+        # columnas ordenables tiene un índice (ticker, columna, date).
+        for column in SORT_COLUMNS:
+            if column != 'date':
+                c.execute(f"CREATE INDEX IF NOT EXISTS idx_history_{column} ON history (ticker, {column}, date)")
+
+        c.execute('''
+            CREATE TABLE IF NOT EXISTS queries (
+                ticker TEXT PRIMARY KEY,
+                last_query TIMESTAMP,
+                hits INTEGER NOT NULL DEFAULT 0
+            )
+        ''')
+        if 'hits' not in [row[1] for row in c.execute("PRAGMA table_info(queries)")]:
+            c.execute("ALTER TABLE queries ADD COLUMN hits INTEGER NOT NULL DEFAULT 0")
+
+        c.execute('''
+            CREATE TABLE IF NOT EXISTS fetches (
+                ticker TEXT PRIMARY KEY,
+                company_name TEXT,
+                fetched_at REAL,
+                updated_at REAL
+            )
+        ''')
+        fetch_columns = [row[1] for row in c.execute("PRAGMA table_info(fetches)")]
+        if 'updated_at' not in fetch_columns:
+            c.execute("ALTER TABLE fetches ADD COLUMN updated_at REAL")
+        if 'covered_from' not in fetch_columns:
+            c.execute("ALTER TABLE fetches ADD COLUMN covered_from TEXT")
+
+        c.execute('''
+            CREATE TABLE IF NOT EXISTS history_intraday (
+                ticker TEXT NOT NULL,
+                interval TEXT NOT NULL,
+                date TEXT NOT NULL,
+                open REAL,
+                high REAL,
+                low REAL,
+                close REAL,
+                adj_close REAL,
+                volume INTEGER,
+                PRIMARY KEY (ticker, interval, date)
+            ) WITHOUT ROWID
+        ''')
+
+        c.execute('''
+            CREATE TABLE IF NOT EXISTS intraday_fetches (
+                ticker TEXT NOT NULL,
+                interval TEXT NOT NULL,
+                company_name TEXT,
+                fetched_at REAL,
+                PRIMARY KEY (ticker, interval)
+            )
+        ''')
+
+        c.execute('''
+            CREATE TABLE IF NOT EXISTS history_agg (
+                ticker TEXT NOT NULL,
+                tier TEXT NOT NULL,
+                date TEXT NOT NULL,
+                open REAL,
+                high REAL,
+                low REAL,
+                close REAL,
+                adj_close REAL,
+                volume INTEGER,
+                PRIMARY KEY (ticker, tier, date)
+            ) WITHOUT ROWID
+        ''')
+        if not c.execute("SELECT 1 FROM history_agg LIMIT 1").fetchone():
+            for (ticker,) in c.execute("SELECT DISTINCT ticker FROM history").fetchall():
+                materialize_aggregates(c, ticker, '0001-01-01')
+        c.execute('''
+            CREATE TABLE IF NOT EXISTS indicators (
+                ticker TEXT NOT NULL,
+                date TEXT NOT NULL,
+                sma_20 REAL,
+                sma_50 REAL,
+                ema_20 REAL,
+                rsi_14 REAL,
+                bb_upper REAL,
+                bb_lower REAL,
+                volatility_20 REAL,
+                drawdown REAL,
+                volume_sma_20 REAL,
+                PRIMARY KEY (ticker, date)
+            ) WITHOUT ROWID
+        ''')
+        c.execute('''
+            CREATE TABLE IF NOT EXISTS indicator_state (
+                ticker TEXT PRIMARY KEY,
+                date TEXT NOT NULL,
+                state TEXT NOT NULL
+            )
+        ''')
+        if not c.execute("SELECT 1 FROM indicators LIMIT 1").fetchone():
+            for (ticker,) in c.execute("SELECT DISTINCT ticker FROM history").fetchall():
+                update_indicators(c, ticker, '')
+        returns = ''.join(f", return_{window} REAL" for window in SUMMARY_RETURN_WINDOWS)
+        c.execute(f'''
+            CREATE TABLE IF NOT EXISTS ticker_summary (
+                ticker TEXT PRIMARY KEY,
+                date TEXT NOT NULL,
+                close REAL,
+                prev_close REAL,
+                change_pct REAL,
+                volume INTEGER,
+                avg_volume REAL,
+                rel_volume REAL,
+                high_52w REAL,
+                low_52w REAL,
+                from_high REAL,
+                from_low REAL{returns}
+            )
+        ''')
+        # /screener ordena por cualquiera de estas columnas con LIMIT: el índice (columna, ticker)
+        # entrega las primeras filas sin ordenar la tabla completa.
+        for column in SCREENER_COLUMNS + ['date']:
+            c.execute(f"CREATE INDEX IF NOT EXISTS idx_summary_{column} ON ticker_summary ({column}, ticker)")
+        if not c.execute("SELECT 1 FROM ticker_summary LIMIT 1").fetchone():
+            for (ticker,) in c.execute("SELECT DISTINCT ticker FROM history").fetchall():
+                update_summary(c, ticker)
+
+def _migrate_history(c):
+    """
+    Convierte la tabla `history` antigua (id AUTOINCREMENT, sin clave única) al
+    esquema con clave (ticker, date), conservando la fila más reciente de cada día.
+    Las filas sin open/high/low/close se descartan, igual que hace parse_chart con
+    las velas vacías de Yahoo.
+    """
+    columns = [row[1] for row in c.execute("PRAGMA table_info(history)")]
+    if 'id' not in columns:
+        return
+    c.execute("ALTER TABLE history RENAME TO history_old")
     c.execute('''
-        CREATE TABLE IF NOT EXISTS history (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            ticker TEXT,
-            date TEXT,
+        CREATE TABLE history (
+            ticker TEXT NOT NULL,
+            date TEXT NOT NULL,
             open REAL,
             high REAL,
             low REAL,
             close REAL,
             adj_close REAL,
-            volume INTEGER
-        )
+            volume INTEGER,
+            PRIMARY KEY (ticker, date)
+        ) WITHOUT ROWID
     ''')
-
     c.execute('''
-        CREATE TABLE IF NOT EXISTS queries (
-            ticker TEXT PRIMARY KEY,
-            last_query TIMESTAMP
-        )
+        INSERT INTO history (ticker, date, open, high, low, close, adj_close, volume)
+        SELECT ticker, date, open, high, low, close, adj_close, volume FROM history_old
+        WHERE id IN (SELECT MAX(id) FROM history_old WHERE ticker IS NOT NULL AND date IS NOT NULL GROUP BY ticker, date)
+          AND open IS NOT NULL AND high IS NOT NULL AND low IS NOT NULL AND close IS NOT NULL
     ''')
-    conn.commit()
-    conn.close()
+    c.execute("DROP TABLE history_old")
 
-init_db()
+def materialize_aggregates(c, ticker, since):
+    """
+    Recalcula las velas semanales y mensuales de `ticker` en `history_agg` a partir
+    del periodo que contiene `since` (fecha 'YYYY-MM-DD'): primer open, máximo high,
+    mínimo low, último close/adj_close y suma del volumen, todo en SQL.
+    """
+    for tier, bucket in AGGREGATE_BUCKETS.items():
+        start = c.execute(f"SELECT {bucket} FROM (SELECT ? AS date)", (since,)).fetchone()[0]
+        c.execute("DELETE FROM history_agg WHERE ticker = ? AND tier = ? AND date >= ?", (ticker, tier, start))
+        c.execute(f'''
+            INSERT INTO history_agg (ticker, tier, date, open, high, low, close, adj_close, volume)
+            SELECT ticker, ?, bucket, first_open, MAX(high), MIN(low), last_close, last_adj_close, SUM(volume)
+            FROM (
+                SELECT ticker, high, low, volume, {bucket} AS bucket,
+                       FIRST_VALUE(open) OVER w AS first_open,
+                       LAST_VALUE(close) OVER w AS last_close,
+                       LAST_VALUE(adj_close) OVER w AS last_adj_close
+                FROM history
+                WHERE ticker = ? AND date >= ?
+                WINDOW w AS (PARTITION BY {bucket} ORDER BY date ROWS BETWEEN UNBOUNDED PRECEDING AND UNBOUNDED FOLLOWING)
+            )
+            GROUP BY bucket
+        ''', (tier, ticker, start))
+
+def _ratio(value, base):
+    return value / base if value is not None and base else None
 
+def _change(value, base):
+    ratio = _ratio(value, base)
+    return None if ratio is None else ratio - 1
 
-def get_price_history(ticker):
+def update_summary(c, ticker):
     """
-    Llama al endpoint JSON de Yahoo Finance y retorna:
-      - Lista con el histórico (date, open, high, low, close, adj_close, volume).
-      - Nombre real de la empresa, si está disponible (shortName). 
+    Recalcula la fila de `ticker` en ticker_summary a partir de su último día con cierre:
+    variación diaria, máximo/mínimo de 52 semanas, volumen medio y rentabilidades. Solo lee
+    las velas del último año (más una semana, para la base de la rentabilidad a un año).
     """
-    url = f"https://query1.finance.yahoo.com/v8/finance/chart/{ticker}?range=1y&interval=1d"
-    headers = {'User-Agent': 'Mozilla/5.0'}
-    response = requests.get(url, headers=headers)
-    data = response.json()
-    
-    if data.get('chart', {}).get('error'):
-        return [], None
+    last = c.execute("SELECT MAX(date) FROM history WHERE ticker = ? AND close IS NOT NULL", (ticker,)).fetchone()[0]
+    if last is None:
+        c.execute("DELETE FROM ticker_summary WHERE ticker = ?", (ticker,))
+        return
+    last_day = datetime.date.fromisoformat(last)
+    horizon = max(SUMMARY_HIGH_LOW_DAYS, *SUMMARY_RETURN_WINDOWS.values()) + 7
+    rows = c.execute(
+        "SELECT date, high, low, close, adj_close, volume FROM history "
+        "WHERE ticker = ? AND date >= ? AND close IS NOT NULL ORDER BY date",
+        (ticker, (last_day - datetime.timedelta(days=horizon)).isoformat())
+    ).fetchall()
+    dates = [row[0] for row in rows]
+    date, _, _, close, adj_close, volume = rows[-1]
+    prev_close = rows[-2][3] if len(rows) > 1 else None
+
+    year = rows[bisect.bisect_left(dates, (last_day - datetime.timedelta(days=SUMMARY_HIGH_LOW_DAYS)).isoformat()):]
+    high_52w = max((row[1] for row in year if row[1] is not None), default=None)
+    low_52w = min((row[2] for row in year if row[2] is not None), default=None)
+    volumes = [row[5] for row in rows[-SUMMARY_AVG_VOLUME_SESSIONS:] if row[5] is not None]
+    avg_volume = sum(volumes) / len(volumes) if volumes else None
+    returns = []
+    for days in SUMMARY_RETURN_WINDOWS.values():
+        # Cierre ajustado de la última sesión a `days` días o más del último día.
+        i = bisect.bisect_right(dates, (last_day - datetime.timedelta(days=days)).isoformat()) - 1
+        returns.append(_change(adj_close, rows[i][4]) if i >= 0 else None)
+
+    values = [date, close, prev_close, _change(close, prev_close), volume, avg_volume, _ratio(volume, avg_volume),
+              high_52w, low_52w, _change(close, high_52w), _change(close, low_52w), *returns]
+    c.execute(
+        f"INSERT OR REPLACE INTO ticker_summary (ticker, {', '.join(SUMMARY_COLUMNS)}) "
+        f"VALUES (?{', ?' * len(SUMMARY_COLUMNS)})",
+        (ticker, *values)
+    )
+
+def update_indicators(c, ticker, since):
+    """
+    Actualiza los indicadores de `ticker` tras modificar su histórico desde `since`.
+    Si el punto de control guardado es anterior a `since` el cálculo continúa desde
+    él y solo se recalcula la cola; si no, se recalcula la serie completa. El nuevo
+    punto de control queda INDICATOR_CHECKPOINT_LAG velas antes de la última.
+    """
+    row = c.execute("SELECT date, state FROM indicator_state WHERE ticker = ?", (ticker,)).fetchone()
+    if row and row[0] < since:
+        checkpoint, state = row[0], IndicatorState.loads(row[1])
+    else:
+        checkpoint, state = '', IndicatorState()
+    rows = c.execute(
+        "SELECT date, adj_close, COALESCE(volume, 0) FROM history "
+        "WHERE ticker = ? AND date > ? AND adj_close IS NOT NULL ORDER BY date",
+        (ticker, checkpoint)
+    ).fetchall()
+    if not rows:
+        return
+    dates, closes, volumes = zip(*rows)
+    split = max(0, len(dates) - INDICATOR_CHECKPOINT_LAG)
+    values = state.advance(closes[:split], volumes[:split])
+    if split:
+        c.execute(
+            "INSERT OR REPLACE INTO indicator_state (ticker, date, state) VALUES (?, ?, ?)",
+            (ticker, dates[split - 1], state.dumps())
+        )
+    values += state.advance(closes[split:], volumes[split:])
+    c.execute("DELETE FROM indicators WHERE ticker = ? AND date > ?", (ticker, checkpoint))
+    c.executemany(
+        f"INSERT INTO indicators (ticker, date, {', '.join(INDICATOR_COLUMNS)}) "
+        f"VALUES (?, ?{', ?' * len(INDICATOR_COLUMNS)})",
+        ((ticker, date) + value for date, value in zip(dates, values))
+    )
+
+init_db()
+
+
+def chart_params(start=None, range_=DEFAULT_RANGE, interval='1d'):
+    """Parámetros de yahoo.chart para refresh_plan: el rango `range_` o, con `start`, desde ese día hasta hoy."""
+    if start is None:
+        return {'range': range_, 'interval': interval}
+    period1 = int(datetime.datetime.combine(start, datetime.time(), datetime.timezone.utc).timestamp())
+    return {'period1': period1, 'period2': int(time.time()), 'interval': interval}
+
+def parse_chart_response(data, ticker, interval='1d'):
+    """(HistoryColumns, nombre de la empresa) de una respuesta de yahoo.chart; vacíos si Yahoo no tiene datos."""
+    if data.get('chart', {}).get('error') or not data.get('chart', {}).get('result'):
+        return HistoryColumns(), None
     
     result = data['chart']['result'][0]
     meta = result.get('meta', {})
@@ -56,97 +532,711 @@ def get_price_history(ticker):
     short_name = meta.get('shortName')
     fallback_name = meta.get('symbol', ticker)
     company_name = short_name if short_name else fallback_name
-    
-    timestamps = result.get('timestamp', [])
-    indicators = result.get('indicators', {}).get('quote', [{}])[0]
-    adjclose = result.get('indicators', {}).get('adjclose', [{}])[0]
 
-    history_data = []
-    for i, timestamp in enumerate(timestamps):
+    with stage('parse'):
+        history = parse_chart(result, intraday=interval in INTRADAY_INTERVALS)
+    return history, company_name
+
+UPSERT_CHANGED = (
+    "ON CONFLICT({key}) DO UPDATE SET "
+    "open = excluded.open, high = excluded.high, low = excluded.low, close = excluded.close, "
+    "adj_close = excluded.adj_close, volume = excluded.volume "
+    "WHERE (open, high, low, close, adj_close, volume) IS NOT "
+    "(excluded.open, excluded.high, excluded.low, excluded.close, excluded.adj_close, excluded.volume)"
+)
+
+def _touch_data_version(c, ticker):
+    c.execute(
+        "INSERT INTO fetches (ticker, updated_at) VALUES (?, ?) "
+        "ON CONFLICT(ticker) DO UPDATE SET updated_at = excluded.updated_at",
+        (ticker, time.time())
+    )
+
+def save_history_to_db(ticker, history):
+    """
+    Inserta o actualiza (upsert) los días de `history` (HistoryColumns) en una sola
+    transacción. Los días guardados que no vienen en `history` se conservan y los que
+    llegan sin cambios no se reescriben. Si algo cambió se actualiza `fetches.updated_at`,
+    la versión de datos del ticker, se recalculan las velas semanales y mensuales y
+    los indicadores desde el primer día recibido y se actualiza su fila de ticker_summary.
+    Retorna el número de filas insertadas o modificadas.
+    """
+    with stage('save'), get_db(immediate=True) as conn:
+        c = conn.cursor()
+        before = conn.total_changes
+        c.executemany(
+            "INSERT INTO history (ticker, date, open, high, low, close, adj_close, volume) VALUES (?, ?, ?, ?, ?, ?, ?, ?) "
+            + UPSERT_CHANGED.format(key='ticker, date'),
+            history.rows(ticker)
+        )
+        changed = conn.total_changes - before
+        if changed:
+            since = min(history.dates)
+            materialize_aggregates(c, ticker, since)
+            update_indicators(c, ticker, since)
+            update_summary(c, ticker)
+            previous = _data_version(c, ticker)
+            _touch_data_version(c, ticker)
+            version = _data_version(c, ticker)
+    # La copia columnar se sincroniza aunque HISTORY_BACKEND sea 'sqlite': si se vuelve
+    # a 'columnar' no debe servir una copia atrasada.
+    if changed and colstore.exists(ticker):
         try:
-            date = datetime.datetime.fromtimestamp(timestamp).strftime('%Y-%m-%d')
-            record = {
-                'date': date,
-                'open': indicators.get('open')[i],
-                'high': indicators.get('high')[i],
-                'low': indicators.get('low')[i],
-                'close': indicators.get('close')[i],
-                'adj_close': (
-                    adjclose.get('adjclose')[i]
-                    if adjclose.get('adjclose') and adjclose.get('adjclose')[i]
-                    else indicators.get('close')[i]
-                ),
-                'volume': indicators.get('volume')[i]
-            }
-            history_data.append(record)
+            with stage('save'):
+                colstore.save(ticker, history, version=version, base=previous)
         except Exception:
-            continue
+            # La tabla es la fuente de verdad: la copia columnar se descarta y se reconstruye al leerla.
+            app.logger.exception("Error al guardar %s en el almacenamiento columnar", ticker)
+            colstore.delete(ticker)
+    return changed
 
-    return history_data, company_name
+def columnar_history(ticker):
+    """
+    ColumnarSeries de `ticker`. Si no existe o su versión de datos no es la actual
+    (la de get_data_version) se reconstruye desde la tabla history, leyendo las filas
+    y la versión en la misma transacción: si una ingesta confirma entre la lectura y
+    el guardado, la copia queda con la versión anterior y se reconstruye en la
+    siguiente lectura. Las filas sin open/high/low/close no se copian y un adj_close
+    o volumen vacío se guarda como el cierre y 0, igual que hace parse_chart.
+    """
+    series = colstore.load(ticker)
+    if series is not None and series.version == get_data_version(ticker):
+        return series
+    with get_db() as conn:
+        conn.execute("BEGIN")
+        version = _data_version(conn, ticker)
+        rows = conn.execute(
+            "SELECT date, open, high, low, close, COALESCE(adj_close, close), COALESCE(volume, 0) "
+            "FROM history WHERE ticker = ? AND open IS NOT NULL AND high IS NOT NULL "
+            "AND low IS NOT NULL AND close IS NOT NULL ORDER BY date",
+            (ticker,)
+        ).fetchall()
+    if not rows:
+        return None
+    colstore.replace(ticker, HistoryColumns(*zip(*rows)), version)
+    return colstore.load(ticker)
 
-def save_history_to_db(ticker, history):
-    conn = sqlite3.connect(DATABASE)
-    c = conn.cursor()
-    c.execute("DELETE FROM history WHERE ticker = ?", (ticker,))
-    for record in history:
+def _columnar_start(series, range_):
+    """Primera posición de `series` dentro de `range_`, contado desde el último día como en _history_source."""
+    days = RANGE_DAYS.get(range_)
+    if not days or not len(series):
+        return 0
+    return bisect.bisect_left(series.day, series.day[-1] - (days - 1))
+
+def _columnar_order(series, sort_column, start):
+    """
+    Posiciones de `series` desde `start` ordenadas por (sort_column, date) ascendente,
+    el orden de la tabla; el orden descendente es el mismo recorrido al revés.
+    """
+    if sort_column == 'date':
+        return range(start, len(series))
+    # sorted es estable y las posiciones van por fecha: los empates quedan ordenados por fecha.
+    return sorted(range(start, len(series)), key=getattr(series, sort_column).__getitem__)
+
+def _history_from_columnar(ticker, sort_column, order, range_):
+    series = columnar_history(ticker)
+    if series is None:
+        return []
+    indices = _columnar_order(series, sort_column, _columnar_start(series, range_))
+    return series.rows(indices if order == 'ASC' else reversed(indices))
+
+def _page_from_columnar(ticker, sort_column, ascending, cursor, limit, range_):
+    """
+    Hasta `limit` filas de get_history_page desde ColumnarSeries: las posteriores
+    (o anteriores, si no es `ascending`) a `cursor` en el orden (sort_column, date).
+    """
+    series = columnar_history(ticker)
+    if series is None:
+        return []
+    indices = _columnar_order(series, sort_column, _columnar_start(series, range_))
+    if cursor is None:
+        position = 0 if ascending else len(indices)
+    elif sort_column == 'date':
+        day, start = iso_to_epoch_day(cursor[1]), indices.start
+        find = bisect.bisect_right if ascending else bisect.bisect_left
+        position = find(series.day, day, start, len(series)) - start
+    else:
+        column, day = getattr(series, sort_column), series.day
+        find = bisect.bisect_right if ascending else bisect.bisect_left
+        position = find(indices, (cursor[0], iso_to_epoch_day(cursor[1])), key=lambda i: (column[i], day[i]))
+    if ascending:
+        return series.rows(indices[position:position + limit])
+    return series.rows(reversed(indices[max(0, position - limit):position]))
+
+def save_intraday_to_db(ticker, interval, history):
+    """
+    Igual que save_history_to_db para velas intradía de `interval`; además descarta
+    las velas de ese intervalo con más de INTRADAY_RETENTION_DAYS días.
+    """
+    rows = ((ticker, interval) + row[1:] for row in history.rows(ticker))
+    with stage('save'), get_db(immediate=True) as conn:
+        c = conn.cursor()
+        before = conn.total_changes
+        c.executemany(
+            "INSERT INTO history_intraday (ticker, interval, date, open, high, low, close, adj_close, volume) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?) " + UPSERT_CHANGED.format(key='ticker, interval, date'),
+            rows
+        )
         c.execute(
-            "INSERT INTO history (ticker, date, open, high, low, close, adj_close, volume) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
-            (
-                ticker,
-                record['date'],
-                record['open'],
-                record['high'],
-                record['low'],
-                record['close'],
-                record['adj_close'],
-                record['volume']
-            )
+            "DELETE FROM history_intraday WHERE ticker = ? AND interval = ? AND date < date('now', ?)",
+            (ticker, interval, f'-{INTRADAY_RETENTION_DAYS} days')
         )
-    conn.commit()
-    conn.close()
-
-def get_history_from_db(ticker, sort_column='date', order='ASC'):
-    conn = sqlite3.connect(DATABASE)
-    c = conn.cursor()
-    allowed_columns = ['date', 'open', 'high', 'low', 'close', 'adj_close', 'volume']
-    if sort_column not in allowed_columns:
+        changed = conn.total_changes - before
+        if changed:
+            _touch_data_version(c, ticker)
+    return changed
+
+def get_latest_date(ticker):
+    with get_db() as conn:
+        c = conn.cursor()
+        c.execute("SELECT MAX(date) FROM history WHERE ticker = ?", (ticker,))
+        latest = c.fetchone()[0]
+    return datetime.date.fromisoformat(latest) if latest else None
+
+def resolve_view(range_=None, interval=None):
+    """
+    Valida los parámetros range/interval de una vista y retorna (range_, interval).
+    Sin intervalo se usa el de DEFAULT_INTERVALS para rangos largos; los intervalos
+    intradía se limitan al rango que Yahoo ofrece para ellos.
+    """
+    if range_ not in RANGE_DAYS:
+        range_ = DEFAULT_RANGE
+    if interval not in DAILY_INTERVALS and interval not in INTRADAY_INTERVALS:
+        interval = DEFAULT_INTERVALS.get(range_, '1d')
+    if interval in INTRADAY_INTERVALS:
+        limit = INTRADAY_RANGES[interval]
+        if RANGE_DAYS[range_] is None or RANGE_DAYS[range_] > RANGE_DAYS[limit]:
+            range_ = limit
+    return range_, interval
+
+def storage_interval(interval):
+    """Intervalo que se descarga y guarda para servir `interval` (las velas agregadas salen de las diarias)."""
+    return interval if interval in INTRADAY_INTERVALS else '1d'
+
+def range_start(range_):
+    """Primer día (ISO) que debe estar guardado para cubrir `range_`; '' para 'max'."""
+    days = RANGE_DAYS.get(range_)
+    if days is None:
+        return ''
+    return (datetime.date.today() - datetime.timedelta(days=days)).isoformat()
+
+def _history_source(ticker, interval='1d', range_=None):
+    """
+    Tabla, condición WHERE y parámetros de las velas de `ticker` en `interval`,
+    limitadas a los últimos días de `range_` contados desde la última vela guardada.
+    """
+    if interval in INTRADAY_INTERVALS:
+        table, where, params = 'history_intraday', 'ticker = ? AND interval = ?', [ticker, interval]
+    elif interval in AGGREGATE_BUCKETS:
+        table, where, params = 'history_agg', 'ticker = ? AND tier = ?', [ticker, interval]
+    else:
+        table, where, params = 'history', 'ticker = ?', [ticker]
+    days = RANGE_DAYS.get(range_)
+    if days:
+        where += f" AND date >= (SELECT date(MAX(date), '-{days - 1} days') FROM {table} WHERE {where})"
+        params = params + params
+    return table, where, params
+
+def get_history_from_db(ticker, sort_column='date', order='ASC', interval='1d', range_=None):
+    if sort_column not in SORT_COLUMNS:
         sort_column = 'date'
-    if order.upper() not in ['ASC', 'DESC']:
-        order = 'ASC'
-    query = f"SELECT date, open, high, low, close, adj_close, volume FROM history WHERE ticker = ? ORDER BY {sort_column} {order}"
-    c.execute(query, (ticker,))
-    rows = c.fetchall()
-    conn.close()
+    order = order.upper() if order.upper() in ('ASC', 'DESC') else 'ASC'
+    if HISTORY_BACKEND == 'columnar' and interval == '1d':
+        with stage('query'):
+            return _history_from_columnar(ticker, sort_column, order, range_)
+    table, where, params = _history_source(ticker, interval, range_)
+    with stage('query'), get_db() as conn:
+        c = conn.cursor()
+        query = (
+            f"SELECT date, open, high, low, close, adj_close, volume FROM {table} WHERE {where} "
+            f"ORDER BY {sort_column} {order}, date {order}"
+        )
+        c.execute(query, params)
+        rows = c.fetchall()
     return rows
 
+def encode_cursor(sort_column, row):
+    """Cursor opaco con el valor de la columna de orden y la fecha de una fila."""
+    value = row[SORT_COLUMNS.index(sort_column)]
+    raw = json.dumps([value, row[0]], separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+def decode_cursor(cursor):
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        value, date = json.loads(raw)
+    except (ValueError, TypeError):
+        return None
+    return value, date
+
+def get_history_page(ticker, sort_column='date', order='ASC', limit=PAGE_SIZE, after=None, before=None,
+                     interval='1d', range_=None):
+    """
+    Paginación por clave (keyset): retorna (filas, cursor_siguiente, cursor_anterior).
+    `after`/`before` son cursores de encode_cursor; la consulta continúa desde
+    (columna, date) usando los índices de la tabla, sin OFFSET.
+    """
+    if sort_column not in SORT_COLUMNS:
+        sort_column = 'date'
+    order = 'DESC' if order.upper() == 'DESC' else 'ASC'
+    after = decode_cursor(after) if after else None
+    before = None if after else (decode_cursor(before) if before else None)
+
+    backwards = before is not None
+    cursor = before if backwards else after
+    ascending = (order == 'ASC') != backwards
+    direction = 'ASC' if ascending else 'DESC'
+    comparison = '>' if ascending else '<'
+
+    if HISTORY_BACKEND == 'columnar' and interval == '1d':
+        with stage('query'):
+            rows = _page_from_columnar(ticker, sort_column, ascending, cursor, limit + 1, range_)
+    else:
+        table, where, params = _history_source(ticker, interval, range_)
+        query = f"SELECT date, open, high, low, close, adj_close, volume FROM {table} WHERE {where}"
+        if cursor is not None:
+            if sort_column == 'date':
+                query += f" AND date {comparison} ?"
+                params.append(cursor[1])
+            else:
+                query += f" AND ({sort_column}, date) {comparison} (?, ?)"
+                params.extend(cursor)
+        if sort_column == 'date':
+            query += f" ORDER BY date {direction} LIMIT ?"
+        else:
+            query += f" ORDER BY {sort_column} {direction}, date {direction} LIMIT ?"
+        params.append(limit + 1)
+
+        with stage('query'), get_db() as conn:
+            rows = conn.execute(query, params).fetchall()
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    if backwards:
+        rows.reverse()
+    if not rows:
+        return rows, None, None
+
+    first, last = encode_cursor(sort_column, rows[0]), encode_cursor(sort_column, rows[-1])
+    if backwards:
+        return rows, last, first if has_more else None
+    return rows, last if has_more else None, first if after else None
+
+def iter_history(ticker, sort_column='date', order='ASC', interval='1d', range_=None):
+    """Recorre el histórico con un cursor, leyendo STREAM_FETCH_SIZE filas por vez."""
+    if sort_column not in SORT_COLUMNS:
+        sort_column = 'date'
+    order = 'DESC' if order.upper() == 'DESC' else 'ASC'
+    if HISTORY_BACKEND == 'columnar' and interval == '1d':
+        series = columnar_history(ticker)
+        if series is None:
+            return
+        indices = _columnar_order(series, sort_column, _columnar_start(series, range_))
+        if order == 'DESC':
+            indices = indices[::-1]
+        for i in range(0, len(indices), STREAM_FETCH_SIZE):
+            yield from series.rows(indices[i:i + STREAM_FETCH_SIZE])
+        return
+    table, where, params = _history_source(ticker, interval, range_)
+    with get_db() as conn:
+        c = conn.execute(
+            f"SELECT date, open, high, low, close, adj_close, volume FROM {table} WHERE {where} "
+            f"ORDER BY {sort_column} {order}, date {order}",
+            params
+        )
+        while True:
+            rows = c.fetchmany(STREAM_FETCH_SIZE)
+            if not rows:
+                return
+            yield from rows
+
+def iter_export_rows(tickers=None, start=None, end=None):
+    """
+    Filas (ticker, date, open, high, low, close, adj_close, volume) ordenadas por
+    ticker y fecha; sin `tickers` recorre todo el almacén.
+    """
+    query = "SELECT ticker, date, open, high, low, close, adj_close, volume FROM history WHERE 1 = 1"
+    params = []
+    if tickers:
+        query += f" AND ticker IN ({', '.join('?' * len(tickers))})"
+        params.extend(tickers)
+    if start:
+        query += " AND date >= ?"
+        params.append(start)
+    if end:
+        query += " AND date <= ?"
+        params.append(end)
+    query += " ORDER BY ticker, date"
+    with get_db() as conn:
+        c = conn.execute(query, params)
+        while True:
+            rows = c.fetchmany(STREAM_FETCH_SIZE)
+            if not rows:
+                return
+            yield from rows
+
+def has_history(ticker, interval='1d'):
+    table, where, params = _history_source(ticker, interval)
+    with get_db() as conn:
+        c = conn.cursor()
+        c.execute(f"SELECT 1 FROM {table} WHERE {where} LIMIT 1", params)
+        return c.fetchone() is not None
+
+def get_indicators(ticker, range_=None, start=None, end=None):
+    """
+    Filas (date, *INDICATOR_COLUMNS) de `ticker` ordenadas por fecha, limitadas a
+    `range_` (contado desde la última vela, como el histórico) y a start/end.
+    """
+    where, params = "ticker = ?", [ticker]
+    days = RANGE_DAYS.get(range_)
+    if days:
+        where += f" AND date >= (SELECT date(MAX(date), '-{days - 1} days') FROM indicators WHERE ticker = ?)"
+        params.append(ticker)
+    if start:
+        where += " AND date >= ?"
+        params.append(start)
+    if end:
+        where += " AND date <= ?"
+        params.append(end)
+    with stage('query'), get_db() as conn:
+        return conn.execute(
+            f"SELECT date, {', '.join(INDICATOR_COLUMNS)} FROM indicators WHERE {where} ORDER BY date", params
+        ).fetchall()
+
+def get_indicator_map(ticker, dates):
+    """{date: (*INDICATOR_COLUMNS)} de las fechas pedidas (p. ej. las de una página del histórico)."""
+    dates = list(dates)
+    if not dates:
+        return {}
+    with stage('query'), get_db() as conn:
+        rows = conn.execute(
+            f"SELECT date, {', '.join(INDICATOR_COLUMNS)} FROM indicators "
+            f"WHERE ticker = ? AND date IN ({', '.join('?' * len(dates))})",
+            [ticker] + dates
+        ).fetchall()
+    return {row[0]: row[1:] for row in rows}
+
+def record_fetch(ticker, company_name, interval='1d', covered_from=None):
+    """
+    Registra una descarga. Para velas diarias `covered_from` es el primer día que
+    cubre lo guardado ('' = todo el histórico); la cobertura solo se amplía.
+    """
+    with get_db(immediate=True) as conn:
+        c = conn.cursor()
+        if interval in INTRADAY_INTERVALS:
+            c.execute(
+                "INSERT INTO intraday_fetches (ticker, interval, company_name, fetched_at) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT(ticker, interval) DO UPDATE SET "
+                "company_name = COALESCE(excluded.company_name, intraday_fetches.company_name), "
+                "fetched_at = excluded.fetched_at",
+                (ticker, interval, company_name, time.time())
+            )
+            return
+        c.execute(
+            "INSERT INTO fetches (ticker, company_name, fetched_at, covered_from) VALUES (?, ?, ?, ?) "
+            "ON CONFLICT(ticker) DO UPDATE SET "
+            "company_name = COALESCE(excluded.company_name, fetches.company_name), "
+            "fetched_at = excluded.fetched_at, "
+            "covered_from = CASE WHEN fetches.covered_from IS NULL THEN excluded.covered_from "
+            "WHEN excluded.covered_from IS NULL THEN fetches.covered_from "
+            "ELSE MIN(fetches.covered_from, excluded.covered_from) END",
+            (ticker, company_name, time.time(), covered_from)
+        )
+
+def get_fetch_info(ticker, interval='1d'):
+    """(company_name, fetched_at, covered_from) de la última descarga, o None si nunca se descargó."""
+    with get_db() as conn:
+        c = conn.cursor()
+        if interval in INTRADAY_INTERVALS:
+            c.execute(
+                "SELECT company_name, fetched_at, '' FROM intraday_fetches WHERE ticker = ? AND interval = ?",
+                (ticker, interval)
+            )
+        else:
+            c.execute(
+                "SELECT company_name, fetched_at, covered_from FROM fetches "
+                "WHERE ticker = ? AND fetched_at IS NOT NULL",
+                (ticker,)
+            )
+        row = c.fetchone()
+    return row
+
+def get_data_version(ticker):
+    """Momento (epoch) del último cambio en el histórico del ticker, o None si no hay datos."""
+    with get_db() as conn:
+        return _data_version(conn, ticker)
+
+def _data_version(c, ticker):
+    row = c.execute("SELECT COALESCE(updated_at, fetched_at) FROM fetches WHERE ticker = ?", (ticker,)).fetchone()
+    return row[0] if row else None
+
+_refresh_flight = SingleFlight()
+
+# Segundos durante los que una descarga asíncrona fallida (asgi.prefetch) no se
+# repite: refresh_ticker lanza ese mismo error en vez de volver a esperar a Yahoo,
+# así que la vista de la petición no pasa dos veces por todos los reintentos.
+PREFETCH_FAILURE_TTL = 10
+_prefetch_failures = {}
+_prefetch_failures_lock = threading.Lock()
+
+def mark_prefetch_failed(key, error):
+    """Recuerda durante PREFETCH_FAILURE_TTL que la descarga de `key` (refresh_key) falló con `error`."""
+    now = time.monotonic()
+    with _prefetch_failures_lock:
+        for stale in [k for k, (at, _) in _prefetch_failures.items() if now - at >= PREFETCH_FAILURE_TTL]:
+            del _prefetch_failures[stale]
+        _prefetch_failures[key] = (now, error)
+
+def prefetch_failure(key):
+    """El error de la última descarga asíncrona fallida de `key`, o None si no hay uno reciente."""
+    with _prefetch_failures_lock:
+        entry = _prefetch_failures.get(key)
+        if entry is None:
+            return None
+        if time.monotonic() - entry[0] >= PREFETCH_FAILURE_TTL:
+            del _prefetch_failures[key]
+            return None
+        return entry[1]
+
+def refresh_ticker(ticker, range_=DEFAULT_RANGE, interval='1d'):
+    """
+    Descarga y guarda las velas de `ticker` para servir `range_` en `interval`.
+    Si ya hay una descarga en curso con los mismos parámetros se espera su
+    resultado en lugar de repetir la llamada a Yahoo.
+    Si la descarga asíncrona de esos parámetros acaba de fallar se lanza su error
+    (ver PREFETCH_FAILURE_TTL).
+    """
+    interval = storage_interval(interval)
+    return _refresh_flight.do(refresh_key(ticker, range_, interval), _refresh, ticker, range_, interval)
+
+def refresh_key(ticker, range_, interval):
+    """Clave de _refresh_flight: en intradía siempre se pide el mismo rango, así que no depende de `range_`."""
+    return (ticker, interval) if interval in INTRADAY_INTERVALS else (ticker, range_, interval)
+
+def _refresh(ticker, range_, interval):
+    error = prefetch_failure(refresh_key(ticker, range_, interval))
+    if error is not None:
+        raise error
+    plan = refresh_plan(ticker, range_, interval)
+    with stage('upstream'):
+        data = yahoo.chart(ticker, plan[0])
+    return apply_refresh(ticker, interval, plan, data)
+
+def refresh_plan(ticker, range_=DEFAULT_RANGE, interval='1d'):
+    """
+    Qué pedir a Yahoo para refrescar `ticker`: (parámetros de yahoo.chart, covered_from,
+    último día guardado). En diario, si lo guardado ya cubre `range_` solo se piden los
+    días posteriores al último día guardado (más DELTA_OVERLAP_DAYS para correcciones);
+    si no, el rango completo. En intradía siempre se pide el rango de INTRADAY_RANGES.
+    """
+    if interval in INTRADAY_INTERVALS:
+        return chart_params(range_=INTRADAY_RANGES[interval], interval=interval), None, None
+    latest = get_latest_date(ticker)
+    info = get_fetch_info(ticker)
+    needed_from = range_start(range_)
+    if latest is not None and info is not None and info[2] is not None and info[2] <= needed_from:
+        return chart_params(start=latest - datetime.timedelta(days=DELTA_OVERLAP_DAYS)), None, latest
+    return chart_params(range_=range_), needed_from, latest
+
+def apply_refresh(ticker, interval, plan, data):
+    """
+    Guarda la respuesta `data` de Yahoo, pedida según `plan` (refresh_plan), y registra
+    el momento de la descarga. Retorna el nombre de la empresa o None si el ticker no tiene datos.
+    """
+    _, covered_from, latest = plan
+    history, company_name = parse_chart_response(data, ticker, interval)
+    if interval in INTRADAY_INTERVALS:
+        if not history:
+            return None
+        save_intraday_to_db(ticker, interval, history)
+        record_fetch(ticker, company_name, interval=interval)
+        return company_name or ticker
+    if not history and latest is None:
+        return None
+    if history:
+        save_history_to_db(ticker, history)
+    record_fetch(ticker, company_name, covered_from=covered_from)
+    return company_name or ticker
+
+_revalidating = set()
+_revalidating_lock = threading.Lock()
+
+def _revalidate(key):
+    try:
+        refresh_ticker(*key)
+    except Exception:
+        ERRORS.inc(kind='background_refresh')
+        app.logger.exception("Error al refrescar %s en segundo plano", key[0])
+    finally:
+        with _revalidating_lock:
+            _revalidating.discard(key)
+
+def revalidate_in_background(ticker, range_=DEFAULT_RANGE, interval='1d'):
+    key = (ticker, range_, storage_interval(interval))
+    with _revalidating_lock:
+        if key in _revalidating:
+            return
+        _revalidating.add(key)
+    threading.Thread(target=_revalidate, args=(key,), daemon=True).start()
+
+def load_ticker(ticker, force=False, allow_stale=None, local_only=False, range_=DEFAULT_RANGE, interval='1d'):
+    """
+    Caché de lectura: retorna el nombre de la empresa asegurando que las velas de
+    `interval` que cubren `range_` estén guardadas.
+      - Datos frescos (más nuevos que CACHE_TTL, o INTRADAY_TTL en intradía): se
+        sirven sin llamar a Yahoo.
+      - Datos vencidos: con allow_stale se sirven y se refrescan en segundo plano;
+        si no, se descargan antes de responder.
+      - Datos que no cubren el rango pedido: se descargan antes de responder.
+      - local_only=True: si hay datos guardados se sirven tal cual, sin tráfico a Yahoo.
+      - force=True: siempre descarga desde Yahoo.
+    Si Yahoo falla y hay datos guardados, se sirven los datos guardados.
+    """
+    if allow_stale is None:
+        allow_stale = STALE_WHILE_REVALIDATE
+    interval = storage_interval(interval)
+    info = get_fetch_info(ticker, interval)
+    if info and not force:
+        company_name = info[0]
+        state = cache_state(info, range_, interval)
+        if local_only or state == 'fresh':
+            CACHE_REQUESTS.inc(cache='history', result='local' if local_only else 'fresh')
+            return company_name or ticker
+        if state == 'stale' and allow_stale:
+            CACHE_REQUESTS.inc(cache='history', result='stale')
+            revalidate_in_background(ticker, range_, interval)
+            return company_name or ticker
+    CACHE_REQUESTS.inc(cache='history', result='forced' if force and info else 'miss')
+    try:
+        return refresh_ticker(ticker, range_, interval)
+    except Exception:
+        ERRORS.inc(kind='upstream')
+        if not info:
+            raise
+        app.logger.exception("Error al descargar %s, se sirven datos guardados", ticker)
+        return info[0] or ticker
+
+def cache_state(info, range_=DEFAULT_RANGE, interval='1d'):
+    """
+    Estado de lo guardado según `info` (get_fetch_info) para servir `range_` en `interval`:
+    'fresh', 'stale' (cubre el rango pero superó CACHE_TTL o INTRADAY_TTL) o 'uncovered'.
+    """
+    _, fetched_at, covered_from = info
+    if covered_from is None or covered_from > range_start(range_):
+        return 'uncovered'
+    ttl = INTRADAY_TTL if interval in INTRADAY_INTERVALS else CACHE_TTL
+    return 'fresh' if time.time() - fetched_at < ttl else 'stale'
+
+def needs_download(ticker, range_=DEFAULT_RANGE, interval='1d', allow_stale=None):
+    """True si load_ticker tendría que esperar a Yahoo para servir `ticker` (sin force ni local_only)."""
+    if allow_stale is None:
+        allow_stale = STALE_WHILE_REVALIDATE
+    info = get_fetch_info(ticker, storage_interval(interval))
+    if not info:
+        return True
+    state = cache_state(info, range_, storage_interval(interval))
+    return state == 'uncovered' or (state == 'stale' and not allow_stale)
+
+def refresh_candidates():
+    """
+    Tickers a refrescar en segundo plano: los del carrusel y los de la tabla
+    `queries` cuyos datos superan REFRESH_AHEAD * CACHE_TTL de antigüedad.
+    La prioridad crece con el número de consultas y decae con las horas desde la última.
+    Mientras el circuit breaker de Yahoo está abierto no se propone ninguno.
+    """
+    if yahoo.breaker.state == yahoo.breaker.OPEN:
+        return []
+    with get_db() as conn:
+        c = conn.cursor()
+        c.execute("SELECT ticker, hits, (julianday('now') - julianday(last_query)) * 24 FROM queries")
+        queried = c.fetchall()
+        c.execute("SELECT ticker, fetched_at FROM fetches WHERE fetched_at IS NOT NULL")
+        fetched = dict(c.fetchall())
+
+    priorities = {company['ticker']: 1.0 for company in COMPANIES}
+    for ticker, hits, hours in queried:
+        priorities[ticker] = priorities.get(ticker, 0.0) + max(hits, 1) / (1.0 + max(hours or 0.0, 0.0))
+
+    threshold = time.time() - CACHE_TTL * REFRESH_AHEAD
+    candidates = [
+        (ticker, priority) for ticker, priority in priorities.items()
+        if (fetched.get(ticker) or 0) < threshold
+    ]
+    candidates.sort(key=lambda item: item[1], reverse=True)
+    return candidates
+
+refresh_scheduler = RefreshScheduler(
+    refresh_ticker,
+    refresh_candidates,
+    workers=REFRESH_WORKERS,
+    queue_size=REFRESH_QUEUE_SIZE,
+    interval=REFRESH_INTERVAL,
+    budget_per_minute=REFRESH_BUDGET_PER_MINUTE,
+)
+
+def start_background_refresh():
+    if REFRESH_ENABLED:
+        refresh_scheduler.start()
+
+def stop_background_refresh():
+    refresh_scheduler.stop()
+
+atexit.register(stop_background_refresh)
+
+# Versión del registro de consultas; cambia con cada escritura e invalida el
+# fragmento cacheado de la lista de consultas del índice.
+_queries_version = 0
+
+def invalidate_queries():
+    global _queries_version
+    _queries_version += 1
+
+def write_query_log(entries):
+    """Escribe un lote {ticker: (last_query, hits)} del búfer de consultas en una transacción."""
+    with get_db(immediate=True) as conn:
+        conn.executemany(
+            "INSERT INTO queries (ticker, last_query, hits) VALUES (?, ?, ?) "
+            "ON CONFLICT(ticker) DO UPDATE SET last_query = MAX(COALESCE(queries.last_query, ''), excluded.last_query), "
+            "hits = queries.hits + excluded.hits",
+            [(ticker, last_query, hits) for ticker, (last_query, hits) in entries.items()]
+        )
+
+query_log = WriteBehindCounter(write_query_log, interval=QUERY_LOG_FLUSH_INTERVAL, max_pending=QUERY_LOG_MAX_PENDING)
+atexit.register(query_log.stop)
+
 def update_query_log(ticker):
-    conn = sqlite3.connect(DATABASE)
-    c = conn.cursor()
-    c.execute("INSERT OR REPLACE INTO queries (ticker, last_query) VALUES (?, datetime('now'))", (ticker,))
-    conn.commit()
-    conn.close()
+    """Registra una consulta de `ticker` en el búfer; no escribe en la base de datos."""
+    now = datetime.datetime.now(datetime.timezone.utc).strftime('%Y-%m-%d %H:%M:%S')
+    query_log.hit(ticker, now)
+    invalidate_queries()
 
 def get_queries():
-    conn = sqlite3.connect(DATABASE)
-    c = conn.cursor()
-    c.execute("SELECT ticker, last_query FROM queries ORDER BY last_query DESC")
-    rows = c.fetchall()
-    conn.close()
-    return rows
+    """(ticker, last_query) de las consultas guardadas y pendientes, de la más reciente a la más antigua."""
+    with get_db() as conn:
+        c = conn.cursor()
+        c.execute("SELECT ticker, last_query FROM queries ORDER BY last_query DESC")
+        rows = c.fetchall()
+    pending = query_log.pending()
+    if not pending:
+        return rows
+    merged = dict(rows)
+    for ticker, (last_query, _) in pending.items():
+        if not merged.get(ticker) or last_query > merged[ticker]:
+            merged[ticker] = last_query
+    return sorted(merged.items(), key=lambda row: row[1] or '', reverse=True)
 
 def clear_queries():
-    conn = sqlite3.connect(DATABASE)
-    c = conn.cursor()
-    c.execute("DELETE FROM queries")
-    conn.commit()
-    conn.close()
+    query_log.discard()
+    with get_db() as conn:
+        c = conn.cursor()
+        c.execute("DELETE FROM queries")
+    invalidate_queries()
 
 def delete_query(ticker):
-    conn = sqlite3.connect(DATABASE)
-    c = conn.cursor()
-    c.execute("DELETE FROM queries WHERE ticker = ?", (ticker,))
-    conn.commit()
-    conn.close()
+    query_log.discard(ticker)
+    with get_db() as conn:
+        c = conn.cursor()
+        c.execute("DELETE FROM queries WHERE ticker = ?", (ticker,))
+    invalidate_queries()
 
 
 index_html = '''
@@ -279,8 +1369,34 @@ index_html = '''
             <i class="bi bi-search"></i> Buscar
           </button>
         </form>
+        <form method="get" action="{{ url_for('compare') }}" class="form-inline justify-content-center mt-2">
+          <input type="text" name="tickers" class="form-control mr-2" placeholder="Comparar (ej. AAPL,MSFT,GOOGL)">
+          <button type="submit" class="btn btn-outline-primary">
+            <i class="bi bi-bar-chart-line"></i> Comparar
+          </button>
+        </form>
+        <a href="{{ url_for('screener', preset='gainers') }}" class="btn btn-link mt-2">
+          <i class="bi bi-funnel"></i> Screener
+        </a>
       </section>
       <hr>
+      {{ carousel }}
+      <hr>
+      {{ queries_list }}
+      {{ site_info }}
+      
+      <footer>
+        <small>Luigi Adducci // Consulta datos bursátiles // &copy; 2025</small>
+      </footer>
+    </div>
+    
+    <script src="https://code.jquery.com/jquery-3.5.1.slim.min.js"></script>
+    <script src="https://cdn.jsdelivr.net/npm/bootstrap@4.5.2/dist/js/bootstrap.bundle.min.js"></script>
+  </body>
+</html>
+'''
+
+carousel_html = '''
       <section class="carousel-section">
         <div id="companyCarousel" 
              class="carousel slide" 
@@ -314,7 +1430,9 @@ index_html = '''
           </div>
         </div>
       </section>
-      <hr>
+'''
+
+queries_html = '''
       <section class="queries-section">
         <h3 class="text-center">Consultas realizadas</h3>
         <div class="row justify-content-center">
@@ -341,6 +1459,9 @@ index_html = '''
           </div>
         </div>
       </section>
+'''
+
+site_info_html = '''
       <section class="site-info">
         <h4>Información del sitio</h4>
         <p><strong>Desarrollo y Tecnología:</strong> Este sitio fue desarrollado utilizando Python y el framework Flask, lo que permite crear aplicaciones web ágiles y escalables. La aplicación ha sido diseñada de manera modular y se basa en tecnologías modernas para ofrecer una experiencia de usuario fluida y profesional.</p>
@@ -350,21 +1471,182 @@ index_html = '''
         <p><strong>Contribución y Contacto:</strong> El proyecto es de código abierto y cualquier desarrollador o interesado puede contribuir o sugerir mejoras. Para reportar errores, proponer nuevas funcionalidades o colaborar en el desarrollo, ponte en contacto con el autor a través de los canales oficiales.</p>
         <p><strong>Disclaimer:</strong> La información presentada en este sitio tiene fines meramente informativos y no constituye asesoramiento financiero. Se recomienda realizar análisis adicionales antes de tomar cualquier decisión de inversión.</p>
       </section>
-      
-      <footer>
-        <small>Luigi Adducci // Consulta datos bursátiles // &copy; 2025</small>
-      </footer>
-    </div>
-    
-    <script src="https://code.jquery.com/jquery-3.5.1.slim.min.js"></script>
-    <script src="https://cdn.jsdelivr.net/npm/bootstrap@4.5.2/dist/js/bootstrap.bundle.min.js"></script>
-  </body>
-</html>
 '''
 
 
 
 
+TEMPLATES = {}
+_fragments = {}
+_template_hashes = {}
+_asset_versions = {}
+
+def compile_templates():
+    """Compila una sola vez las plantillas del módulo y las guarda en TEMPLATES."""
+    sources = {
+        'index': index_html,
+        'carousel': carousel_html,
+        'queries': queries_html,
+        'site_info': site_info_html,
+        'company': company_html,
+        'compare': compare_html,
+        'screener': screener_html,
+        'error': error_html,
+    }
+    for name, source in sources.items():
+        TEMPLATES[name] = app.jinja_env.from_string(source)
+        _template_hashes[name] = hashlib.sha1(source.encode()).hexdigest()[:12]
+
+def render_page(name, **context):
+    app.update_template_context(context)
+    with stage('render'):
+        return TEMPLATES[name].render(context)
+
+def stream_page(name, **context):
+    """
+    Renderiza una plantilla de forma incremental, agrupando la salida en bloques de
+    unos STREAM_CHUNK_SIZE caracteres. Los iterables del contexto se consumen a medida
+    que se renderizan, por lo que la memoria no crece con el número de filas.
+    """
+    app.update_template_context(context)
+    route = _current_route()
+    buffer, size, elapsed = [], 0, 0.0
+    start = time.perf_counter()
+    for piece in TEMPLATES[name].generate(context):
+        buffer.append(piece)
+        size += len(piece)
+        if size >= STREAM_CHUNK_SIZE:
+            elapsed += time.perf_counter() - start
+            yield ''.join(buffer)
+            buffer, size = [], 0
+            start = time.perf_counter()
+    elapsed += time.perf_counter() - start
+    STAGE_SECONDS.observe(elapsed, route=route, stage='render')
+    if buffer:
+        yield ''.join(buffer)
+
+def render_fragment(name, version=0, context=dict):
+    """
+    Fragmento HTML cacheado por (nombre, versión); `context` es una función que
+    retorna el contexto y solo se llama cuando hay que volver a renderizar. Las URLs
+    generadas dependen de la raíz de la aplicación, por lo que también forma parte de la clave.
+    """
+    key = (name, request.script_root)
+    cached = _fragments.get(key)
+    if cached is not None and cached[0] == version:
+        CACHE_REQUESTS.inc(cache='fragment', result='hit')
+        return cached[1]
+    CACHE_REQUESTS.inc(cache='fragment', result='miss')
+    html = Markup(render_page(name, **context()))
+    _fragments[key] = (version, html)
+    return html
+
+def cache_validators(ticker, template, *parts):
+    """
+    (etag, last_modified) de una página generada a partir del histórico de `ticker`,
+    derivados de su versión de datos, la plantilla usada y `parts` (p. ej. la URL).
+    Retorna (None, None) si el ticker no tiene versión registrada.
+    """
+    version = get_data_version(ticker)
+    if version is None:
+        return None, None
+    key = repr((ticker, version, _template_hashes[template]) + parts)
+    etag = hashlib.sha1(key.encode()).hexdigest()
+    last_modified = datetime.datetime.fromtimestamp(int(version), datetime.timezone.utc)
+    return etag, last_modified
+
+def is_not_modified(etag, last_modified):
+    if etag is None:
+        return False
+    if request.if_none_match:
+        return request.if_none_match.contains(etag)
+    if request.if_modified_since:
+        return last_modified <= request.if_modified_since
+    return False
+
+def with_validators(response, etag, last_modified):
+    if etag is not None:
+        response.set_etag(etag)
+        response.last_modified = last_modified
+        response.cache_control.no_cache = True
+    return response
+
+def not_modified_response(etag, last_modified):
+    return with_validators(Response(status=304), etag, last_modified)
+
+def asset_version(filename):
+    """Huella corta del contenido de un archivo estático, calculada una vez por archivo."""
+    version = _asset_versions.get(filename)
+    if version is None:
+        path = os.path.join(app.static_folder, filename)
+        try:
+            with open(path, 'rb') as f:
+                version = hashlib.sha1(f.read()).hexdigest()[:10]
+        except OSError:
+            version = ''
+        _asset_versions[filename] = version
+    return version
+
+@app.url_defaults
+def _fingerprint_static(endpoint, values):
+    if endpoint == 'static' and 'filename' in values and 'v' not in values:
+        version = asset_version(values['filename'])
+        if version:
+            values['v'] = version
+
+@app.after_request
+def _cache_static(response):
+    if request.endpoint == 'static' and request.args.get('v') and response.status_code in (200, 304):
+        response.cache_control.no_cache = None
+        response.cache_control.public = True
+        response.cache_control.max_age = STATIC_MAX_AGE
+        response.cache_control.immutable = True
+    return response
+
+@app.before_request
+def _start_scheduler():
+    # start() toma el lock del planificador: si dos primeras peticiones llegan a la vez, solo una arranca hilos.
+    if REFRESH_ENABLED and not refresh_scheduler.running:
+        start_background_refresh()
+
+@app.before_request
+def _start_request_metrics():
+    g.request_started = time.perf_counter()
+    if PROFILE_SAMPLE_RATE and random.random() < PROFILE_SAMPLE_RATE:
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+        except ValueError:
+            # Ya hay otro perfilador activo en este hilo.
+            return
+        g.profiler = profiler
+
+@app.after_request
+def _record_request_metrics(response):
+    profiler = g.pop('profiler', None)
+    if profiler is not None:
+        profiler.disable()
+        dump_profile(profiler)
+    started = g.pop('request_started', None)
+    if started is not None:
+        REQUEST_SECONDS.observe(time.perf_counter() - started, route=request.endpoint or 'unknown',
+                                method=request.method, status=str(response.status_code))
+    return response
+
+def dump_profile(profiler):
+    """
+    Guarda el perfil de la petición actual en PROFILE_DIR: el binario .prof (para
+    pstats, snakeviz o un generador de flame graphs) y un resumen .txt ordenado por
+    tiempo acumulado.
+    """
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    name = f"{time.strftime('%Y%m%d-%H%M%S')}-{request.endpoint or 'unknown'}-{os.getpid()}-{threading.get_ident()}"
+    path = os.path.join(PROFILE_DIR, name)
+    profiler.dump_stats(path + '.prof')
+    with open(path + '.txt', 'w') as f:
+        f.write(f"{request.method} {request.full_path}\n\n")
+        pstats.Stats(profiler, stream=f).sort_stats('cumulative').print_stats(40)
+
 @app.route('/', methods=['GET', 'POST'])
 def index():
     if request.method == 'POST':
@@ -372,59 +1654,359 @@ def index():
         if ticker:
             ticker = ticker.upper().strip()
             return redirect(url_for('company', ticker=ticker))
-    queries = get_queries()
-
-    companies = [
-        {"name": "Apple Inc.", "ticker": "AAPL", "image": "apple.png"},
-        {"name": "Alphabet Inc.", "ticker": "GOOGL", "image": "google.png"},
-        {"name": "Microsoft Corp.", "ticker": "MSFT", "image": "microsoft.png"},
-        {"name": "Amazon.com Inc.", "ticker": "AMZN", "image": "amazon.png"},
-        {"name": "Meta Platforms Inc.", "ticker": "META", "image": "facebook.png"},
-        {"name": "Tesla Inc.", "ticker": "TSLA", "image": "tesla.png"},
-        {"name": "Netflix Inc.", "ticker": "NFLX", "image": "netflix.png"},
-        {"name": "NVIDIA Corp.", "ticker": "NVDA", "image": "nvidia.png"},
-        {"name": "Intel Corp.", "ticker": "INTC", "image": "intel.png"},
-        {"name": "Adobe Inc.", "ticker": "ADBE", "image": "adobe.png"}
-    ]
-    return render_template_string(index_html, queries=queries, companies=companies)
+    return render_page('index',
+                       carousel=render_fragment('carousel', context=lambda: {'companies': COMPANIES}),
+                       queries_list=render_fragment('queries', _queries_version, lambda: {'queries': get_queries()}),
+                       site_info=render_fragment('site_info'))
 
 @app.route('/company/<ticker>')
 def company(ticker):
     sort = request.args.get('sort', 'date')
     order = request.args.get('order', 'ASC')
-    history, company_name = get_price_history(ticker)
-    if not history:
-        return render_template_string(error_html,
-                                      error_code=404,
-                                      error_message="No Encontrado",
-                                      error_description=f"No se encontró información para el ticker: {ticker}")
-    save_history_to_db(ticker, history)
+    period, interval = resolve_view(request.args.get('range'), request.args.get('interval'))
+    force = request.args.get('refresh') == '1'
+    # Cambiar el orden de la tabla solo reordena datos ya guardados.
+    resorting = 'sort' in request.args or 'order' in request.args
+    company_name = load_ticker(ticker, force=force, local_only=resorting, range_=period, interval=interval)
+    if not company_name:
+        return render_page('error',
+                           error_code=404,
+                           error_message="No Encontrado",
+                           error_description=f"No se encontró información para el ticker: {ticker}")
     update_query_log(ticker)
-    records = get_history_from_db(ticker, sort_column=sort, order=order)
-    return render_template_string(company_html, 
-                                  ticker=ticker,
-                                  company_name=company_name,
-                                  records=records,
-                                  hide_nav=False)
+    etag, last_modified = cache_validators(ticker, 'company', company_name, request.full_path)
+    if is_not_modified(etag, last_modified):
+        return not_modified_response(etag, last_modified)
+    try:
+        limit = min(max(int(request.args.get('limit', PAGE_SIZE)), 1), MAX_PAGE_SIZE)
+    except ValueError:
+        limit = PAGE_SIZE
+    records, next_cursor, prev_cursor = get_history_page(ticker, sort_column=sort, order=order, limit=limit,
+                                                         after=request.args.get('after'),
+                                                         before=request.args.get('before'),
+                                                         interval=interval, range_=period)
+    indicators = get_indicator_map(ticker, (r[0] for r in records)) if interval == '1d' else None
+    rendered = render_page('company',
+                           ticker=ticker,
+                           company_name=company_name,
+                           records=records,
+                           indicators=indicators,
+                           sort=sort,
+                           order=order.upper(),
+                           period=period,
+                           interval=interval,
+                           ranges=list(RANGE_DAYS),
+                           intervals=DAILY_INTERVALS + INTRADAY_INTERVALS,
+                           limit=limit,
+                           next_cursor=next_cursor,
+                           prev_cursor=prev_cursor,
+                           hide_nav=False)
+    return with_validators(make_response(rendered), etag, last_modified)
 
 @app.route('/company/<ticker>/download')
 def download_html(ticker):
-    records = get_history_from_db(ticker)
-    if not records:
-        return render_template_string(error_html,
-                                      error_code=404,
-                                      error_message="No Encontrado",
-                                      error_description=f"No se encontró información para el ticker: {ticker}")
-    rendered = render_template_string(company_html, 
-                                      ticker=ticker, 
-                                      company_name=ticker,
-                                      records=records, 
-                                      hide_nav=True)
-    response = make_response(rendered)
-    response.headers['Content-Disposition'] = f'attachment; filename={ticker}_historial.html'
-    response.headers['Content-Type'] = 'text/html'
+    period, interval = resolve_view(request.args.get('range'), request.args.get('interval'))
+    if not has_history(ticker, storage_interval(interval)):
+        return render_page('error',
+                           error_code=404,
+                           error_message="No Encontrado",
+                           error_description=f"No se encontró información para el ticker: {ticker}")
+    etag, last_modified = cache_validators(ticker, 'company', 'download', period, interval)
+    if is_not_modified(etag, last_modified):
+        return not_modified_response(etag, last_modified)
+    chunks = stream_page('company',
+                         ticker=ticker,
+                         company_name=ticker,
+                         records=iter_history(ticker, interval=interval, range_=period),
+                         indicators=None,
+                         sort='date',
+                         order='ASC',
+                         period=period,
+                         interval=interval,
+                         hide_nav=True)
+    response = Response(stream_with_context(chunks), mimetype='text/html')
+    response.headers['Content-Disposition'] = f'attachment; filename={ticker}_{period}_{interval}_historial.html'
+    return with_validators(response, etag, last_modified)
+
+@app.route('/export')
+def export_history():
+    """
+    Exporta el histórico en streaming.
+    Parámetros: tickers=AAPL,MSFT (vacío = todos), format=csv|ndjson|columnar,
+    compression=gzip|deflate|bz2|xz (zstd si el intérprete lo soporta),
+    start/end=YYYY-MM-DD.
+    """
+    tickers = [t.strip().upper() for t in request.args.get('tickers', '').split(',') if t.strip()]
+    fmt = request.args.get('format', 'csv')
+    compression = request.args.get('compression') or None
+    if fmt not in FORMATS:
+        return jsonify(error=f"Formato no soportado: {fmt}", formats=sorted(FORMATS)), 400
+    if compression and compression not in COMPRESSIONS:
+        return jsonify(error=f"Compresión no soportada: {compression}", compressions=sorted(COMPRESSIONS)), 400
+    dates = {}
+    for name in ('start', 'end'):
+        value = request.args.get(name)
+        if value:
+            try:
+                dates[name] = datetime.date.fromisoformat(value).isoformat()
+            except ValueError:
+                return jsonify(error=f"Fecha inválida en {name}: {value}"), 400
+
+    rows = iter_export_rows(tickers, dates.get('start'), dates.get('end'))
+    chunks, content_type, extension = export_stream(rows, fmt, compression)
+    name = '_'.join(tickers) if 0 < len(tickers) <= 5 else 'historial'
+    response = Response(stream_with_context(chunks), mimetype=content_type)
+    response.headers['Content-Disposition'] = f'attachment; filename={name}.{extension}'
     return response
 
+_compare_pool = ThreadPoolExecutor(max_workers=COMPARE_WORKERS, thread_name_prefix='compare')
+_comparisons = OrderedDict()
+_comparisons_lock = threading.Lock()
+
+def _load_for_compare(ticker, range_):
+    try:
+        return load_ticker(ticker, range_=range_)
+    except Exception:
+        app.logger.exception("Error al descargar %s para comparar", ticker)
+        return None
+
+def load_tickers(tickers, range_=DEFAULT_RANGE):
+    """
+    Carga varios tickers a la vez con el grupo de COMPARE_WORKERS hilos: el tiempo
+    total depende del ticker más lento y no de la suma. Retorna {ticker: nombre o None}.
+    """
+    return dict(zip(tickers, _compare_pool.map(_load_for_compare, tickers, repeat(range_))))
+
+def get_close_series(ticker, range_=None):
+    if HISTORY_BACKEND == 'columnar':
+        series = columnar_history(ticker)
+        if series is None:
+            return []
+        start = _columnar_start(series, range_)
+        return list(zip(series.dates(start), series.adj_close[start:]))
+    table, where, params = _history_source(ticker, '1d', range_)
+    with get_db() as conn:
+        return conn.execute(f"SELECT date, adj_close FROM {table} WHERE {where} ORDER BY date", params).fetchall()
+
+def get_comparison(tickers, range_=DEFAULT_RANGE):
+    """
+    compare_series de `tickers` en `range_`, cacheada por conjunto de tickers y
+    rango mientras no cambie la versión de datos de ninguno de ellos. La caché
+    guarda los tickers ordenados y el resultado se devuelve en el orden pedido.
+    """
+    ordered = tuple(sorted(tickers))
+    key = (ordered, range_)
+    versions = tuple(get_data_version(t) for t in ordered)
+    with _comparisons_lock:
+        cached = _comparisons.get(key)
+        if cached is not None and cached[0] == versions:
+            _comparisons.move_to_end(key)
+            CACHE_REQUESTS.inc(cache='compare', result='hit')
+            return reorder(cached[1], tickers)
+    CACHE_REQUESTS.inc(cache='compare', result='miss')
+    series = {t: get_close_series(t, range_) for t in ordered}
+    with stage('compare'):
+        result = compare_series(ordered, series)
+    with _comparisons_lock:
+        _comparisons[key] = (versions, result)
+        _comparisons.move_to_end(key)
+        while len(_comparisons) > COMPARE_CACHE_SIZE:
+            _comparisons.popitem(last=False)
+    return reorder(result, tickers)
+
+@app.route('/compare')
+def compare():
+    """
+    Compara varios tickers: ?tickers=AAPL,MSFT&range=1y. Con format=json retorna
+    los datos completos, incluido el rendimiento relativo de cada fecha.
+    """
+    tickers = list(dict.fromkeys(t.strip().upper() for t in request.args.get('tickers', '').split(',') if t.strip()))
+    period, _ = resolve_view(request.args.get('range'), '1d')
+    as_json = request.args.get('format') == 'json'
+    error = None
+    if len(tickers) < 2:
+        error = "Indica al menos dos tickers separados por comas."
+    elif len(tickers) > MAX_COMPARE_TICKERS:
+        error = f"Se pueden comparar hasta {MAX_COMPARE_TICKERS} tickers a la vez."
+    if error:
+        if as_json:
+            return jsonify(error=error), 400
+        return render_page('error', error_code=400, error_message="Solicitud inválida", error_description=error), 400
+
+    names = load_tickers(tickers, period)
+    found = [t for t in tickers if names[t]]
+    missing = [t for t in tickers if not names[t]]
+    if len(found) < 2:
+        error = f"No se encontró información suficiente para comparar: {', '.join(missing)}"
+        if as_json:
+            return jsonify(error=error, missing=missing), 404
+        return render_page('error', error_code=404, error_message="No Encontrado", error_description=error), 404
+    for ticker in found:
+        update_query_log(ticker)
+
+    result = get_comparison(found, period)
+    if as_json:
+        return jsonify(range=period, names={t: names[t] for t in found}, missing=missing, **result)
+    return render_page('compare',
+                       result=result,
+                       names=names,
+                       missing=missing,
+                       period=period,
+                       ranges=list(RANGE_DAYS),
+                       tickers_param=','.join(found))
+
+@app.route('/api/indicators/<ticker>')
+def indicators_api(ticker):
+    """
+    Indicadores técnicos diarios de `ticker` en JSON.
+    Parámetros: range=1mo|...|max (por defecto 1y), start/end=YYYY-MM-DD.
+    """
+    period, _ = resolve_view(request.args.get('range'), '1d')
+    dates = {}
+    for name in ('start', 'end'):
+        value = request.args.get(name)
+        if value:
+            try:
+                dates[name] = datetime.date.fromisoformat(value).isoformat()
+            except ValueError:
+                return jsonify(error=f"Fecha inválida en {name}: {value}"), 400
+    company_name = load_ticker(ticker, range_=period)
+    if not company_name:
+        return jsonify(error=f"No se encontró información para el ticker: {ticker}"), 404
+    rows = get_indicators(ticker, period, dates.get('start'), dates.get('end'))
+    return jsonify(ticker=ticker,
+                   company_name=company_name,
+                   range=period,
+                   columns=['date', *INDICATOR_COLUMNS],
+                   rows=rows)
+
+def screen(filters=None, sort='change_pct', order='DESC', limit=SCREENER_PAGE_SIZE, since=None):
+    """
+    Tickers de ticker_summary que cumplen `filters` ({'min_<columna>': valor, 'max_<columna>': valor}),
+    ordenados por `sort` y con último día desde `since`. No lee la tabla history.
+    Retorna filas (ticker, company_name, *SUMMARY_COLUMNS).
+    """
+    if sort not in SCREENER_COLUMNS:
+        raise ValueError(f"Columna no soportada: {sort}")
+    order = 'ASC' if order.upper() == 'ASC' else 'DESC'
+    where, params = [f"s.{sort} IS NOT NULL"], []
+    for key, value in (filters or {}).items():
+        bound, _, column = key.partition('_')
+        if bound not in ('min', 'max') or column not in SCREENER_COLUMNS:
+            raise ValueError(f"Filtro no soportado: {key}")
+        where.append(f"s.{column} {'>=' if bound == 'min' else '<='} ?")
+        params.append(value)
+    if since:
+        where.append("s.date >= ?")
+        params.append(since)
+    with stage('query'), get_db() as conn:
+        return conn.execute(
+            f"SELECT s.ticker, f.company_name, {', '.join('s.' + column for column in SUMMARY_COLUMNS)} "
+            f"FROM ticker_summary s LEFT JOIN fetches f ON f.ticker = s.ticker "
+            f"WHERE {' AND '.join(where)} ORDER BY s.{sort} {order}, s.ticker {order} LIMIT ?",
+            params + [limit]
+        ).fetchall()
+
+@app.route('/screener')
+def screener():
+    """
+    Filtra y ordena todos los tickers guardados usando solo su resumen (ticker_summary).
+    Parámetros: preset=gainers|losers|most_active|unusual_volume|new_highs|new_lows,
+    sort=<columna>, order=asc|desc, min_<columna>/max_<columna>=número,
+    since=YYYY-MM-DD (último día mínimo), limit y format=json.
+    """
+    as_json = request.args.get('format') == 'json'
+
+    def invalid(error):
+        if as_json:
+            return jsonify(error=error, columns=SCREENER_COLUMNS, presets=sorted(SCREENER_PRESETS)), 400
+        return render_page('error', error_code=400, error_message="Solicitud inválida", error_description=error), 400
+
+    preset = request.args.get('preset') or None
+    if preset is not None and preset not in SCREENER_PRESETS:
+        return invalid(f"Consulta predefinida no soportada: {preset}")
+    filters, sort, order = SCREENER_PRESETS.get(preset, ({}, 'change_pct', 'DESC'))
+    filters = dict(filters)
+    sort = request.args.get('sort', sort)
+    if sort not in SCREENER_COLUMNS:
+        return invalid(f"Columna no soportada: {sort}")
+    order = request.args.get('order', order).upper()
+    if order not in ('ASC', 'DESC'):
+        order = 'DESC'
+    for key, value in request.args.items():
+        if key.startswith(('min_', 'max_')):
+            if key[4:] not in SCREENER_COLUMNS:
+                return invalid(f"Filtro no soportado: {key}")
+            try:
+                filters[key] = float(value)
+            except ValueError:
+                return invalid(f"Valor inválido en {key}: {value}")
+    since = request.args.get('since')
+    if since:
+        try:
+            since = datetime.date.fromisoformat(since).isoformat()
+        except ValueError:
+            return invalid(f"Fecha inválida en since: {since}")
+    try:
+        limit = min(max(int(request.args.get('limit', SCREENER_PAGE_SIZE)), 1), MAX_SCREENER_PAGE_SIZE)
+    except ValueError:
+        limit = SCREENER_PAGE_SIZE
+
+    rows = screen(filters, sort, order, limit, since)
+    if as_json:
+        return jsonify(preset=preset, sort=sort, order=order, filters=filters,
+                       columns=['ticker', 'company_name', *SUMMARY_COLUMNS], rows=rows)
+    return render_page('screener',
+                       rows=[dict(zip(['ticker', 'company_name', *SUMMARY_COLUMNS], row)) for row in rows],
+                       preset=preset,
+                       presets=list(SCREENER_PRESETS),
+                       sort=sort,
+                       order=order,
+                       windows=list(SUMMARY_RETURN_WINDOWS),
+                       json_url=url_for('screener', **(request.args.to_dict() | {'format': 'json'})))
+
+@metrics_registry.collector
+def _component_metrics():
+    upstream = yahoo.stats()
+    flight = _refresh_flight.stats()
+    scheduler = refresh_scheduler.status()
+    query_stats = query_log.stats()
+    return [
+        ('finquery_upstream_calls_total', 'counter', 'Llamadas al cliente de Yahoo según su resultado.',
+         [({'result': name}, upstream[name]) for name in ('requests', 'retries', 'failures', 'rejected')]),
+        ('finquery_upstream_circuit_state', 'gauge', 'Estado del circuit breaker de Yahoo (1 = estado actual).',
+         [({'state': state}, int(upstream['circuit'] == state)) for state in ('closed', 'open', 'half_open')]),
+        ('finquery_singleflight_total', 'counter', 'Descargas ejecutadas (leader) y peticiones que esperaron a otra (coalesced).',
+         [({'role': 'leader'}, flight['leaders']), ({'role': 'coalesced'}, flight['coalesced'])]),
+        ('finquery_refresh_queue_depth', 'gauge', 'Tickers pendientes en la cola de actualización en segundo plano.',
+         [({}, scheduler['queue_depth'])]),
+        ('finquery_db_pool_idle_connections', 'gauge', 'Conexiones SQLite libres en el pool.',
+         [({}, _db_pool.qsize())]),
+        ('finquery_query_log_pending', 'gauge', 'Tickers con consultas aún no escritas en la base de datos.',
+         [({}, query_stats['pending'])]),
+        ('finquery_query_log_flushes_total', 'counter', 'Lotes del registro de consultas escritos y fallidos.',
+         [({'result': 'ok'}, query_stats['flushes']), ({'result': 'error'}, query_stats['errors'])]),
+    ]
+
+@app.route('/metrics')
+def metrics():
+    return Response(metrics_registry.render(), mimetype='text/plain; version=0.0.4')
+
+@app.route('/status/refresh')
+def refresh_status():
+    status = refresh_scheduler.status()
+    status['singleflight'] = _refresh_flight.stats()
+    status['upstream'] = yahoo.stats()
+    status['query_log'] = query_log.stats()
+    with get_db() as conn:
+        c = conn.cursor()
+        c.execute("SELECT ticker, fetched_at FROM fetches WHERE fetched_at IS NOT NULL ORDER BY fetched_at DESC")
+        status['fetched_at'] = {
+            ticker: datetime.datetime.fromtimestamp(fetched_at).isoformat(timespec='seconds')
+            for ticker, fetched_at in c.fetchall()
+        }
+    return jsonify(status)
+
 @app.route('/clear_queries')
 def clear_queries_route():
     clear_queries()
@@ -465,21 +2047,54 @@ company_html = '''
             {% endif %}
         </div>
         
-        <a href="{{ url_for('download_html', ticker=ticker) }}" class="btn btn-success download-btn">
+        <a href="{{ url_for('download_html', ticker=ticker, range=period, interval=interval) }}" class="btn btn-success download-btn">
             <i class="bi bi-download"></i> Descargar HTML
         </a>
+        {% if not hide_nav %}
+        <a href="{{ url_for('company', ticker=ticker, refresh=1, range=period, interval=interval) }}" class="btn btn-outline-primary download-btn">
+            <i class="bi bi-arrow-clockwise"></i> Actualizar datos
+        </a>
+        {% endif %}
+
+        {% if not hide_nav %}
+        <div class="d-flex flex-wrap mb-3">
+            <div class="btn-group btn-group-sm mr-3 mb-2" role="group" aria-label="Rango">
+                {% for r in ranges %}
+                <a href="{{ url_for('company', ticker=ticker, range=r) }}"
+                   class="btn {% if r == period %}btn-primary{% else %}btn-outline-primary{% endif %}">{{ r }}</a>
+                {% endfor %}
+            </div>
+            <div class="btn-group btn-group-sm mb-2" role="group" aria-label="Intervalo">
+                {% for i in intervals %}
+                <a href="{{ url_for('company', ticker=ticker, range=period, interval=i) }}"
+                   class="btn {% if i == interval %}btn-secondary{% else %}btn-outline-secondary{% endif %}">{{ i }}</a>
+                {% endfor %}
+            </div>
+        </div>
+        {% endif %}
 
         <div class="table-responsive">
             <table class="table table-bordered table-hover">
                 <thead class="thead-dark">
                     <tr>
-                        <th><a href="?sort=date&order={% if sort == 'date' and order == 'ASC' %}DESC{% else %}ASC{% endif %}">Fecha</a></th>
-                        <th><a href="?sort=open&order={% if sort == 'open' and order == 'ASC' %}DESC{% else %}ASC{% endif %}">Apertura</a></th>
-                        <th><a href="?sort=high&order={% if sort == 'high' and order == 'ASC' %}DESC{% else %}ASC{% endif %}">Máximo</a></th>
-                        <th><a href="?sort=low&order={% if sort == 'low' and order == 'ASC' %}DESC{% else %}ASC{% endif %}">Mínimo</a></th>
-                        <th><a href="?sort=close&order={% if sort == 'close' and order == 'ASC' %}DESC{% else %}ASC{% endif %}">Cierre</a></th>
-                        <th><a href="?sort=adj_close&order={% if sort == 'adj_close' and order == 'ASC' %}DESC{% else %}ASC{% endif %}">Cierre Ajustado</a></th>
-                        <th><a href="?sort=volume&order={% if sort == 'volume' and order == 'ASC' %}DESC{% else %}ASC{% endif %}">Volumen</a></th>
+                        <th><a href="{{ url_for('company', ticker=ticker, sort='date', order=('DESC' if sort == 'date' and order == 'ASC' else 'ASC'), range=period, interval=interval) }}">Fecha</a></th>
+                        <th><a href="{{ url_for('company', ticker=ticker, sort='open', order=('DESC' if sort == 'open' and order == 'ASC' else 'ASC'), range=period, interval=interval) }}">Apertura</a></th>
+                        <th><a href="{{ url_for('company', ticker=ticker, sort='high', order=('DESC' if sort == 'high' and order == 'ASC' else 'ASC'), range=period, interval=interval) }}">Máximo</a></th>
+                        <th><a href="{{ url_for('company', ticker=ticker, sort='low', order=('DESC' if sort == 'low' and order == 'ASC' else 'ASC'), range=period, interval=interval) }}">Mínimo</a></th>
+                        <th><a href="{{ url_for('company', ticker=ticker, sort='close', order=('DESC' if sort == 'close' and order == 'ASC' else 'ASC'), range=period, interval=interval) }}">Cierre</a></th>
+                        <th><a href="{{ url_for('company', ticker=ticker, sort='adj_close', order=('DESC' if sort == 'adj_close' and order == 'ASC' else 'ASC'), range=period, interval=interval) }}">Cierre Ajustado</a></th>
+                        <th><a href="{{ url_for('company', ticker=ticker, sort='volume', order=('DESC' if sort == 'volume' and order == 'ASC' else 'ASC'), range=period, interval=interval) }}">Volumen</a></th>
+                        {% if indicators is not none %}
+                        <th title="Media móvil simple de 20 sesiones del cierre ajustado">SMA 20</th>
+                        <th title="Media móvil simple de 50 sesiones del cierre ajustado">SMA 50</th>
+                        <th title="Media móvil exponencial de 20 sesiones">EMA 20</th>
+                        <th title="Índice de fuerza relativa (Wilder, 14 sesiones)">RSI 14</th>
+                        <th title="Banda de Bollinger superior (20 sesiones, 2 desviaciones)">Bollinger Sup.</th>
+                        <th title="Banda de Bollinger inferior (20 sesiones, 2 desviaciones)">Bollinger Inf.</th>
+                        <th title="Volatilidad anualizada de 20 sesiones">Volatilidad 20</th>
+                        <th title="Caída desde el máximo histórico">Drawdown</th>
+                        <th title="Volumen medio de 20 sesiones">Volumen Medio 20</th>
+                        {% endif %}
                     </tr>
                 </thead>
                 <tbody>
@@ -492,11 +2107,37 @@ company_html = '''
                         <td>{{ "%.2f"|format(record[4]) }}</td>
                         <td>{{ "%.2f"|format(record[5]) }}</td>
                         <td>{{ "{:,}".format(record[6]) }}</td>
+                        {% if indicators is not none %}
+                        {% set ind = indicators.get(record[0]) or (none,) * 9 %}
+                        {% for value in ind[:6] %}
+                        <td>{% if value is none %}-{% else %}{{ "%.2f"|format(value) }}{% endif %}</td>
+                        {% endfor %}
+                        {% for value in ind[6:8] %}
+                        <td>{% if value is none %}-{% else %}{{ "%.2f%%"|format(value * 100) }}{% endif %}</td>
+                        {% endfor %}
+                        <td>{% if ind[8] is none %}-{% else %}{{ "{:,.0f}".format(ind[8]) }}{% endif %}</td>
+                        {% endif %}
                     </tr>
                     {% endfor %}
                 </tbody>
             </table>
         </div>
+
+        {% if not hide_nav and (prev_cursor or next_cursor) %}
+        <nav>
+            <ul class="pagination justify-content-center">
+                <li class="page-item {% if not prev_cursor %}disabled{% endif %}">
+                    <a class="page-link" href="{{ url_for('company', ticker=ticker, sort=sort, order=order, limit=limit, range=period, interval=interval) }}">Inicio</a>
+                </li>
+                <li class="page-item {% if not prev_cursor %}disabled{% endif %}">
+                    <a class="page-link" href="{{ url_for('company', ticker=ticker, sort=sort, order=order, limit=limit, range=period, interval=interval, before=prev_cursor) }}">Anterior</a>
+                </li>
+                <li class="page-item {% if not next_cursor %}disabled{% endif %}">
+                    <a class="page-link" href="{{ url_for('company', ticker=ticker, sort=sort, order=order, limit=limit, range=period, interval=interval, after=next_cursor) }}">Siguiente</a>
+                </li>
+            </ul>
+        </nav>
+        {% endif %}
         
         <footer class="text-center mt-5">
             <small>Luigi Adducci // Consulta datos bursátiles // &copy; 2025</small>
@@ -506,6 +2147,189 @@ company_html = '''
 </html>
 '''
 
+compare_html = '''
+<!DOCTYPE html>
+<html>
+<head>
+    <title>Comparación - {{ result.tickers|join(', ') }}</title>
+    <link rel="stylesheet" href="https://stackpath.bootstrapcdn.com/bootstrap/4.5.2/css/bootstrap.min.css">
+    <link rel="stylesheet" href="https://cdn.jsdelivr.net/npm/bootstrap-icons@1.8.3/font/bootstrap-icons.css">
+    <style>
+        body { background-color: #F6F8FA; }
+        .container { margin-top: 30px; }
+        .table thead th { background-color: #276EF1; color: white; }
+        .table td.corr { text-align: center; }
+    </style>
+</head>
+<body>
+    <div class="container">
+        <div class="d-flex justify-content-between align-items-center mb-4">
+            <h1>Comparación</h1>
+            <a href="{{ url_for('index') }}" class="btn btn-secondary">
+                <i class="bi bi-arrow-left"></i> Volver
+            </a>
+        </div>
+
+        <div class="btn-group btn-group-sm mb-3" role="group" aria-label="Rango">
+            {% for r in ranges %}
+            <a href="{{ url_for('compare', tickers=tickers_param, range=r) }}"
+               class="btn {% if r == period %}btn-primary{% else %}btn-outline-primary{% endif %}">{{ r }}</a>
+            {% endfor %}
+        </div>
+        {% if missing %}
+        <div class="alert alert-warning">Sin datos para: {{ missing|join(', ') }}</div>
+        {% endif %}
+        {% if result.dates %}
+        <p>{{ result.dates|length }} sesiones comunes, del {{ result.dates[0] }} al {{ result.dates[-1] }}.</p>
+        {% endif %}
+
+        <h4>Rendimiento</h4>
+        <div class="table-responsive">
+            <table class="table table-bordered table-hover">
+                <thead>
+                    <tr>
+                        <th>Ticker</th>
+                        <th>Empresa</th>
+                        <th>Retorno total</th>
+                        <th>Volatilidad anualizada</th>
+                        <th>Base 100</th>
+                    </tr>
+                </thead>
+                <tbody>
+                    {% for ticker in result.tickers %}
+                    <tr>
+                        <td><a href="{{ url_for('company', ticker=ticker, range=period) }}">{{ ticker }}</a></td>
+                        <td>{{ names[ticker] }}</td>
+                        <td>{% if result.total_return[loop.index0] is none %}-{% else %}{{ "%.2f%%"|format(result.total_return[loop.index0] * 100) }}{% endif %}</td>
+                        <td>{% if result.volatility[loop.index0] is none %}-{% else %}{{ "%.2f%%"|format(result.volatility[loop.index0] * 100) }}{% endif %}</td>
+                        <td>{% if result.performance[loop.index0] and result.performance[loop.index0][-1] is not none %}{{ "%.2f"|format(result.performance[loop.index0][-1]) }}{% else %}-{% endif %}</td>
+                    </tr>
+                    {% endfor %}
+                </tbody>
+            </table>
+        </div>
+
+        <h4>Correlación de retornos diarios</h4>
+        <div class="table-responsive">
+            <table class="table table-bordered">
+                <thead>
+                    <tr>
+                        <th></th>
+                        {% for ticker in result.tickers %}<th>{{ ticker }}</th>{% endfor %}
+                    </tr>
+                </thead>
+                <tbody>
+                    {% for row in result.correlation %}
+                    <tr>
+                        <th>{{ result.tickers[loop.index0] }}</th>
+                        {% for value in row %}
+                        {% if value is none %}
+                        <td class="corr">-</td>
+                        {% else %}
+                        <td class="corr" style="background-color: rgba({% if value >= 0 %}39, 110, 241{% else %}220, 53, 69{% endif %}, {{ "%.2f"|format(value|abs * 0.6) }});">{{ "%.2f"|format(value) }}</td>
+                        {% endif %}
+                        {% endfor %}
+                    </tr>
+                    {% endfor %}
+                </tbody>
+            </table>
+        </div>
+
+        <a href="{{ url_for('compare', tickers=tickers_param, range=period, format='json') }}" class="btn btn-outline-secondary">
+            <i class="bi bi-filetype-json"></i> Datos en JSON
+        </a>
+
+        <footer class="text-center mt-5">
+            <small>Luigi Adducci // Consulta datos bursátiles // &copy; 2025</small>
+        </footer>
+    </div>
+</body>
+</html>
+'''
+
+screener_html = '''
+<!DOCTYPE html>
+<html>
+<head>
+    <title>Screener{% if preset %} - {{ preset }}{% endif %}</title>
+    <link rel="stylesheet" href="https://stackpath.bootstrapcdn.com/bootstrap/4.5.2/css/bootstrap.min.css">
+    <link rel="stylesheet" href="https://cdn.jsdelivr.net/npm/bootstrap-icons@1.8.3/font/bootstrap-icons.css">
+    <style>
+        body { background-color: #F6F8FA; }
+        .container { margin-top: 30px; }
+        .table thead th { background-color: #276EF1; color: white; }
+        .table td.num { text-align: right; }
+        .up { color: #1E8E3E; }
+        .down { color: #D93025; }
+    </style>
+</head>
+<body>
+    {% macro pct(value) %}{% if value is none %}-{% else %}<span class="{% if value >= 0 %}up{% else %}down{% endif %}">{{ "%+.2f%%"|format(value * 100) }}</span>{% endif %}{% endmacro %}
+    <div class="container">
+        <div class="d-flex justify-content-between align-items-center mb-4">
+            <h1>Screener</h1>
+            <a href="{{ url_for('index') }}" class="btn btn-secondary">
+                <i class="bi bi-arrow-left"></i> Volver
+            </a>
+        </div>
+
+        <div class="btn-group btn-group-sm mb-3 flex-wrap" role="group" aria-label="Consultas">
+            {% for p in presets %}
+            <a href="{{ url_for('screener', preset=p) }}"
+               class="btn {% if p == preset %}btn-primary{% else %}btn-outline-primary{% endif %}">{{ p }}</a>
+            {% endfor %}
+        </div>
+        <p>Ordenado por <strong>{{ sort }}</strong> {{ 'ascendente' if order == 'ASC' else 'descendente' }}. Los datos de cada ticker corresponden a su último día guardado.</p>
+
+        <div class="table-responsive">
+            <table class="table table-bordered table-hover table-sm">
+                <thead>
+                    <tr>
+                        <th>Ticker</th>
+                        <th>Empresa</th>
+                        <th>Fecha</th>
+                        <th>Cierre</th>
+                        <th>Cambio</th>
+                        <th>Volumen</th>
+                        <th>Vol. relativo</th>
+                        <th>Máx. 52s</th>
+                        <th>Mín. 52s</th>
+                        {% for w in windows %}<th>Ret. {{ w }}</th>{% endfor %}
+                    </tr>
+                </thead>
+                <tbody>
+                    {% for row in rows %}
+                    <tr>
+                        <td><a href="{{ url_for('company', ticker=row.ticker) }}">{{ row.ticker }}</a></td>
+                        <td>{{ row.company_name or '' }}</td>
+                        <td>{{ row.date }}</td>
+                        <td class="num">{% if row.close is none %}-{% else %}{{ "%.2f"|format(row.close) }}{% endif %}</td>
+                        <td class="num">{{ pct(row.change_pct) }}</td>
+                        <td class="num">{% if row.volume is none %}-{% else %}{{ "{:,}".format(row.volume) }}{% endif %}</td>
+                        <td class="num">{% if row.rel_volume is none %}-{% else %}{{ "%.2f"|format(row.rel_volume) }}x{% endif %}</td>
+                        <td class="num">{% if row.high_52w is none %}-{% else %}{{ "%.2f"|format(row.high_52w) }}{% endif %}</td>
+                        <td class="num">{% if row.low_52w is none %}-{% else %}{{ "%.2f"|format(row.low_52w) }}{% endif %}</td>
+                        {% for w in windows %}<td class="num">{{ pct(row['return_' ~ w]) }}</td>{% endfor %}
+                    </tr>
+                    {% else %}
+                    <tr><td colspan="{{ 9 + windows|length }}" class="text-center">Ningún ticker cumple los filtros.</td></tr>
+                    {% endfor %}
+                </tbody>
+            </table>
+        </div>
+
+        <a href="{{ json_url }}" class="btn btn-outline-secondary">
+            <i class="bi bi-filetype-json"></i> Datos en JSON
+        </a>
+
+        <footer class="text-center mt-5">
+            <small>Luigi Adducci // Consulta datos bursátiles // &copy; 2025</small>
+        </footer>
+    </div>
+</body>
+</html>
+'''
+
 error_html = '''
 <!DOCTYPE html>
 <html>
@@ -527,19 +2351,23 @@ error_html = '''
 '''
 
 
+compile_templates()
+
+
 @app.errorhandler(404)
 def page_not_found(e):
-    return render_template_string(error_html,
-                                  error_code=404,
-                                  error_message="404 - Página No Encontrada",
-                                  error_description="La página que buscas no existe."), 404
+    return render_page('error',
+                       error_code=404,
+                       error_message="404 - Página No Encontrada",
+                       error_description="La página que buscas no existe."), 404
 
 @app.errorhandler(500)
 def internal_error(e):
-    return render_template_string(error_html,
-                                  error_code=500,
-                                  error_message="500 - Error Interno",
-                                  error_description="Ocurrió un error en el servidor. Por favor, inténtalo nuevamente más tarde."), 500
+    ERRORS.inc(kind='unhandled')
+    return render_page('error',
+                       error_code=500,
+                       error_message="500 - Error Interno",
+                       error_description="Ocurrió un error en el servidor. Por favor, inténtalo nuevamente más tarde."), 500
 
 
 if __name__ == '__main__':
@@ -0,0 +1,225 @@
+"""
+Punto de entrada ASGI: sirve la aplicación Flask desde un event loop de asyncio.
+
+Las vistas de Flask siguen siendo síncronas y corren en un grupo de ASGI_WORKERS
+hilos, pero antes de entregarles una petición que necesita datos de Yahoo
+(/company/<ticker>, /api/indicators/<ticker> y /compare) las velas se descargan
+con upstream.AsyncYahooClient: mientras Yahoo responde no se ocupa ningún hilo,
+así que unas pocas descargas lentas no dejan sin hilos al resto de rutas. Las
+lecturas y escrituras en SQLite de esa descarga también se hacen en el grupo de
+hilos. Cuando la vista llega a load_ticker los datos ya están frescos. Si la
+descarga asíncrona falla tras sus reintentos, la vista no la repite durante
+app.PREFETCH_FAILURE_TTL: sirve los datos guardados o responde con el error.
+Solo cuando el circuit breaker propio del cliente asíncrono está abierto la
+vista lo intenta por su camino síncrono habitual.
+
+Las descargas asíncronas usan la misma clave de app._refresh_flight que
+refresh_ticker: una vista que llama a refresh_ticker mientras la descarga
+asíncrona está en curso la espera en vez de repetirla, y viceversa. Los
+accesos a SQLite de la descarga asíncrona se hacen en un grupo aparte
+(PREFETCH_DB_WORKERS) para que las vistas que esperan a esa descarga no
+ocupen los hilos que necesita para terminar.
+
+Lo que limita el rendimiento con muchos tickers sin descargar es la escritura:
+save_history_to_db guarda cada descarga dentro de get_db(immediate=True), así
+que las escrituras en SQLite van de una en una por mucho que las descargas se
+solapen. Con los valores por defecto de benchmarks/bench_async.py (200 tickers,
+1 s de latencia) las 200 descargas tardan entre 11 y 12 s en vez de entre 27 y
+28 s: unas 2,5 veces menos, aunque Yahoo respondería a todas en 1 s.
+
+Uso (desde la raíz del repositorio), con cualquier servidor ASGI, por ejemplo:
+    uvicorn asgi:application --host 127.0.0.1 --port 8000
+Cada proceso de `--workers N` tiene su propio event loop y sus propios grupos de hilos.
+"""
+import asyncio
+import io
+import logging
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import parse_qs
+
+from werkzeug.exceptions import HTTPException
+
+import app
+from upstream import AsyncYahooClient, CircuitOpenError, UpstreamError
+
+logger = logging.getLogger(__name__)
+
+# Hilos que ejecutan las vistas de Flask.
+ASGI_WORKERS = 16
+# Hilos para los accesos a SQLite de las descargas asíncronas.
+PREFETCH_DB_WORKERS = 4
+# Descargas de Yahoo en curso a la vez como máximo (cada una es una corrutina, no un hilo).
+MAX_UPSTREAM_CONNECTIONS = 256
+# Si es False no se adelantan las descargas: las vistas llaman a Yahoo desde su hilo.
+PREFETCH = True
+
+async_yahoo = AsyncYahooClient(app.yahoo, max_connections=MAX_UPSTREAM_CONNECTIONS)
+_workers = ThreadPoolExecutor(max_workers=ASGI_WORKERS, thread_name_prefix='asgi')
+_db_workers = ThreadPoolExecutor(max_workers=PREFETCH_DB_WORKERS, thread_name_prefix='asgi-db')
+_urls = app.app.url_map.bind('localhost')
+
+
+def download_targets(method, path, query):
+    """(ticker, range, interval) que la petición pasaría a load_ticker según su ruta y parámetros."""
+    if method != 'GET':
+        return []
+    try:
+        endpoint, values = _urls.match(path, method)
+    except HTTPException:
+        return []
+    args = parse_qs(query)
+
+    def arg(name):
+        return args.get(name, [None])[0]
+
+    if endpoint == 'company':
+        # Los reordenamientos solo leen lo guardado y refresh=1 fuerza la descarga en la vista.
+        if arg('refresh') == '1' or 'sort' in args or 'order' in args:
+            return []
+        period, interval = app.resolve_view(arg('range'), arg('interval'))
+        return [(values['ticker'], period, interval)]
+    if endpoint == 'indicators_api':
+        period, _ = app.resolve_view(arg('range'), '1d')
+        return [(values['ticker'], period, '1d')]
+    if endpoint == 'compare':
+        period, _ = app.resolve_view(arg('range'), '1d')
+        tickers = list(dict.fromkeys(t.strip().upper() for t in (arg('tickers') or '').split(',') if t.strip()))
+        if 2 <= len(tickers) <= app.MAX_COMPARE_TICKERS:
+            return [(ticker, period, '1d') for ticker in tickers]
+    return []
+
+
+async def prefetch(ticker, range_=app.DEFAULT_RANGE, interval='1d'):
+    """
+    Descarga y guarda `ticker` sin bloquear el event loop si load_ticker tendría que
+    esperar a Yahoo. Si ya hay una descarga con los mismos parámetros en
+    app._refresh_flight, asíncrona o de refresh_ticker, se espera a esa. Los
+    errores se registran y no se propagan; si Yahoo falla se marca la clave con
+    app.mark_prefetch_failed para que la vista no repita la descarga.
+    """
+    interval = app.storage_interval(interval)
+    key = app.refresh_key(ticker, range_, interval)
+    if app.prefetch_failure(key) is not None:
+        return
+    loop = asyncio.get_running_loop()
+    try:
+        if not await loop.run_in_executor(_db_workers, app.needs_download, ticker, range_, interval):
+            return
+        done = loop.create_future()
+        call, leader = app._refresh_flight.join(key, lambda call: loop.call_soon_threadsafe(_settle, done))
+        if not leader:
+            await done
+            return
+        try:
+            plan = await loop.run_in_executor(_db_workers, app.refresh_plan, ticker, range_, interval)
+            with app.STAGE_SECONDS.time(route='prefetch', stage='upstream'):
+                try:
+                    data = await async_yahoo.chart(ticker, plan[0])
+                except CircuitOpenError:
+                    # No se esperó a Yahoo: la vista puede intentarlo con el cliente síncrono.
+                    raise
+                except UpstreamError as exc:
+                    app.mark_prefetch_failed(key, exc)
+                    raise
+            result = await loop.run_in_executor(_db_workers, app.apply_refresh, ticker, interval, plan, data)
+        except BaseException as exc:
+            # Los hilos que esperan no deben recibir la cancelación de esta corrutina.
+            error = exc if isinstance(exc, Exception) else UpstreamError(f"Descarga de {ticker} cancelada")
+            app._refresh_flight.finish(key, call, error=error)
+            raise
+        app._refresh_flight.finish(key, call, result)
+        app.CACHE_REQUESTS.inc(cache='history', result='prefetch')
+    except Exception:
+        app.ERRORS.inc(kind='prefetch')
+        logger.exception("Error al descargar %s de forma asíncrona", ticker)
+
+
+def _settle(future):
+    if not future.done():
+        future.set_result(None)
+
+
+def build_environ(scope, body):
+    """Entorno WSGI de una petición HTTP ASGI."""
+    server = scope.get('server') or ('localhost', 80)
+    environ = {
+        'REQUEST_METHOD': scope['method'],
+        'SCRIPT_NAME': scope.get('root_path', '').encode('utf-8').decode('latin-1'),
+        'PATH_INFO': scope['path'].encode('utf-8').decode('latin-1'),
+        'QUERY_STRING': scope['query_string'].decode('latin-1'),
+        'SERVER_NAME': server[0],
+        'SERVER_PORT': str(server[1]),
+        'SERVER_PROTOCOL': f"HTTP/{scope.get('http_version', '1.1')}",
+        'REMOTE_ADDR': (scope.get('client') or ('', 0))[0],
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': scope.get('scheme', 'http'),
+        'wsgi.input': io.BytesIO(body),
+        'wsgi.errors': sys.stderr,
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': False,
+        'wsgi.run_once': False,
+    }
+    for name, value in scope['headers']:
+        name = name.decode('latin-1').upper().replace('-', '_')
+        key = name if name in ('CONTENT_TYPE', 'CONTENT_LENGTH') else 'HTTP_' + name
+        value = value.decode('latin-1')
+        environ[key] = f"{environ[key]},{value}" if key in environ else value
+    return environ
+
+
+def _run_wsgi(environ, send, loop):
+    """
+    Ejecuta la aplicación Flask en un hilo del grupo y envía la respuesta por `send`.
+    Toda la respuesta (también las de streaming) se recorre en el mismo hilo, porque
+    stream_with_context mantiene el contexto de la petición en él.
+    """
+    def emit(message):
+        asyncio.run_coroutine_threadsafe(send(message), loop).result()
+
+    started = {}
+
+    def start_response(status, headers, exc_info=None):
+        started['status'] = int(status.split(' ', 1)[0])
+        started['headers'] = [(k.lower().encode('latin-1'), v.encode('latin-1')) for k, v in headers]
+
+    result = app.app(environ, start_response)
+    try:
+        emit({'type': 'http.response.start', 'status': started['status'], 'headers': started['headers']})
+        for chunk in result:
+            if chunk:
+                emit({'type': 'http.response.body', 'body': chunk, 'more_body': True})
+        emit({'type': 'http.response.body', 'body': b''})
+    finally:
+        close = getattr(result, 'close', None)
+        if close is not None:
+            close()
+
+
+async def application(scope, receive, send):
+    if scope['type'] == 'lifespan':
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                await async_yahoo.close()
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+    if scope['type'] != 'http':
+        return
+
+    body = bytearray()
+    while True:
+        message = await receive()
+        if message['type'] == 'http.disconnect':
+            return
+        body += message.get('body', b'')
+        if not message.get('more_body'):
+            break
+    if PREFETCH:
+        targets = download_targets(scope['method'], scope['path'], scope['query_string'].decode('latin-1'))
+        if targets:
+            await asyncio.gather(*(prefetch(*target) for target in targets))
+    loop = asyncio.get_running_loop()
+    await loop.run_in_executor(_workers, _run_wsgi, build_environ(scope, bytes(body)), send, loop)
@@ -0,0 +1,128 @@
+"""
+Compara asgi.application servida con uvicorn con y sin descargas asíncronas
+cuando Yahoo es lento.
+
+En cada modo se levanta uvicorn con `--workers` hilos para las vistas de Flask
+y benchmarks.fake_yahoo con `--latency` segundos por respuesta. `--clients`
+clientes piden a la vez /company/<ticker> de tickers distintos y aún no
+descargados, mientras otro cliente mide sin parar la portada (/). En modo
+'sync' (asgi.PREFETCH = False) cada vista espera a Yahoo desde su hilo, como
+con un servidor WSGI de hilos fijos; en modo 'async' las descargas se hacen en
+el event loop y los hilos solo guardan y renderizan.
+
+El limitador de tasa de Yahoo se desactiva durante la prueba para medir el
+servidor y no la política de acceso. Con los valores por defecto el modo
+'async' tarda entre 11 y 12 s frente a entre 27 y 28 s del 'sync': las
+descargas se solapan, pero cada una se guarda con save_history_to_db dentro
+de get_db(immediate=True) y esas escrituras siguen siendo de una en una.
+
+Uso (desde la raíz del repositorio):
+    python -m benchmarks.bench_async --clients 200 --workers 8 --latency 1.0
+"""
+import argparse
+import socket
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+import uvicorn
+
+import app
+import asgi
+from benchmarks.fake_yahoo import FakeYahoo
+from benchmarks.harness import print_table, summarize, temp_database
+from upstream import AsyncYahooClient, TokenBucket
+
+
+def start_server():
+    """uvicorn con asgi.application en un hilo, escuchando en un puerto libre."""
+    sock = socket.socket()
+    sock.bind(('127.0.0.1', 0))
+    server = uvicorn.Server(uvicorn.Config(asgi.application, log_level='warning', backlog=2048))
+    thread = threading.Thread(target=server.run, kwargs={'sockets': [sock]}, daemon=True)
+    thread.start()
+    while not server.started:
+        if not thread.is_alive():
+            raise RuntimeError("uvicorn no arrancó")
+        time.sleep(0.01)
+    return server, thread, f'http://127.0.0.1:{sock.getsockname()[1]}'
+
+
+def stop_server(server, thread):
+    server.should_exit = True
+    thread.join()
+
+
+def probe(url, samples, done):
+    """Pide la portada en bucle hasta `done`, guardando la duración de cada petición."""
+    session = requests.Session()
+    while not done.is_set():
+        start = time.perf_counter()
+        session.get(url + '/', timeout=120)
+        samples.append(time.perf_counter() - start)
+
+
+def run_mode(mode, clients, workers, latency, days):
+    asgi.PREFETCH = mode == 'async'
+    asgi._workers = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='asgi')
+    asgi.async_yahoo = AsyncYahooClient(app.yahoo, max_connections=asgi.MAX_UPSTREAM_CONNECTIONS)
+    fake = FakeYahoo(latency=latency, points=days).start()
+    app.yahoo.base_url = fake.base_url
+    with temp_database('async.db'):
+        server, thread, url = start_server()
+        try:
+            requests.get(url + '/', timeout=30)
+            index, done = [], threading.Event()
+            prober = threading.Thread(target=probe, args=(url, index, done))
+            prober.start()
+
+            def visit(n):
+                start = time.perf_counter()
+                ok = requests.get(f'{url}/company/A{n:04d}', timeout=300).status_code == 200
+                return time.perf_counter() - start, ok
+
+            start = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=clients) as pool:
+                visits = list(pool.map(visit, range(clients)))
+            elapsed = time.perf_counter() - start
+            done.set()
+            prober.join()
+        finally:
+            # uvicorn espera a las respuestas en curso, que necesitan los hilos del grupo.
+            stop_server(server, thread)
+            asgi._workers.shutdown()
+    fake.stop()
+
+    company = summarize([d for d, _ in visits])
+    company['rps'] = clients / elapsed
+    company['errors'] = sum(1 for _, ok in visits if not ok)
+    return {f'{mode}.company_cold': company, f'{mode}.index_during_load': summarize(index)}, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--clients', type=int, default=200, help="peticiones simultáneas a tickers sin descargar")
+    parser.add_argument('--workers', type=int, default=8, help="hilos para las vistas de Flask")
+    parser.add_argument('--latency', type=float, default=1.0, help="segundos por respuesta de la Yahoo simulada")
+    parser.add_argument('--days', type=int, default=252, help="velas por respuesta de la Yahoo simulada")
+    args = parser.parse_args()
+
+    base_url, limiter = app.yahoo.base_url, app.yahoo.limiter
+    app.yahoo.limiter = TokenBucket(1e6, 1e6)
+    results, elapsed = {}, {}
+    try:
+        for mode in ('sync', 'async'):
+            values, elapsed[mode] = run_mode(mode, args.clients, args.workers, args.latency, args.days)
+            results.update(values)
+    finally:
+        app.yahoo.base_url, app.yahoo.limiter = base_url, limiter
+
+    print(f"{args.clients} tickers sin descargar, {args.workers} hilos, Yahoo con {args.latency}s de latencia\n")
+    print_table(results)
+    for mode, seconds in elapsed.items():
+        print(f"{mode:<6} todas las descargas en {seconds:7.2f}s ({args.clients / seconds:6.1f} req/s)")
+
+
+if __name__ == '__main__':
+    main()
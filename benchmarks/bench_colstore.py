@@ -0,0 +1,121 @@
+"""
+Compara la tabla history de SQLite con el almacenamiento columnar (colstore.py)
+al leer series diarias completas: tiempo de carga, memoria reservada durante la
+lectura (tracemalloc) y espacio en disco por ticker.
+
+Para cada almacenamiento se mide la carga sola (filas de SQLite frente a columnas
+mapeadas), un cálculo sobre los cierres (la media, como haría /compare) y la
+conversión a las tuplas que usa la plantilla (get_history_from_db).
+
+Uso (desde la raíz del repositorio):
+    python -m benchmarks.bench_colstore --tickers 50 --years 10 --repeat 5
+"""
+import argparse
+import math
+import os
+import tracemalloc
+
+import app
+from benchmarks.harness import measure, print_table, temp_database
+from benchmarks.synthetic import chart_payload
+from chart import parse_chart
+from colstore import ColumnStore
+
+SQL_SERIES = "SELECT date, open, high, low, close, adj_close, volume FROM history WHERE ticker = ? ORDER BY date"
+
+
+def sqlite_rows(ticker):
+    with app.get_db() as conn:
+        return conn.execute(SQL_SERIES, (ticker,)).fetchall()
+
+
+def sqlite_mean_close(ticker):
+    rows = sqlite_rows(ticker)
+    return math.fsum(r[4] for r in rows) / len(rows)
+
+
+def columnar_mean_close(ticker):
+    closes = app.colstore.load(ticker).close
+    return math.fsum(closes) / len(closes)
+
+
+def history_tuples(backend, ticker):
+    app.HISTORY_BACKEND = backend
+    return app.get_history_from_db(ticker)
+
+
+def peak_memory(fn, names):
+    """Pico de memoria reservada por Python al aplicar `fn` a todos los tickers a la vez."""
+    tracemalloc.start()
+    try:
+        kept = [fn(ticker) for ticker in names]
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    del kept
+    return peak
+
+
+def directory_size(path):
+    return sum(os.path.getsize(os.path.join(root, f)) for root, _, files in os.walk(path) for f in files)
+
+
+def run(tickers=50, years=10, repeat=5):
+    points = years * 252
+    names = [f'C{n:04d}' for n in range(tickers)]
+    results, memory = {}, {}
+    backend, store = app.HISTORY_BACKEND, app.colstore
+    try:
+        with temp_database('colstore.db') as tmp:
+            app.colstore = ColumnStore(os.path.join(tmp, 'colstore'))
+            for n, ticker in enumerate(names):
+                payload = chart_payload(ticker, points=points, null_every=250, seed=n)
+                app.save_history_to_db(ticker, parse_chart(payload['chart']['result'][0]))
+            app.HISTORY_BACKEND = 'columnar'
+            for ticker in names:
+                app.columnar_history(ticker)
+            assert history_tuples('sqlite', names[0]) == history_tuples('columnar', names[0])
+
+            def each(fn):
+                return lambda: [fn(ticker) for ticker in names]
+
+            cases = {
+                'load': (sqlite_rows, app.colstore.load),
+                'mean_close': (sqlite_mean_close, columnar_mean_close),
+                'history_tuples': (lambda t: history_tuples('sqlite', t), lambda t: history_tuples('columnar', t)),
+            }
+            for case, (row_fn, column_fn) in cases.items():
+                for label, fn in (('sqlite', row_fn), ('columnar', column_fn)):
+                    results[f'colstore.{case}.{label}'] = measure(each(fn), repeat)
+                    memory[f'{case}.{label}'] = peak_memory(fn, names)
+
+            # Al cerrar las conexiones el WAL se vuelca en la base y su tamaño es el definitivo.
+            app.close_db_pool()
+            db_size = sum(os.path.getsize(app.DATABASE + suffix)
+                          for suffix in ('', '-wal') if os.path.exists(app.DATABASE + suffix))
+            column_size = directory_size(app.colstore.root)
+    finally:
+        app.HISTORY_BACKEND, app.colstore = backend, store
+
+    print(f"{tickers} tickers x {points} velas diarias (cada tiempo cubre todos los tickers)\n")
+    print_table(results)
+    print("\nMemoria reservada al cargar todos los tickers:")
+    for name, peak in memory.items():
+        print(f"  {name:<26} {peak / 2 ** 20:9.2f} MiB")
+    print("\nEspacio en disco por ticker:")
+    print(f"  {'sqlite (toda la base)':<26} {db_size / tickers / 1024:9.1f} KiB")
+    print(f"  {'columnar':<26} {column_size / tickers / 1024:9.1f} KiB")
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--tickers', type=int, default=50)
+    parser.add_argument('--years', type=int, default=10)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+    run(args.tickers, args.years, args.repeat)
+
+
+if __name__ == '__main__':
+    main()
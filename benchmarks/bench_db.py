@@ -0,0 +1,110 @@
+"""
+Compara el rendimiento de la capa SQLite antes y después del pool de conexiones.
+
+Simula la parte local de una visita a /company/<ticker> con datos en caché
+(leer `fetches`, registrar la consulta y leer el histórico ordenado) desde
+varios hilos a la vez, primero abriendo una conexión por llamada con la
+configuración por defecto y luego a través de app.get_db().
+
+Uso (desde la raíz del repositorio):
+    python -m benchmarks.bench_db --threads 8 --requests 400
+"""
+import argparse
+import datetime
+import sqlite3
+import threading
+import time
+
+import app
+from benchmarks.harness import temp_database
+from chart import HistoryColumns
+
+
+def legacy_request(database, ticker):
+    conn = sqlite3.connect(database, timeout=30)
+    conn.execute("SELECT company_name, fetched_at FROM fetches WHERE ticker = ?", (ticker,)).fetchone()
+    conn.close()
+
+    conn = sqlite3.connect(database, timeout=30)
+    conn.execute("INSERT OR REPLACE INTO queries (ticker, last_query) VALUES (?, datetime('now'))", (ticker,))
+    conn.commit()
+    conn.close()
+
+    conn = sqlite3.connect(database, timeout=30)
+    conn.execute(
+        "SELECT date, open, high, low, close, adj_close, volume FROM history WHERE ticker = ? ORDER BY close DESC",
+        (ticker,)
+    ).fetchall()
+    conn.close()
+
+
+def pooled_request(database, ticker):
+    app.get_fetch_info(ticker)
+    app.update_query_log(ticker)
+    app.get_history_from_db(ticker, sort_column='close', order='DESC')
+
+
+def seed(tickers, days):
+    base = datetime.date(2015, 1, 1)
+    for ticker in tickers:
+        history = HistoryColumns.from_records(
+            {
+                'date': (base + datetime.timedelta(days=i)).isoformat(),
+                'open': 100.0 + i, 'high': 101.0 + i, 'low': 99.0 + i,
+                'close': 100.5 + i, 'adj_close': 100.5 + i, 'volume': 1000 + i,
+            }
+            for i in range(days)
+        )
+        app.save_history_to_db(ticker, history)
+        app.record_fetch(ticker, ticker)
+
+
+def run(label, handler, database, tickers, threads, requests_per_thread):
+    errors = []
+
+    def worker(n):
+        try:
+            for i in range(requests_per_thread):
+                handler(database, tickers[(n + i) % len(tickers)])
+        except Exception as exc:
+            errors.append(exc)
+
+    workers = [threading.Thread(target=worker, args=(n,)) for n in range(threads)]
+    start = time.perf_counter()
+    for w in workers:
+        w.start()
+    for w in workers:
+        w.join()
+    elapsed = time.perf_counter() - start
+    total = threads * requests_per_thread
+    print(f"{label:<8} {total:>6} peticiones en {elapsed:7.3f}s -> {total / elapsed:9.1f} req/s ({len(errors)} errores)")
+    return total / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument('--requests', type=int, default=400, help="peticiones por hilo")
+    parser.add_argument('--tickers', type=int, default=10)
+    parser.add_argument('--days', type=int, default=250)
+    args = parser.parse_args()
+
+    tickers = [f"T{i:03d}" for i in range(args.tickers)]
+    with temp_database('legacy.db'):
+        seed(tickers, args.days)
+        app.close_db_pool()
+        # La configuración anterior usaba el journal por defecto (rollback).
+        conn = sqlite3.connect(app.DATABASE)
+        conn.execute("PRAGMA journal_mode=DELETE")
+        conn.close()
+        before = run('antes', legacy_request, app.DATABASE, tickers, args.threads, args.requests)
+
+    with temp_database('pooled.db'):
+        seed(tickers, args.days)
+        after = run('después', pooled_request, app.DATABASE, tickers, args.threads, args.requests)
+
+    print(f"mejora: x{after / before:.2f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,59 @@
+"""
+Mide el rendimiento (filas por segundo) de /export para cada formato y compresión,
+comparado con la descarga HTML por ticker.
+
+Uso (desde la raíz del repositorio):
+    python -m benchmarks.bench_export --tickers 50 --days 2520
+"""
+import argparse
+import time
+
+import app
+from benchmarks.harness import temp_database
+from benchmarks.synthetic import chart_payload
+from chart import parse_chart
+
+
+def seed(tickers, days):
+    for n, ticker in enumerate(tickers):
+        result = chart_payload(ticker, points=days, seed=n)['chart']['result'][0]
+        app.save_history_to_db(ticker, parse_chart(result))
+        app.record_fetch(ticker, ticker)
+
+
+def measure(client, url):
+    start = time.perf_counter()
+    response = client.get(url, buffered=False)
+    size = sum(len(chunk) for chunk in response.response)
+    response.close()
+    return time.perf_counter() - start, size
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--tickers', type=int, default=50)
+    parser.add_argument('--days', type=int, default=2520)
+    args = parser.parse_args()
+
+    with temp_database('export.db'):
+        tickers = [f"T{i:03d}" for i in range(args.tickers)]
+        seed(tickers, args.days)
+        total = args.tickers * args.days
+        client = app.app.test_client()
+
+        start = time.perf_counter()
+        html_size = 0
+        for ticker in tickers:
+            html_size += measure(client, f'/company/{ticker}/download')[1]
+        elapsed = time.perf_counter() - start
+        print(f"{'html por ticker':<22} {total / elapsed:>12,.0f} filas/s {html_size / 1e6:9.1f} MB")
+
+        for fmt in ('csv', 'ndjson', 'columnar'):
+            for compression in ('', 'gzip', 'xz'):
+                elapsed, size = measure(client, f'/export?format={fmt}&compression={compression}')
+                label = f"{fmt}{'+' + compression if compression else ''}"
+                print(f"{label:<22} {total / elapsed:>12,.0f} filas/s {size / 1e6:9.1f} MB")
+
+
+if __name__ == '__main__':
+    main()
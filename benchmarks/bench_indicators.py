@@ -0,0 +1,114 @@
+"""
+Mide el motor de indicadores (indicators.py) sobre miles de tickers con 10 años
+de velas diarias, y compara en la base de datos el recálculo completo con la
+actualización incremental desde el punto de control tras una ingesta delta.
+
+Uso (desde la raíz del repositorio):
+    python -m benchmarks.bench_indicators --tickers 2000 --years 10 --db-tickers 50
+"""
+import argparse
+import datetime
+import math
+import random
+import time
+
+import app
+from benchmarks.harness import temp_database
+from chart import HistoryColumns
+from indicators import IndicatorState
+
+
+def random_walk(points, seed):
+    rng = random.Random(seed)
+    price = 50.0 + rng.random() * 200
+    closes, volumes = [], []
+    for _ in range(points):
+        price *= math.exp(rng.gauss(0.0003, 0.02))
+        closes.append(round(price, 4))
+        volumes.append(rng.randint(100_000, 50_000_000))
+    return closes, volumes
+
+
+def bench_engine(tickers, points):
+    series = [random_walk(points, seed) for seed in range(tickers)]
+    start = time.perf_counter()
+    for closes, volumes in series:
+        IndicatorState().advance(closes, volumes)
+    full = time.perf_counter() - start
+
+    checkpoints = []
+    for closes, volumes in series:
+        state = IndicatorState()
+        state.advance(closes[:-1], volumes[:-1])
+        checkpoints.append(state.dumps())
+    start = time.perf_counter()
+    for (closes, volumes), saved in zip(series, checkpoints):
+        state = IndicatorState.loads(saved)
+        state.advance(closes[-1:], volumes[-1:])
+        state.dumps()
+    incremental = time.perf_counter() - start
+
+    rows = tickers * points
+    print(f"motor    completo    {tickers} tickers x {points} velas en {full:7.3f}s -> {rows / full:12,.0f} velas/s")
+    print(f"motor    incremental {tickers} tickers x 1 vela      en {incremental:7.3f}s -> "
+          f"{incremental / tickers * 1e6:8.1f} us/ticker  x{full / incremental:.0f}")
+
+
+def seed_db(tickers, points):
+    base = datetime.date.today() - datetime.timedelta(days=points * 7 // 5)
+    for n, ticker in enumerate(tickers):
+        closes, volumes = random_walk(points, n)
+        dates = [(base + datetime.timedelta(days=i)).isoformat() for i in range(points)]
+        app.save_history_to_db(ticker, HistoryColumns(dates, closes, closes, closes, closes, closes, volumes))
+
+
+def delta(ticker, days):
+    """Simula una actualización incremental: los últimos `days` días corregidos y un día nuevo."""
+    with app.get_db() as conn:
+        rows = conn.execute(
+            "SELECT date, adj_close, volume FROM history WHERE ticker = ? ORDER BY date DESC LIMIT ?",
+            (ticker, days)
+        ).fetchall()[::-1]
+    dates = [r[0] for r in rows]
+    dates.append((datetime.date.fromisoformat(dates[-1]) + datetime.timedelta(days=1)).isoformat())
+    closes = [r[1] * 1.001 for r in rows] + [rows[-1][1]]
+    volumes = [r[2] for r in rows] + [rows[-1][2]]
+    return HistoryColumns(dates, closes, closes, closes, closes, closes, volumes)
+
+
+def bench_db(tickers, points):
+    with temp_database('indicators.db'):
+        names = [f"T{i:04d}" for i in range(tickers)]
+        seed_db(names, points)
+
+        start = time.perf_counter()
+        for ticker in names:
+            with app.get_db() as conn:
+                app.update_indicators(conn.cursor(), ticker, '')
+        full = time.perf_counter() - start
+
+        start = time.perf_counter()
+        for ticker in names:
+            app.save_history_to_db(ticker, delta(ticker, app.DELTA_OVERLAP_DAYS + 1))
+        incremental = time.perf_counter() - start
+
+    print(f"sqlite   recálculo completo {tickers} tickers en {full:7.3f}s ({full / tickers * 1000:7.2f} ms/ticker)")
+    print(f"sqlite   ingesta delta      {tickers} tickers en {incremental:7.3f}s "
+          f"({incremental / tickers * 1000:7.2f} ms/ticker, incluye upsert y agregados)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--tickers', type=int, default=2000)
+    parser.add_argument('--years', type=int, default=10)
+    parser.add_argument('--db-tickers', type=int, default=50, help="tickers de la prueba con SQLite (0 = omitir)")
+    args = parser.parse_args()
+
+    points = args.years * 252
+    bench_engine(args.tickers, points)
+    if args.db_tickers:
+        bench_db(args.db_tickers, points)
+
+
+if __name__ == '__main__':
+    main()
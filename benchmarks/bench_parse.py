@@ -0,0 +1,72 @@
+"""
+Compara el parser por filas que usaba la app antes de chart.parse_chart con este
+sobre respuestas sintéticas de 10 años diarios y 60 días de velas de 1 minuto.
+
+Uso (desde la raíz del repositorio):
+    python -m benchmarks.bench_parse --repeat 5
+"""
+import argparse
+import datetime
+import time
+
+from benchmarks.synthetic import chart_payload
+from chart import parse_chart
+
+
+def legacy_parse(result):
+    timestamps = result.get('timestamp', [])
+    indicators = result.get('indicators', {}).get('quote', [{}])[0]
+    adjclose = result.get('indicators', {}).get('adjclose', [{}])[0]
+
+    history_data = []
+    for i, timestamp in enumerate(timestamps):
+        try:
+            date = datetime.datetime.fromtimestamp(timestamp).strftime('%Y-%m-%d')
+            record = {
+                'date': date,
+                'open': indicators.get('open')[i],
+                'high': indicators.get('high')[i],
+                'low': indicators.get('low')[i],
+                'close': indicators.get('close')[i],
+                'adj_close': (
+                    adjclose.get('adjclose')[i]
+                    if adjclose.get('adjclose') and adjclose.get('adjclose')[i]
+                    else indicators.get('close')[i]
+                ),
+                'volume': indicators.get('volume')[i]
+            }
+            history_data.append(record)
+        except Exception:
+            continue
+    return history_data
+
+
+def best_of(fn, arg, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn(arg)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    cases = [
+        ('10 años diarios', chart_payload(points=2520, interval=86400, null_every=250)),
+        ('60 días 1 minuto', chart_payload(points=60 * 390, interval=60, null_every=500)),
+    ]
+    for label, payload in cases:
+        result = payload['chart']['result'][0]
+        points = len(result['timestamp'])
+        legacy = best_of(legacy_parse, result, args.repeat)
+        columnar = best_of(parse_chart, result, args.repeat)
+        print(f"{label:<18} {points:>6} puntos  por filas {legacy * 1000:8.2f} ms  "
+              f"columnar {columnar * 1000:8.2f} ms  x{legacy / columnar:.1f}")
+
+
+if __name__ == '__main__':
+    main()
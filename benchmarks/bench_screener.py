@@ -0,0 +1,81 @@
+"""
+Mide /screener sobre miles de tickers: el mantenimiento de ticker_summary por
+ingesta, cada consulta predefinida contra el resumen y, como referencia, la
+misma consulta de mayores subidas recorriendo el histórico de cada ticker con
+get_history_from_db.
+
+Uso (desde la raíz del repositorio):
+    python -m benchmarks.bench_screener --tickers 5000 --days 300 --repeat 5
+"""
+import argparse
+import datetime
+import time
+
+import app
+from benchmarks.bench_indicators import random_walk
+from benchmarks.harness import measure, print_table, temp_database
+
+
+def seed_history(tickers, points):
+    """Inserta el histórico directamente en SQLite, sin pasar por save_history_to_db."""
+    base = datetime.date.today() - datetime.timedelta(days=points * 7 // 5)
+    dates = [(base + datetime.timedelta(days=i)).isoformat() for i in range(points)]
+    with app.get_db(immediate=True) as conn:
+        for n, ticker in enumerate(tickers):
+            closes, volumes = random_walk(points, n)
+            conn.executemany(
+                "INSERT INTO history (ticker, date, open, high, low, close, adj_close, volume) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                ((ticker, d, c, c * 1.01, c * 0.99, c, c, v) for d, c, v in zip(dates, closes, volumes))
+            )
+
+
+def gainers_from_history(tickers, limit=app.SCREENER_PAGE_SIZE):
+    """Mayores subidas del último día leyendo el histórico completo de cada ticker."""
+    changes = []
+    for ticker in tickers:
+        rows = app.get_history_from_db(ticker)
+        if len(rows) > 1 and rows[-2][4]:
+            changes.append((rows[-1][4] / rows[-2][4] - 1, ticker))
+    changes.sort(reverse=True)
+    return changes[:limit]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--tickers', type=int, default=5000)
+    parser.add_argument('--days', type=int, default=300, help="velas diarias por ticker")
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    names = [f'S{n:05d}' for n in range(args.tickers)]
+    results = {}
+    with temp_database('screener.db'):
+        seed_history(names, args.days)
+
+        start = time.perf_counter()
+        with app.get_db(immediate=True) as conn:
+            c = conn.cursor()
+            for ticker in names:
+                app.update_summary(c, ticker)
+        maintenance = time.perf_counter() - start
+
+        for preset, (filters, sort, order) in app.SCREENER_PRESETS.items():
+            results[f'screener.{preset}'] = measure(lambda: app.screen(filters, sort, order), args.repeat)
+        client = app.app.test_client()
+        results['screener.route_json'] = measure(lambda: client.get('/screener?preset=gainers&format=json').data,
+                                                 args.repeat)
+        results['screener.route_html'] = measure(lambda: client.get('/screener?preset=gainers').data, args.repeat)
+        results['history_scan.gainers'] = measure(lambda: gainers_from_history(names), 1)
+
+        top = [row[0] for row in app.screen()]
+        assert top == [ticker for _, ticker in gainers_from_history(names)]
+
+    print(f"{args.tickers} tickers x {args.days} velas diarias\n")
+    print_table(results)
+    print(f"\nupdate_summary: {maintenance / args.tickers * 1000:.3f} ms por ticker "
+          f"({maintenance:.2f}s para los {args.tickers})")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,165 @@
+"""
+Servidor HTTP local que imita /v8/finance/chart/<ticker> de Yahoo Finance.
+
+Sirve respuestas sintéticas (benchmarks.synthetic) y puede añadir latencia e
+inyectar errores para probar el cliente de upstream.py y la aplicación sin red.
+
+Uso:
+    python -m benchmarks.fake_yahoo --port 8765 --latency 0.2 --error-rate 0.1
+y luego, antes de arrancar la aplicación:
+    app.yahoo.base_url = 'http://127.0.0.1:8765/v8/finance/chart/{ticker}'
+"""
+import argparse
+import json
+import random
+import sys
+import threading
+import time
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+from benchmarks.synthetic import chart_payload
+
+RANGE_POINTS = {
+    '1d': 1, '5d': 5, '1mo': 21, '3mo': 63, '6mo': 126, 'ytd': 200,
+    '1y': 252, '2y': 504, '5y': 1260, '10y': 2520, 'max': 5000,
+}
+INTERVAL_SECONDS = {
+    '1m': 60, '2m': 120, '5m': 300, '15m': 900, '30m': 1800, '60m': 3600, '90m': 5400, '1h': 3600,
+    '1d': 86400, '5d': 5 * 86400, '1wk': 7 * 86400, '1mo': 30 * 86400, '3mo': 90 * 86400,
+}
+TRADING_SECONDS_PER_DAY = 390 * 60
+
+
+class FakeYahoo(ThreadingHTTPServer):
+    daemon_threads = True
+    # Admite cientos de conexiones simultáneas, como las del cliente asíncrono.
+    request_queue_size = 1024
+
+    def __init__(self, address=('127.0.0.1', 0), latency=0.0, jitter=0.0, error_rate=0.0,
+                 error_status=503, points=None, unknown=()):
+        super().__init__(address, ChartHandler)
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.points = points
+        self.unknown = set(unknown)
+        self.requests = 0
+        self.errors = 0
+        self._lock = threading.Lock()
+        self._rng = random.Random(0)
+
+    @property
+    def base_url(self):
+        host, port = self.server_address[:2]
+        return f'http://{host}:{port}/v8/finance/chart/{{ticker}}'
+
+    def start(self):
+        thread = threading.Thread(target=self.serve_forever, daemon=True)
+        thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+    def handle_error(self, request, client_address):
+        # Los clientes que agotan su timeout cierran la conexión a mitad de respuesta.
+        if not isinstance(sys.exc_info()[1], ConnectionError):
+            super().handle_error(request, client_address)
+
+    def should_fail(self):
+        with self._lock:
+            self.requests += 1
+            fail = self._rng.random() < self.error_rate
+            if fail:
+                self.errors += 1
+            return fail
+
+    def delay(self):
+        with self._lock:
+            extra = self._rng.uniform(0, self.jitter) if self.jitter else 0.0
+        return self.latency + extra
+
+
+class ChartHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send(self, status, body):
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        server = self.server
+        url = urlparse(self.path)
+        if url.path.startswith('/moved/'):
+            # /moved/<ruta> redirige a /<ruta>, como cuando Yahoo cambia de host o de versión.
+            self.send_response(301)
+            self.send_header('Location', self.path[len('/moved'):])
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+        if not url.path.startswith('/v8/finance/chart/'):
+            return self._send(404, b'{}')
+        ticker = url.path.rsplit('/', 1)[-1]
+        params = {k: v[0] for k, v in parse_qs(url.query).items()}
+
+        time.sleep(server.delay())
+        if server.should_fail():
+            return self._send(server.error_status, b'{"error": "injected"}')
+        if ticker in server.unknown:
+            body = {'chart': {'result': None, 'error': {'code': 'Not Found', 'description': 'No data found'}}}
+            return self._send(404, json.dumps(body).encode())
+
+        interval = INTERVAL_SECONDS.get(params.get('interval', '1d'), 86400)
+        now = int(time.time())
+        if 'period1' in params:
+            start = int(params['period1'])
+            end = int(params.get('period2', now))
+        else:
+            days = RANGE_POINTS.get(params.get('range', '1y'), 252) * 7 // 5
+            start, end = now - days * 86400, now
+        trading_days = max(1, (end - start) // 86400 * 5 // 7)
+        if server.points:
+            points = server.points
+        elif interval < 86400:
+            points = trading_days * TRADING_SECONDS_PER_DAY // interval
+        elif interval == 86400:
+            points = trading_days
+        else:
+            points = max(1, (end - start) // interval)
+        start = start - start % 86400
+        payload = chart_payload(ticker, points=points, interval=interval, start=start,
+                                seed=zlib.crc32(ticker.encode()))
+        self._send(200, json.dumps(payload).encode())
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--latency', type=float, default=0.0, help="segundos de espera por petición")
+    parser.add_argument('--jitter', type=float, default=0.0, help="espera aleatoria adicional máxima")
+    parser.add_argument('--error-rate', type=float, default=0.0, help="fracción de peticiones que fallan")
+    parser.add_argument('--error-status', type=int, default=503)
+    parser.add_argument('--points', type=int, default=None, help="velas por respuesta (fijo)")
+    args = parser.parse_args()
+    server = FakeYahoo((args.host, args.port), latency=args.latency, jitter=args.jitter,
+                       error_rate=args.error_rate, error_status=args.error_status, points=args.points)
+    print(f"Sirviendo en {server.base_url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,150 @@
+"""
+Utilidades comunes de la suite de benchmarks: medición, percentiles, datos del
+entorno, resultados en JSON comparables entre ejecuciones y una base de datos
+temporal para la aplicación.
+"""
+import contextlib
+import json
+import os
+import platform
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+
+# Métricas comparadas con la ejecución base y si un valor mayor es mejor.
+COMPARED_METRICS = {'p50': False, 'p95': False, 'p99': False, 'rps': True}
+
+
+def percentile(ordered, q):
+    """Percentil `q` (0-100) de una lista ordenada, con interpolación lineal."""
+    if not ordered:
+        return None
+    position = (len(ordered) - 1) * q / 100.0
+    low = int(position)
+    high = min(low + 1, len(ordered) - 1)
+    return ordered[low] + (ordered[high] - ordered[low]) * (position - low)
+
+
+def summarize(samples):
+    """Resumen en segundos de una lista de duraciones."""
+    ordered = sorted(samples)
+    return {
+        'n': len(ordered),
+        'min': ordered[0] if ordered else None,
+        'p50': percentile(ordered, 50),
+        'p95': percentile(ordered, 95),
+        'p99': percentile(ordered, 99),
+        'mean': sum(ordered) / len(ordered) if ordered else None,
+        'max': ordered[-1] if ordered else None,
+    }
+
+
+def measure(fn, repeat=5, number=1, warmup=1):
+    """
+    Ejecuta `fn()` `warmup` veces sin medir y luego `repeat` tandas de `number`
+    llamadas; retorna summarize() del tiempo por llamada de cada tanda.
+    """
+    for _ in range(warmup):
+        fn()
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(number):
+            fn()
+        samples.append((time.perf_counter() - start) / number)
+    return summarize(samples)
+
+
+@contextlib.contextmanager
+def temp_database(name='bench.db'):
+    """
+    Apunta app.DATABASE a una base `name` vacía en un directorio temporal, con las
+    tablas creadas y sin refresco en segundo plano, y retorna ese directorio. Al
+    salir escribe las consultas pendientes, cierra las conexiones y restaura la
+    configuración anterior.
+    """
+    import app  # Solo los benchmarks que usan la aplicación pagan su importación.
+
+    database, refresh = app.DATABASE, app.REFRESH_ENABLED
+    app.REFRESH_ENABLED = False
+    with tempfile.TemporaryDirectory() as tmp:
+        app.DATABASE = os.path.join(tmp, name)
+        app.close_db_pool()
+        try:
+            app.init_db()
+            yield tmp
+        finally:
+            app.query_log.flush()
+            app.close_db_pool()
+            app.DATABASE, app.REFRESH_ENABLED = database, refresh
+
+
+def git_commit():
+    try:
+        root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=root, capture_output=True,
+                              text=True, timeout=5).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def environment():
+    return {
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+        'commit': git_commit(),
+        'python': sys.version.split()[0],
+        'implementation': platform.python_implementation(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'sqlite': sqlite3.sqlite_version,
+    }
+
+
+def write_results(path, benchmarks, parameters=None):
+    with open(path, 'w') as f:
+        json.dump({'environment': environment(), 'parameters': parameters or {}, 'benchmarks': benchmarks},
+                  f, indent=2, sort_keys=True)
+
+
+def load_results(path):
+    with open(path) as f:
+        return json.load(f)
+
+
+def compare(current, baseline, threshold=0.10):
+    """
+    Compara dos dicts de benchmarks ({nombre: métricas}) y retorna filas
+    (nombre, métrica, base, actual, cambio relativo, empeora) para las métricas de
+    COMPARED_METRICS presentes en ambos. `empeora` es True si el cambio en la
+    dirección mala supera `threshold`.
+    """
+    rows = []
+    for name in sorted(set(current) & set(baseline)):
+        for metric, higher_is_better in COMPARED_METRICS.items():
+            old, new = baseline[name].get(metric), current[name].get(metric)
+            if not old or new is None:
+                continue
+            change = (new - old) / old
+            regression = (-change if higher_is_better else change) > threshold
+            rows.append((name, metric, old, new, change, regression))
+    return rows
+
+
+def format_seconds(value):
+    if value is None:
+        return '-'
+    if value < 1e-3:
+        return f'{value * 1e6:.1f}us'
+    if value < 1:
+        return f'{value * 1e3:.2f}ms'
+    return f'{value:.3f}s'
+
+
+def print_table(benchmarks):
+    for name, result in sorted(benchmarks.items()):
+        line = f"{name:<34} p50 {format_seconds(result.get('p50')):>10}  p95 {format_seconds(result.get('p95')):>10}"
+        if 'p99' in result and 'rps' in result:
+            line += f"  p99 {format_seconds(result['p99']):>10}  {result['rps']:9.1f} req/s  errores {result.get('errors', 0)}"
+        print(line)
@@ -0,0 +1,139 @@
+"""
+Generador de carga concurrente contra las rutas de Flask.
+
+Levanta la aplicación en un servidor WSGI local con hilos y benchmarks.fake_yahoo
+como Yahoo (con la latencia indicada). Luego `--threads` clientes recorren la
+mezcla de rutas durante `--duration` segundos. Reporta p50/p95/p99 y peticiones
+por segundo de cada ruta y del total.
+
+Uso (desde la raíz del repositorio):
+    python -m benchmarks.load --threads 16 --duration 10 --latency 0.05 --output load.json
+"""
+import argparse
+import threading
+import time
+
+import requests
+from werkzeug.serving import make_server
+
+import app
+from benchmarks.fake_yahoo import FakeYahoo
+from benchmarks.harness import print_table, summarize, temp_database, write_results
+
+# Nombre de cada escenario y su ruta; {ticker} y {tickers} se completan por petición.
+SCENARIOS = {
+    'index': '/',
+    'company': '/company/{ticker}',
+    'company_sorted': '/company/{ticker}?sort=close&order=DESC',
+    'company_weekly': '/company/{ticker}?range=5y&interval=1wk',
+    'indicators': '/api/indicators/{ticker}',
+    'compare': '/compare?tickers={tickers}',
+}
+
+
+def serve_app():
+    server = make_server('127.0.0.1', 0, app.app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f'http://127.0.0.1:{server.server_port}'
+
+
+def drive(base_url, scenarios, tickers, threads, duration):
+    """Ejecuta la carga y retorna {escenario: [(duración, ok), ...]} y el tiempo total."""
+    samples = {name: [] for name in scenarios}
+    lock = threading.Lock()
+    deadline = time.perf_counter() + duration
+    names = list(scenarios)
+
+    def worker(n):
+        session = requests.Session()
+        local = {name: [] for name in names}
+        i = n
+        while time.perf_counter() < deadline:
+            name = names[i % len(names)]
+            ticker = tickers[i % len(tickers)]
+            group = ','.join(tickers[(i + k) % len(tickers)] for k in range(3))
+            url = base_url + scenarios[name].format(ticker=ticker, tickers=group)
+            start = time.perf_counter()
+            try:
+                ok = session.get(url, timeout=30).status_code < 500
+            except requests.RequestException:
+                ok = False
+            local[name].append((time.perf_counter() - start, ok))
+            i += 1
+        with lock:
+            for name, values in local.items():
+                samples[name].extend(values)
+
+    workers = [threading.Thread(target=worker, args=(n,)) for n in range(threads)]
+    start = time.perf_counter()
+    for w in workers:
+        w.start()
+    for w in workers:
+        w.join()
+    return samples, time.perf_counter() - start
+
+
+def report(samples, elapsed):
+    results = {}
+    everything = []
+    for name, values in samples.items():
+        if not values:
+            continue
+        everything.extend(values)
+        summary = summarize([d for d, _ in values])
+        summary['rps'] = len(values) / elapsed
+        summary['errors'] = sum(1 for _, ok in values if not ok)
+        results[f'load.{name}'] = summary
+    if everything:
+        summary = summarize([d for d, _ in everything])
+        summary['rps'] = len(everything) / elapsed
+        summary['errors'] = sum(1 for _, ok in everything if not ok)
+        results['load.total'] = summary
+    return results
+
+
+def run(threads=8, duration=5.0, latency=0.05, tickers=10, days=2520, scenarios=None, warm=True):
+    scenarios = {name: SCENARIOS[name] for name in (scenarios or SCENARIOS)}
+    names = [f'S{n:03d}' for n in range(tickers)]
+    fake = FakeYahoo(latency=latency, points=days).start()
+    base_url = app.yahoo.base_url
+    app.yahoo.base_url = fake.base_url
+    try:
+        with temp_database('load.db'):
+            server, url = serve_app()
+            try:
+                if warm:
+                    # Con la caché caliente se mide la aplicación y no la latencia de Yahoo.
+                    session = requests.Session()
+                    for ticker in names:
+                        session.get(f'{url}/company/{ticker}?range=max', timeout=60)
+                samples, elapsed = drive(url, scenarios, names, threads, duration)
+            finally:
+                server.shutdown()
+    finally:
+        app.yahoo.base_url = base_url
+        fake.stop()
+    return report(samples, elapsed)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument('--duration', type=float, default=5.0, help="segundos de carga")
+    parser.add_argument('--latency', type=float, default=0.05, help="latencia de la Yahoo simulada")
+    parser.add_argument('--tickers', type=int, default=10)
+    parser.add_argument('--days', type=int, default=2520, help="velas por respuesta de la Yahoo simulada")
+    parser.add_argument('--scenarios', default=','.join(SCENARIOS), help="escenarios separados por comas")
+    parser.add_argument('--cold', action='store_true', help="no precargar los tickers antes de medir")
+    parser.add_argument('--output', help="archivo JSON de resultados")
+    args = parser.parse_args()
+
+    results = run(args.threads, args.duration, args.latency, args.tickers, args.days,
+                  args.scenarios.split(','), warm=not args.cold)
+    print_table(results)
+    if args.output:
+        write_results(args.output, results, vars(args))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,97 @@
+"""
+Micro-benchmarks de las etapas de una visita a /company/<ticker>: refresco
+completo e incremental (descarga contra benchmarks.fake_yahoo, parseo y
+guardado, como refresh_ticker), escritura (save_history_to_db), lectura
+(get_history_from_db / get_history_page / iter_history) y renderizado de
+plantillas.
+
+Uso (desde la raíz del repositorio):
+    python -m benchmarks.micro --repeat 5 --days 2520 --output micro.json
+"""
+import argparse
+import itertools
+
+import app
+from benchmarks.fake_yahoo import FakeYahoo
+from benchmarks.harness import measure, print_table, temp_database, write_results
+from benchmarks.synthetic import chart_payload
+from chart import HistoryColumns, parse_chart
+
+
+def delta_of(history, days=3, factor=1.001):
+    """Los últimos `days` días de `history` con el cierre multiplicado por `factor`, como una actualización incremental."""
+    tail = slice(len(history) - days, None)
+    closes = [c * factor for c in history.close[tail]]
+    return HistoryColumns(history.dates[tail], history.open[tail], history.high[tail], history.low[tail],
+                          closes, closes, history.volume[tail])
+
+
+def run(repeat=5, days=2520):
+    results = {}
+    daily = chart_payload('SYN', points=days, interval=86400, null_every=250)['chart']['result'][0]
+    minute = chart_payload('SYN', points=60 * 390, interval=60, null_every=500)['chart']['result'][0]
+    results['parse.daily'] = measure(lambda: parse_chart(daily), repeat)
+    results['parse.minute_60d'] = measure(lambda: parse_chart(minute, intraday=True), repeat)
+
+    server = FakeYahoo(points=days).start()
+    base_url = app.yahoo.base_url
+    app.yahoo.base_url = server.base_url
+    try:
+        with temp_database('micro.db'):
+
+            # _refresh es lo que ejecuta refresh_ticker sin la agrupación de llamadas simultáneas.
+            fresh = (f'R{n:05d}' for n in itertools.count())
+            results['refresh.daily_full'] = measure(lambda: app._refresh(next(fresh), '10y', '1d'), repeat)
+            app._refresh('RSYN', '10y', '1d')
+            results['refresh.daily_delta'] = measure(lambda: app._refresh('RSYN', '10y', '1d'), repeat)
+
+            history = parse_chart(daily)
+            names = (f'T{n:05d}' for n in itertools.count())
+            results['save.insert'] = measure(lambda: app.save_history_to_db(next(names), history), repeat)
+            app.save_history_to_db('SYN', history)
+            app.record_fetch('SYN', 'SYN Synthetic Inc.', covered_from='')
+            results['save.unchanged'] = measure(lambda: app.save_history_to_db('SYN', history), repeat)
+            # Se alterna entre dos versiones de los últimos días para que cada llamada modifique filas.
+            flip = itertools.cycle([delta_of(history), delta_of(history, factor=1.0)])
+            results['save.delta'] = measure(lambda: app.save_history_to_db('SYN', next(flip)), repeat)
+
+            results['query.history_date_asc'] = measure(lambda: app.get_history_from_db('SYN'), repeat)
+            results['query.history_close_desc'] = measure(
+                lambda: app.get_history_from_db('SYN', sort_column='close', order='DESC'), repeat)
+            results['query.page_close_desc'] = measure(
+                lambda: app.get_history_page('SYN', sort_column='close', order='DESC', limit=app.PAGE_SIZE), repeat)
+            results['query.iter_history_download'] = measure(lambda: list(app.iter_history('SYN')), repeat)
+
+            with app.app.test_request_context('/company/SYN'):
+                for limit in (app.PAGE_SIZE, app.MAX_PAGE_SIZE):
+                    records, next_cursor, prev_cursor = app.get_history_page('SYN', limit=limit)
+                    indicators = app.get_indicator_map('SYN', (r[0] for r in records))
+                    context = dict(ticker='SYN', company_name='SYN Synthetic Inc.', records=records,
+                                   indicators=indicators, sort='date', order='ASC', period='max', interval='1d',
+                                   ranges=list(app.RANGE_DAYS), intervals=app.DAILY_INTERVALS + app.INTRADAY_INTERVALS,
+                                   limit=limit, next_cursor=next_cursor, prev_cursor=prev_cursor, hide_nav=False)
+                    results[f'render.company_{limit}'] = measure(lambda: app.render_page('company', **context), repeat)
+
+            client = app.app.test_client()
+            results['render.index'] = measure(lambda: client.get('/').data, repeat)
+    finally:
+        app.yahoo.base_url = base_url
+        server.stop()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--days', type=int, default=2520, help="velas diarias por ticker")
+    parser.add_argument('--output', help="archivo JSON de resultados")
+    args = parser.parse_args()
+
+    results = {f'micro.{name}': value for name, value in run(args.repeat, args.days).items()}
+    print_table(results)
+    if args.output:
+        write_results(args.output, results, vars(args))
+
+
+if __name__ == '__main__':
+    main()
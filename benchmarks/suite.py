@@ -0,0 +1,57 @@
+"""
+Ejecuta la suite de benchmarks (micro-benchmarks y carga) y guarda los
+resultados en JSON junto con los datos del entorno (commit, Python, SQLite).
+
+Con --baseline compara contra una ejecución anterior y termina con código 1 si
+alguna métrica (p50/p95/p99 o req/s) empeora más que --threshold.
+
+Uso (desde la raíz del repositorio):
+    python -m benchmarks.suite --output base.json
+    python -m benchmarks.suite --output nuevo.json --baseline base.json --threshold 0.15
+"""
+import argparse
+import sys
+
+from benchmarks import load, micro
+from benchmarks.harness import compare, format_seconds, load_results, print_table, write_results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--only', choices=('micro', 'load'), help="ejecutar solo una parte de la suite")
+    parser.add_argument('--repeat', type=int, default=5, help="tandas de cada micro-benchmark")
+    parser.add_argument('--days', type=int, default=2520, help="velas diarias por ticker")
+    parser.add_argument('--threads', type=int, default=8, help="clientes concurrentes de la prueba de carga")
+    parser.add_argument('--duration', type=float, default=5.0, help="segundos de la prueba de carga")
+    parser.add_argument('--latency', type=float, default=0.05, help="latencia de la Yahoo simulada")
+    parser.add_argument('--output', default='benchmark-results.json')
+    parser.add_argument('--baseline', help="resultados anteriores con los que comparar")
+    parser.add_argument('--threshold', type=float, default=0.10, help="empeoramiento relativo tolerado")
+    args = parser.parse_args()
+
+    results = {}
+    if args.only in (None, 'micro'):
+        results.update({f'micro.{name}': value for name, value in micro.run(args.repeat, args.days).items()})
+    if args.only in (None, 'load'):
+        results.update(load.run(args.threads, args.duration, args.latency, days=args.days))
+    print_table(results)
+    write_results(args.output, results, vars(args))
+    print(f"\nResultados guardados en {args.output}")
+
+    if not args.baseline:
+        return 0
+    rows = compare(results, load_results(args.baseline)['benchmarks'], args.threshold)
+    regressions = [row for row in rows if row[5]]
+    print(f"\nComparación con {args.baseline} (umbral {args.threshold:.0%}):")
+    for name, metric, old, new, change, regression in rows:
+        if metric == 'rps':
+            values = f"{old:9.1f} -> {new:9.1f} req/s"
+        else:
+            values = f"{format_seconds(old):>10} -> {format_seconds(new):>10}"
+        print(f"{'EMPEORA' if regression else '':<8}{name:<34} {metric:<4} {values}  {change:+.1%}")
+    print(f"\n{len(regressions)} métricas empeoran más del umbral.")
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,52 @@
+"""Generador de respuestas sintéticas con el formato de /v8/finance/chart de Yahoo Finance."""
+import random
+
+NYSE_OPEN_UTC = 13 * 3600 + 30 * 60
+
+
+def chart_payload(ticker='SYN', points=252, interval=86400, start=1262304000, null_every=0, seed=0):
+    """
+    Retorna un dict como el JSON de Yahoo con `points` velas separadas `interval`
+    segundos. Con interval=86400 se omiten los fines de semana. Si `null_every` > 0,
+    una de cada `null_every` velas trae valores nulos, como ocurre en Yahoo.
+    """
+    rng = random.Random(seed)
+    timestamps, opens, highs, lows, closes, volumes = [], [], [], [], [], []
+    price = 100.0
+    ts = start + NYSE_OPEN_UTC if interval >= 86400 else start
+    while len(timestamps) < points:
+        if interval == 86400 and (ts // 86400 + 3) % 7 in (5, 6):
+            ts += interval
+            continue
+        change = rng.gauss(0, 0.01 if interval >= 86400 else 0.001)
+        open_ = price
+        price = max(0.01, price * (1 + change))
+        timestamps.append(ts)
+        opens.append(round(open_, 4))
+        closes.append(round(price, 4))
+        highs.append(round(max(open_, price) * (1 + abs(rng.gauss(0, 0.003))), 4))
+        lows.append(round(min(open_, price) * (1 - abs(rng.gauss(0, 0.003))), 4))
+        volumes.append(rng.randint(1_000_000, 50_000_000))
+        ts += interval
+
+    if null_every:
+        for i in range(null_every - 1, points, null_every):
+            opens[i] = highs[i] = lows[i] = closes[i] = volumes[i] = None
+
+    return {
+        'chart': {
+            'result': [{
+                'meta': {
+                    'symbol': ticker,
+                    'shortName': f'{ticker} Synthetic Inc.',
+                    'gmtoffset': -14400,
+                },
+                'timestamp': timestamps,
+                'indicators': {
+                    'quote': [{'open': opens, 'high': highs, 'low': lows, 'close': closes, 'volume': volumes}],
+                    'adjclose': [{'adjclose': list(closes)}],
+                },
+            }],
+            'error': None,
+        }
+    }
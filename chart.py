@@ -0,0 +1,110 @@
+import array
+import datetime
+from itertools import compress, repeat
+
+EPOCH_ORDINAL = datetime.date(1970, 1, 1).toordinal()
+PRICE_COLUMNS = ('open', 'high', 'low', 'close', 'adj_close')
+
+
+class HistoryColumns:
+    """
+    Histórico en columnas: `dates` es una lista de fechas 'YYYY-MM-DD' (o
+    'YYYY-MM-DD HH:MM' en velas intradía) y el resto son arrays tipados
+    (float64 para precios, int64 para el volumen) del mismo largo.
+    """
+
+    __slots__ = ('dates', 'open', 'high', 'low', 'close', 'adj_close', 'volume')
+
+    def __init__(self, dates=(), open=(), high=(), low=(), close=(), adj_close=(), volume=()):
+        self.dates = list(dates)
+        self.open = array.array('d', open)
+        self.high = array.array('d', high)
+        self.low = array.array('d', low)
+        self.close = array.array('d', close)
+        self.adj_close = array.array('d', adj_close)
+        self.volume = array.array('q', volume)
+
+    def __len__(self):
+        return len(self.dates)
+
+    def rows(self, ticker):
+        """Tuplas (ticker, date, open, high, low, close, adj_close, volume) para executemany."""
+        return zip(repeat(ticker), self.dates, self.open, self.high, self.low,
+                   self.close, self.adj_close, self.volume)
+
+    @classmethod
+    def from_records(cls, records):
+        records = list(records)
+        return cls(
+            [r['date'] for r in records],
+            *([r[name] for r in records] for name in PRICE_COLUMNS),
+            [r['volume'] or 0 for r in records],
+        )
+
+
+def epoch_days_to_iso(days):
+    """Convierte días desde 1970-01-01 a fechas ISO, formateando cada día distinto una sola vez."""
+    cache = {}
+    dates = []
+    append = dates.append
+    for day in days:
+        iso = cache.get(day)
+        if iso is None:
+            iso = cache[day] = datetime.date.fromordinal(EPOCH_ORDINAL + day).isoformat()
+        append(iso)
+    return dates
+
+
+def epoch_seconds_to_iso_minutes(seconds):
+    """Convierte segundos desde 1970 a 'YYYY-MM-DD HH:MM', formateando cada día distinto una sola vez."""
+    days = epoch_days_to_iso([s // 86400 for s in seconds])
+    return [
+        f'{day} {second % 86400 // 3600:02d}:{second % 3600 // 60:02d}'
+        for day, second in zip(days, seconds)
+    ]
+
+
+def parse_chart(result, intraday=False):
+    """
+    Convierte un elemento de `chart.result` de Yahoo Finance en HistoryColumns.
+
+    Las filas con open/high/low/close nulos se descartan mediante una máscara;
+    un adj_close nulo se reemplaza por el cierre y un volumen nulo por 0. Las
+    fechas se calculan en la zona horaria del mercado (`meta.gmtoffset`); con
+    `intraday` incluyen hora y minuto ('YYYY-MM-DD HH:MM').
+    """
+    timestamps = result.get('timestamp') or []
+    n = len(timestamps)
+    if not n:
+        return HistoryColumns()
+
+    indicators = result.get('indicators') or {}
+    quote = (indicators.get('quote') or [{}])[0]
+    nulls = [None] * n
+    opens = quote.get('open') or nulls
+    highs = quote.get('high') or nulls
+    lows = quote.get('low') or nulls
+    closes = quote.get('close') or nulls
+    volumes = quote.get('volume') or nulls
+    adjclose = (indicators.get('adjclose') or [{}])[0].get('adjclose')
+    if not adjclose or len(adjclose) != n:
+        adjclose = closes
+
+    mask = [
+        o is not None and h is not None and l is not None and c is not None
+        for o, h, l, c in zip(opens, highs, lows, closes)
+    ]
+    adjclose = [a if a else c for a, c in zip(adjclose, closes)]
+    volumes = [v or 0 for v in volumes]
+    if not all(mask):
+        timestamps, opens, highs, lows, closes, adjclose, volumes = (
+            list(compress(column, mask))
+            for column in (timestamps, opens, highs, lows, closes, adjclose, volumes)
+        )
+
+    offset = (result.get('meta') or {}).get('gmtoffset') or 0
+    if intraday:
+        dates = epoch_seconds_to_iso_minutes([ts + offset for ts in timestamps])
+    else:
+        dates = epoch_days_to_iso([(ts + offset) // 86400 for ts in timestamps])
+    return HistoryColumns(dates, opens, highs, lows, closes, adjclose, volumes)
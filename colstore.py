@@ -0,0 +1,256 @@
+"""
+Almacenamiento columnar del histórico diario.
+
+Cada ticker tiene un directorio con generaciones inmutables de la serie. Una
+generación es un subdirectorio con un archivo por columna: `day` (días desde
+1970-01-01, int32), open/high/low/close/adj_close (float64) y volume (int64),
+todos en el orden de bytes de la máquina, con las filas ordenadas por día. El
+archivo `current` indica la generación vigente, su número de filas y la versión
+de datos de la que se copió (la que indique quien guarda, p. ej. el
+fetches.updated_at de la tabla).
+
+Las lecturas mapean los archivos con mmap y exponen cada columna como una
+memoryview tipada, sin copiar ni crear una tupla por fila. Las escrituras nunca
+modifican una generación publicada: escriben la serie combinada en un
+directorio temporal nuevo (tempfile.mkdtemp) y la publican reemplazando
+`current` de forma atómica, así que un lector ve la generación anterior o la
+nueva, nunca una fila a medio escribir. Las escrituras de un ticker se
+serializan con un bloqueo de archivo (fcntl.flock), válido también entre
+procesos (varios workers de gunicorn o el planificador en otro proceso).
+"""
+import array
+import bisect
+import contextlib
+import datetime
+import json
+import mmap
+import os
+import shutil
+import tempfile
+import threading
+from urllib.parse import quote
+
+try:
+    import fcntl
+except ImportError:  # Windows: solo se serializan los hilos del proceso.
+    fcntl = None
+
+from chart import EPOCH_ORDINAL, PRICE_COLUMNS, epoch_days_to_iso
+
+COLUMNS = (('day', 'i'),) + tuple((name, 'd') for name in PRICE_COLUMNS) + (('volume', 'q'),)
+VALUE_COLUMNS = COLUMNS[1:]
+
+
+def iso_to_epoch_day(date):
+    return datetime.date.fromisoformat(date[:10]).toordinal() - EPOCH_ORDINAL
+
+
+class ColumnarSeries:
+    """Columnas de un ticker como memoryview de solo lectura (mapeadas o en memoria)."""
+
+    __slots__ = ('day',) + PRICE_COLUMNS + ('volume', 'version', '_buffers')
+
+    def __init__(self, columns, buffers=(), version=None):
+        for name, _ in COLUMNS:
+            setattr(self, name, columns[name])
+        # Versión de datos con la que se guardó esta serie (ver ColumnStore.save).
+        self.version = version
+        # Los mmap deben seguir abiertos mientras existan las memoryview.
+        self._buffers = buffers
+
+    def __len__(self):
+        return len(self.day)
+
+    def dates(self, start=0, stop=None):
+        return epoch_days_to_iso(self.day[start:stop])
+
+    def rows(self, indices):
+        """Tuplas (date, open, high, low, close, adj_close, volume) de las posiciones `indices`."""
+        day, o, h, l, c, a, v = (getattr(self, name) for name, _ in COLUMNS)
+        indices = list(indices)
+        dates = epoch_days_to_iso([day[i] for i in indices])
+        return [(date, o[i], h[i], l[i], c[i], a[i], v[i]) for date, i in zip(dates, indices)]
+
+
+# `base` de ColumnStore.save cuando no se comprueba la versión guardada.
+ANY_VERSION = object()
+# Intentos de lectura si la generación leída de `current` se borra antes de abrirla.
+LOAD_ATTEMPTS = 5
+
+
+class ColumnStore:
+    def __init__(self, root):
+        self.root = root
+        self._lock = threading.Lock()
+
+    def path(self, ticker):
+        return os.path.join(self.root, 't_' + quote(ticker, safe=''))
+
+    def exists(self, ticker):
+        return os.path.exists(os.path.join(self.path(ticker), 'current'))
+
+    def delete(self, ticker):
+        with self._locked(ticker) as path:
+            self._unpublish(path)
+
+    def load(self, ticker):
+        """ColumnarSeries de `ticker`, o None si no está guardado."""
+        path = self.path(ticker)
+        for _ in range(LOAD_ATTEMPTS):
+            try:
+                return self._load(path)
+            except FileNotFoundError:
+                # Una escritura publicó otra generación y borró la que se iba a abrir.
+                continue
+        return self._load(path)
+
+    def _load(self, path):
+        pointer = self._read_pointer(path)
+        if pointer is None:
+            return None
+        generation, n = os.path.join(path, pointer['generation']), pointer['rows']
+        columns, buffers = {}, []
+        for name, code in COLUMNS:
+            size = n * array.array(code).itemsize
+            if not size:
+                columns[name] = memoryview(array.array(code))
+                continue
+            with open(os.path.join(generation, name), 'rb') as f:
+                buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            buffers.append(buffer)
+            columns[name] = memoryview(buffer)[:size].cast(code)
+        return ColumnarSeries(columns, tuple(buffers), pointer['version'])
+
+    def save(self, ticker, history, version=None, base=ANY_VERSION):
+        """
+        Guarda `history` (HistoryColumns diario) con la misma semántica que un upsert:
+        los días existentes se actualizan y los nuevos se insertan, y la serie queda
+        marcada con `version`. Con `base`, solo se combina si la serie guardada tiene
+        esa versión (la copia estaba al día antes de este cambio); si no, se borra,
+        porque le faltarían cambios, y retorna None. Sin serie guardada, con `base`
+        no se hace nada. Retorna el número de filas insertadas o modificadas.
+        """
+        with self._locked(ticker) as path:
+            current = self._load(path)
+            if base is not ANY_VERSION:
+                if current is None:
+                    return None
+                if current.version != base:
+                    del current
+                    self._unpublish(path)
+                    return None
+            if not len(history):
+                return 0
+            columns, changed = self._merge(current, history)
+            del current
+            self._publish(path, columns, version)
+            return changed
+
+    def replace(self, ticker, history, version=None):
+        """Sustituye la serie de `ticker` por `history` (ordenado por fecha, sin días repetidos)."""
+        columns = {'day': array.array('i', map(iso_to_epoch_day, history.dates))}
+        for name, code in VALUE_COLUMNS:
+            columns[name] = array.array(code, getattr(history, name))
+        with self._locked(ticker) as path:
+            self._publish(path, columns, version)
+
+    @staticmethod
+    def _merge(current, history):
+        """Columnas (array) de `current` combinadas con `history` y número de filas cambiadas."""
+        incoming = sorted((iso_to_epoch_day(date), i) for i, date in enumerate(history.dates))
+        columns = {}
+        for name, code in COLUMNS:
+            columns[name] = array.array(code)
+            if current is not None:
+                columns[name].frombytes(getattr(current, name).tobytes())
+        days = columns['day']
+        n = len(days)
+        last = days[-1] if n else None
+        updates, appends = [], []
+        for day, i in incoming:
+            if last is None or day > last:
+                if appends and appends[-1][0] == day:
+                    appends[-1] = (day, i)
+                else:
+                    appends.append((day, i))
+                continue
+            position = bisect.bisect_left(days, day)
+            if position == n or days[position] != day:
+                return ColumnStore._merge_unordered(columns, incoming, history)
+            if any(columns[name][position] != getattr(history, name)[i] for name, _ in VALUE_COLUMNS):
+                updates.append((position, i))
+
+        for name, code in VALUE_COLUMNS:
+            column, source = columns[name], getattr(history, name)
+            for position, i in updates:
+                column[position] = source[i]
+            column.extend(source[i] for _, i in appends)
+        days.extend(day for day, _ in appends)
+        return columns, len(updates) + len(appends)
+
+    @staticmethod
+    def _merge_unordered(columns, incoming, history):
+        """_merge cuando llegan días intermedios o anteriores al primero que no existían."""
+        merged = {
+            day: tuple(columns[name][p] for name, _ in VALUE_COLUMNS)
+            for p, day in enumerate(columns['day'])
+        }
+        changed = 0
+        for day, i in incoming:
+            values = tuple(getattr(history, name)[i] for name, _ in VALUE_COLUMNS)
+            if merged.get(day) != values:
+                changed += 1
+            merged[day] = values
+        ordered = sorted(merged)
+        result = {'day': array.array('i', ordered)}
+        for k, (name, code) in enumerate(VALUE_COLUMNS):
+            result[name] = array.array(code, (merged[day][k] for day in ordered))
+        return result, changed
+
+    @contextlib.contextmanager
+    def _locked(self, ticker):
+        """Bloqueo de escritura de `ticker` entre hilos y, con fcntl, entre procesos; entrega su directorio."""
+        path = self.path(ticker)
+        os.makedirs(path, exist_ok=True)
+        with self._lock, open(os.path.join(path, 'lock'), 'a') as lock:
+            if fcntl is not None:
+                fcntl.flock(lock, fcntl.LOCK_EX)
+            yield path
+
+    @staticmethod
+    def _read_pointer(path):
+        try:
+            with open(os.path.join(path, 'current')) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+    def _publish(self, path, columns, version):
+        """Escribe `columns` en una generación nueva y la hace vigente; borra las anteriores."""
+        generation = tempfile.mkdtemp(prefix='g', dir=path)
+        for name, _ in COLUMNS:
+            with open(os.path.join(generation, name), 'wb') as f:
+                columns[name].tofile(f)
+        pointer = {'generation': os.path.basename(generation), 'rows': len(columns['day']), 'version': version}
+        fd, tmp = tempfile.mkstemp(prefix='current.', dir=path)
+        with os.fdopen(fd, 'w') as f:
+            json.dump(pointer, f)
+        os.replace(tmp, os.path.join(path, 'current'))
+        self._collect(path, keep=pointer['generation'])
+
+    def _unpublish(self, path):
+        with contextlib.suppress(FileNotFoundError):
+            os.remove(os.path.join(path, 'current'))
+        self._collect(path)
+
+    @staticmethod
+    def _collect(path, keep=None):
+        # Los lectores que ya mapearon una generación borrada siguen leyéndola sin problema.
+        for entry in os.listdir(path):
+            if entry not in ('lock', 'current', keep):
+                target = os.path.join(path, entry)
+                if os.path.isdir(target):
+                    shutil.rmtree(target, ignore_errors=True)
+                else:
+                    with contextlib.suppress(FileNotFoundError):
+                        os.remove(target)
@@ -0,0 +1,93 @@
+"""
+Comparación de varios tickers sobre sus cierres ajustados.
+
+`compare_series` alinea las series en las fechas comunes a todos los tickers y,
+en una sola pasada sobre los retornos diarios, acumula las sumas y productos
+cruzados con los que se obtienen la volatilidad de cada ticker y la matriz de
+correlación completa.
+"""
+import math
+
+TRADING_DAYS_PER_YEAR = 252
+
+
+def align(tickers, series):
+    """
+    `series` es {ticker: [(date, adj_close), ...]} ordenado por fecha. Retorna las
+    fechas presentes en todos los tickers y, para cada ticker, sus cierres en esas fechas.
+    """
+    common = set.intersection(*(set(date for date, _ in series[t]) for t in tickers))
+    dates = sorted(common)
+    columns = [[close for date, close in series[t] if date in common] for t in tickers]
+    return dates, columns
+
+
+def compare_series(tickers, series):
+    """
+    Retorna un dict con las fechas comunes, el rendimiento relativo de cada ticker
+    (base 100 en la primera fecha común), su retorno total, su volatilidad
+    anualizada y la matriz de correlación de Pearson de los retornos diarios.
+    Los valores que no pueden calcularse (series planas o muy cortas) son None.
+    """
+    dates, columns = align(tickers, series)
+    k, n = len(tickers), len(dates)
+    sums = [0.0] * k
+    cross = [[0.0] * k for _ in range(k)]
+    previous = [column[0] for column in columns] if n else []
+    for i in range(1, n):
+        current = [column[i] for column in columns]
+        returns = [c / p - 1.0 if p else 0.0 for c, p in zip(current, previous)]
+        for a, ra in enumerate(returns):
+            sums[a] += ra
+            row = cross[a]
+            for b in range(a, k):
+                row[b] += ra * returns[b]
+        previous = current
+
+    m = n - 1
+    covariance = [[None] * k for _ in range(k)]
+    if m >= 2:
+        for a in range(k):
+            for b in range(a, k):
+                covariance[a][b] = covariance[b][a] = (cross[a][b] - sums[a] * sums[b] / m) / (m - 1)
+
+    correlation = [[None] * k for _ in range(k)]
+    volatility = [None] * k
+    for a in range(k):
+        var_a = covariance[a][a]
+        if var_a is not None and var_a > 0:
+            volatility[a] = math.sqrt(var_a * TRADING_DAYS_PER_YEAR)
+        for b in range(k):
+            var_b = covariance[b][b]
+            if var_a and var_b and var_a > 0 and var_b > 0:
+                correlation[a][b] = max(-1.0, min(1.0, covariance[a][b] / math.sqrt(var_a * var_b)))
+
+    performance = [
+        [100.0 * close / column[0] for close in column] if n and column[0] else [None] * n
+        for column in columns
+    ]
+    return {
+        'tickers': list(tickers),
+        'dates': dates,
+        'performance': performance,
+        'total_return': [p[-1] / 100.0 - 1.0 if n and p[-1] is not None else None for p in performance],
+        'volatility': volatility,
+        'correlation': correlation,
+    }
+
+
+def reorder(result, tickers):
+    """
+    El resultado de compare_series con los tickers en el orden de `tickers`, que
+    debe contener los mismos tickers que result['tickers'].
+    """
+    index = [result['tickers'].index(t) for t in tickers]
+    correlation = result['correlation']
+    return {
+        'tickers': list(tickers),
+        'dates': result['dates'],
+        'performance': [result['performance'][i] for i in index],
+        'total_return': [result['total_return'][i] for i in index],
+        'volatility': [result['volatility'][i] for i in index],
+        'correlation': [[correlation[a][b] for b in index] for a in index],
+    }
@@ -0,0 +1,134 @@
+"""
+Codificadores en streaming para exportar filas del histórico.
+
+Todas las funciones reciben un iterable de filas
+(ticker, date, open, high, low, close, adj_close, volume) ordenadas por ticker y
+fecha, y generan bloques de bytes listos para enviarse en una respuesta por partes.
+
+Formato columnar binario ('columnar'):
+    b'FQC1'
+    por cada bloque (filas consecutivas de un mismo ticker):
+        uint16 largo del ticker, ticker en UTF-8, uint32 n
+        int32[n] fecha en días desde 1970-01-01
+        float64[n] open, high, low, close, adj_close (en ese orden)
+        int64[n] volume
+    uint16 0 como marca de fin
+Los enteros y flotantes van en little-endian.
+"""
+import array
+import bz2
+import csv
+import datetime
+import io
+import json
+import lzma
+import struct
+import sys
+import zlib
+from itertools import groupby, islice
+
+try:
+    from compression import zstd
+except ImportError:
+    zstd = None
+
+COLUMNS = ('ticker', 'date', 'open', 'high', 'low', 'close', 'adj_close', 'volume')
+ROWS_PER_CHUNK = 2000
+COLUMNAR_MAGIC = b'FQC1'
+EPOCH_ORDINAL = datetime.date(1970, 1, 1).toordinal()
+
+FORMATS = {
+    'csv': ('text/csv', 'csv'),
+    'ndjson': ('application/x-ndjson', 'ndjson'),
+    'columnar': ('application/octet-stream', 'fqc'),
+}
+
+COMPRESSIONS = {
+    'gzip': ('application/gzip', 'gz', lambda: zlib.compressobj(6, zlib.DEFLATED, 31)),
+    'deflate': ('application/zlib', 'zz', lambda: zlib.compressobj(6)),
+    'bz2': ('application/x-bzip2', 'bz2', lambda: bz2.BZ2Compressor(9)),
+    'xz': ('application/x-xz', 'xz', lambda: lzma.LZMACompressor(preset=1)),
+}
+if zstd is not None:
+    COMPRESSIONS['zstd'] = ('application/zstd', 'zst', lambda: zstd.ZstdCompressor())
+
+
+def _batches(rows, size=ROWS_PER_CHUNK):
+    rows = iter(rows)
+    while True:
+        batch = list(islice(rows, size))
+        if not batch:
+            return
+        yield batch
+
+
+def csv_chunks(rows):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator='\n')
+    writer.writerow(COLUMNS)
+    for batch in _batches(rows):
+        writer.writerows(batch)
+        yield buffer.getvalue().encode()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode()
+
+
+def ndjson_chunks(rows):
+    dumps = json.dumps
+    for batch in _batches(rows):
+        yield ''.join(
+            dumps(dict(zip(COLUMNS, row)), separators=(',', ':')) + '\n' for row in batch
+        ).encode()
+
+
+def _column(typecode, values):
+    column = array.array(typecode, values)
+    if sys.byteorder != 'little':
+        column.byteswap()
+    return column.tobytes()
+
+
+def columnar_chunks(rows):
+    yield COLUMNAR_MAGIC
+    for batch in _batches(rows):
+        parts = []
+        for ticker, group in groupby(batch, key=lambda row: row[0]):
+            group = list(group)
+            name = ticker.encode()
+            parts.append(struct.pack('<H', len(name)) + name + struct.pack('<I', len(group)))
+            _, dates, opens, highs, lows, closes, adj_closes, volumes = zip(*group)
+            parts.append(_column('i', [datetime.date.fromisoformat(d).toordinal() - EPOCH_ORDINAL for d in dates]))
+            for values in (opens, highs, lows, closes, adj_closes):
+                parts.append(_column('d', [v if v is not None else float('nan') for v in values]))
+            parts.append(_column('q', [v or 0 for v in volumes]))
+        yield b''.join(parts)
+    yield struct.pack('<H', 0)
+
+
+ENCODERS = {
+    'csv': csv_chunks,
+    'ndjson': ndjson_chunks,
+    'columnar': columnar_chunks,
+}
+
+
+def compress_chunks(chunks, compression):
+    compressor = COMPRESSIONS[compression][2]()
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def export_stream(rows, fmt, compression=None):
+    """Retorna (bloques, content_type, extensión) para el formato y compresión pedidos."""
+    content_type, extension = FORMATS[fmt]
+    chunks = ENCODERS[fmt](rows)
+    if compression:
+        content_type, suffix, _ = COMPRESSIONS[compression]
+        extension = f'{extension}.{suffix}'
+        chunks = compress_chunks(chunks, compression)
+    return chunks, content_type, extension
@@ -0,0 +1,165 @@
+"""
+Indicadores técnicos calculados sobre el cierre ajustado y el volumen.
+
+Todos los indicadores se calculan en una sola pasada con sumas y ventanas
+móviles (O(1) por vela), de modo que el cálculo puede detenerse en cualquier
+vela, guardarse con `IndicatorState.dumps()` y continuarse más tarde con las
+velas nuevas sin recorrer de nuevo la serie completa.
+"""
+import json
+import math
+from collections import deque
+
+SMA_SHORT = 20
+SMA_LONG = 50
+EMA_PERIOD = 20
+RSI_PERIOD = 14
+BOLLINGER_PERIOD = 20
+BOLLINGER_WIDTH = 2.0
+VOLATILITY_PERIOD = 20
+VOLUME_PERIOD = 20
+TRADING_DAYS_PER_YEAR = 252
+
+# Orden de los valores que retorna IndicatorState.advance() por cada vela.
+INDICATOR_COLUMNS = (
+    'sma_20', 'sma_50', 'ema_20', 'rsi_14', 'bb_upper', 'bb_lower',
+    'volatility_20', 'drawdown', 'volume_sma_20',
+)
+
+_EMA_ALPHA = 2.0 / (EMA_PERIOD + 1)
+_ANNUALIZE = math.sqrt(TRADING_DAYS_PER_YEAR)
+
+
+class IndicatorState:
+    """
+    Estado acumulado tras procesar una serie de velas: las últimas SMA_LONG
+    cotizaciones, los últimos retornos y volúmenes, la EMA, las medias de
+    Wilder del RSI y el máximo histórico para el drawdown.
+
+    Las sumas de las ventanas no se serializan: se recalculan a partir de las
+    ventanas al cargar el estado, lo que además evita que el error de redondeo
+    se acumule entre actualizaciones.
+    """
+
+    __slots__ = ('closes', 'returns', 'volumes', 'ema', 'avg_gain', 'avg_loss', 'rsi_count',
+                 'prev_close', 'peak', '_short_sum', '_short_squares', '_long_sum',
+                 '_return_sum', '_return_squares', '_volume_sum')
+
+    def __init__(self, closes=(), returns=(), volumes=(), ema=None, avg_gain=0.0, avg_loss=0.0,
+                 rsi_count=0, prev_close=None, peak=None):
+        self.closes = deque(closes, maxlen=SMA_LONG)
+        self.returns = deque(returns, maxlen=VOLATILITY_PERIOD)
+        self.volumes = deque(volumes, maxlen=VOLUME_PERIOD)
+        self.ema = ema
+        self.avg_gain = avg_gain
+        self.avg_loss = avg_loss
+        self.rsi_count = rsi_count
+        self.prev_close = prev_close
+        self.peak = peak
+        short = list(self.closes)[-SMA_SHORT:]
+        self._short_sum = math.fsum(short)
+        self._short_squares = math.fsum(x * x for x in short)
+        self._long_sum = math.fsum(self.closes)
+        self._return_sum = math.fsum(self.returns)
+        self._return_squares = math.fsum(r * r for r in self.returns)
+        self._volume_sum = sum(self.volumes)
+
+    def dumps(self):
+        return json.dumps({
+            'closes': list(self.closes), 'returns': list(self.returns), 'volumes': list(self.volumes),
+            'ema': self.ema, 'avg_gain': self.avg_gain, 'avg_loss': self.avg_loss,
+            'rsi_count': self.rsi_count, 'prev_close': self.prev_close, 'peak': self.peak,
+        })
+
+    @classmethod
+    def loads(cls, text):
+        return cls(**json.loads(text))
+
+    def advance(self, closes, volumes):
+        """
+        Procesa las velas siguientes (cierres ajustados y volúmenes en orden de fecha)
+        y retorna, por cada una, una tupla con los valores de INDICATOR_COLUMNS.
+        Los indicadores que aún no tienen velas suficientes valen None.
+        """
+        window, returns, volume_window = self.closes, self.returns, self.volumes
+        short_sum, short_squares, long_sum = self._short_sum, self._short_squares, self._long_sum
+        return_sum, return_squares, volume_sum = self._return_sum, self._return_squares, self._volume_sum
+        ema, avg_gain, avg_loss, rsi_count = self.ema, self.avg_gain, self.avg_loss, self.rsi_count
+        prev, peak = self.prev_close, self.peak
+        log = math.log
+        sqrt = math.sqrt
+        out = []
+        append = out.append
+
+        for close, volume in zip(closes, volumes):
+            n = len(window)
+            if n >= SMA_SHORT:
+                leaving = window[-SMA_SHORT]
+                short_sum -= leaving
+                short_squares -= leaving * leaving
+            if n == SMA_LONG:
+                long_sum -= window[0]
+            window.append(close)
+            short_sum += close
+            short_squares += close * close
+            long_sum += close
+            n = len(window)
+
+            if len(volume_window) == VOLUME_PERIOD:
+                volume_sum -= volume_window[0]
+            volume_window.append(volume)
+            volume_sum += volume
+
+            sma_short = bb_upper = bb_lower = None
+            if n >= SMA_SHORT:
+                sma_short = short_sum / SMA_SHORT
+                deviation = sqrt(max(short_squares / SMA_SHORT - sma_short * sma_short, 0.0))
+                bb_upper = sma_short + BOLLINGER_WIDTH * deviation
+                bb_lower = sma_short - BOLLINGER_WIDTH * deviation
+                ema = sma_short if ema is None else ema + _EMA_ALPHA * (close - ema)
+            sma_long = long_sum / SMA_LONG if n == SMA_LONG else None
+
+            rsi = volatility = None
+            if prev is not None:
+                change = close - prev
+                gain = change if change > 0 else 0.0
+                loss = -change if change < 0 else 0.0
+                if rsi_count < RSI_PERIOD:
+                    avg_gain += gain
+                    avg_loss += loss
+                    rsi_count += 1
+                    if rsi_count == RSI_PERIOD:
+                        avg_gain /= RSI_PERIOD
+                        avg_loss /= RSI_PERIOD
+                else:
+                    avg_gain = (avg_gain * (RSI_PERIOD - 1) + gain) / RSI_PERIOD
+                    avg_loss = (avg_loss * (RSI_PERIOD - 1) + loss) / RSI_PERIOD
+                if rsi_count == RSI_PERIOD:
+                    rsi = 100.0 if avg_loss == 0 else 100.0 - 100.0 / (1.0 + avg_gain / avg_loss)
+
+                if prev > 0 and close > 0:
+                    if len(returns) == VOLATILITY_PERIOD:
+                        leaving = returns[0]
+                        return_sum -= leaving
+                        return_squares -= leaving * leaving
+                    r = log(close / prev)
+                    returns.append(r)
+                    return_sum += r
+                    return_squares += r * r
+                    if len(returns) == VOLATILITY_PERIOD:
+                        variance = (return_squares - return_sum * return_sum / VOLATILITY_PERIOD) / (VOLATILITY_PERIOD - 1)
+                        volatility = sqrt(max(variance, 0.0)) * _ANNUALIZE
+
+            if peak is None or close > peak:
+                peak = close
+            drawdown = close / peak - 1.0 if peak > 0 else None
+            prev = close
+
+            append((sma_short, sma_long, ema if n >= SMA_SHORT else None, rsi, bb_upper, bb_lower,
+                    volatility, drawdown, volume_sum / VOLUME_PERIOD if len(volume_window) == VOLUME_PERIOD else None))
+
+        self._short_sum, self._short_squares, self._long_sum = short_sum, short_squares, long_sum
+        self._return_sum, self._return_squares, self._volume_sum = return_sum, return_squares, volume_sum
+        self.ema, self.avg_gain, self.avg_loss, self.rsi_count = ema, avg_gain, avg_loss, rsi_count
+        self.prev_close, self.peak = prev, peak
+        return out
@@ -0,0 +1,131 @@
+import itertools
+import logging
+import queue
+import threading
+import time
+
+from upstream import TokenBucket
+
+logger = logging.getLogger(__name__)
+
+
+class RefreshScheduler:
+    """
+    Refresca tickers en segundo plano antes de que los pidan los usuarios.
+
+    Un hilo planificador llama a `candidates()` cada `interval` segundos; debe
+    retornar pares (ticker, prioridad) y los de mayor prioridad se encolan primero
+    en una cola acotada. Un grupo de `workers` hilos consume la cola y llama a
+    `refresh(ticker)`, sin superar `budget_per_minute` descargas por minuto.
+    """
+
+    def __init__(self, refresh, candidates, workers=2, queue_size=32, interval=60, budget_per_minute=30):
+        self.refresh = refresh
+        self.candidates = candidates
+        self.workers = workers
+        self.interval = interval
+        self.budget = TokenBucket(budget_per_minute / 60.0, max(1, budget_per_minute))
+        self._queue = queue.PriorityQueue(maxsize=queue_size)
+        self._queued = set()
+        self._in_progress = set()
+        self._last_refresh = {}
+        self._lock = threading.Lock()
+        self._seq = itertools.count()
+        self._stop = threading.Event()
+        self._threads = []
+        # Serializa start() y stop(): varias peticiones pueden arrancar el planificador a la vez.
+        self._lifecycle = threading.Lock()
+
+    @property
+    def running(self):
+        return any(t.is_alive() for t in self._threads)
+
+    def start(self):
+        """Arranca los hilos; no hace nada si ya están en marcha, aunque se llame desde varios hilos a la vez."""
+        with self._lifecycle:
+            if self.running:
+                return
+            self._stop.clear()
+            threads = [threading.Thread(target=self._plan_loop, name='refresh-planner', daemon=True)]
+            threads += [
+                threading.Thread(target=self._work_loop, name=f'refresh-worker-{n}', daemon=True)
+                for n in range(self.workers)
+            ]
+            for thread in threads:
+                thread.start()
+            self._threads = threads
+
+    def stop(self, timeout=5):
+        with self._lifecycle:
+            self._stop.set()
+            for thread in self._threads:
+                thread.join(timeout)
+            self._threads = []
+
+    def enqueue(self, ticker, priority=0.0):
+        """Encola un ticker; retorna False si ya estaba pendiente o la cola está llena."""
+        with self._lock:
+            if ticker in self._queued or ticker in self._in_progress:
+                return False
+            try:
+                self._queue.put_nowait((-priority, next(self._seq), ticker))
+            except queue.Full:
+                return False
+            self._queued.add(ticker)
+            return True
+
+    def plan(self):
+        for ticker, priority in self.candidates():
+            if self._queue.full():
+                break
+            self.enqueue(ticker, priority)
+
+    def _plan_loop(self):
+        while not self._stop.is_set():
+            try:
+                self.plan()
+            except Exception:
+                logger.exception("Error al planificar la actualización en segundo plano")
+            self._stop.wait(self.interval)
+
+    def _work_loop(self):
+        while not self._stop.is_set():
+            try:
+                _, _, ticker = self._queue.get(timeout=0.5)
+            except queue.Empty:
+                continue
+            acquired = False
+            try:
+                while not self.budget.try_acquire():
+                    if self._stop.wait(self.budget.wait_time()):
+                        return
+                acquired = True
+            finally:
+                # Si se detiene esperando presupuesto el ticker se descarta y puede volver a encolarse.
+                with self._lock:
+                    self._queued.discard(ticker)
+                    if acquired:
+                        self._in_progress.add(ticker)
+            error = None
+            try:
+                self.refresh(ticker)
+            except Exception as exc:
+                error = str(exc)
+                logger.exception("Error al refrescar %s en segundo plano", ticker)
+            finally:
+                with self._lock:
+                    self._in_progress.discard(ticker)
+                    self._last_refresh[ticker] = {'at': time.time(), 'error': error}
+
+    def status(self):
+        with self._lock:
+            return {
+                'running': self.running,
+                'workers': self.workers,
+                'queue_depth': self._queue.qsize(),
+                'queue_capacity': self._queue.maxsize,
+                'queued': sorted(self._queued),
+                'in_progress': sorted(self._in_progress),
+                'budget_available': round(self.budget.available(), 2),
+                'last_refresh': dict(self._last_refresh),
+            }
@@ -0,0 +1,79 @@
+import threading
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.callbacks = []
+
+
+class SingleFlight:
+    """
+    Agrupa llamadas concurrentes con la misma clave: solo la primera (líder)
+    ejecuta la función y las demás esperan y reciben su mismo resultado o excepción.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+        self.leaders = 0
+        self.coalesced = 0
+
+    def do(self, key, fn, *args, **kwargs):
+        call, leader = self.join(key)
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            result = fn(*args, **kwargs)
+        except BaseException as exc:
+            self.finish(key, call, error=exc)
+            raise
+        self.finish(key, call, result)
+        return result
+
+    def join(self, key, on_done=None):
+        """
+        do() en dos pasos, para quien no puede bloquear su hilo mientras espera
+        (el event loop de asgi.py). Retorna (call, leader): el líder hace el trabajo
+        y lo entrega con finish(); los demás leen call.result o call.error cuando
+        call.done está activo, momento en que se llama a on_done(call) desde el
+        hilo del líder.
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            if call is None:
+                call = self._calls[key] = _Call()
+                self.leaders += 1
+                return call, True
+            self.coalesced += 1
+            if on_done is not None:
+                call.callbacks.append(on_done)
+            return call, False
+
+    def finish(self, key, call, result=None, error=None):
+        """Entrega el resultado (o la excepción `error`) del líder de `key` a quienes esperan."""
+        with self._lock:
+            del self._calls[key]
+            call.result, call.error = result, error
+            callbacks, call.callbacks = call.callbacks, []
+        call.done.set()
+        for on_done in callbacks:
+            on_done(call)
+
+    def in_flight(self):
+        with self._lock:
+            return len(self._calls)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'leaders': self.leaders,
+                'coalesced': self.coalesced,
+                'in_flight': len(self._calls),
+            }
@@ -0,0 +1,39 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import app as finquery  # noqa: E402
+from benchmarks.synthetic import chart_payload  # noqa: E402
+from chart import parse_chart  # noqa: E402
+
+
+@pytest.fixture
+def app(tmp_path):
+    """La aplicación con una base de datos vacía en `tmp_path` y sin tareas en segundo plano."""
+    database, backend = finquery.DATABASE, finquery.HISTORY_BACKEND
+    finquery.REFRESH_ENABLED = False
+    finquery.DATABASE = str(tmp_path / 'test.db')
+    finquery.close_db_pool()
+    finquery.init_db()
+    yield finquery
+    finquery.query_log.discard()
+    finquery.close_db_pool()
+    finquery.DATABASE, finquery.HISTORY_BACKEND = database, backend
+
+
+@pytest.fixture
+def seeded_ticker(app):
+    """
+    Función que guarda con save_history_to_db `points` velas diarias sintéticas de un
+    ticker (benchmarks.synthetic.chart_payload) y retorna la HistoryColumns guardada.
+    """
+    def seed(ticker, points=120, seed=0, null_every=0):
+        payload = chart_payload(ticker, points=points, seed=seed, null_every=null_every)
+        history = parse_chart(payload['chart']['result'][0])
+        app.save_history_to_db(ticker, history)
+        return history
+
+    return seed
@@ -0,0 +1,140 @@
+import asyncio
+import threading
+
+import pytest
+
+import asgi
+from benchmarks.synthetic import chart_payload
+from upstream import CircuitOpenError, UpstreamError
+
+TICKER = 'ASY'
+
+
+@pytest.fixture
+def flight(app, monkeypatch):
+    """Llamadas a Yahoo (síncronas y asíncronas) que esperan a `release` antes de responder."""
+    state = {'sync': 0, 'async': 0, 'release': threading.Event(), 'started': threading.Event()}
+    payload = chart_payload(TICKER, points=30)
+
+    def chart(ticker, params):
+        state['sync'] += 1
+        state['started'].set()
+        state['release'].wait(5)
+        return payload
+
+    async def async_chart(ticker, params):
+        state['async'] += 1
+        state['started'].set()
+        while not state['release'].is_set():
+            await asyncio.sleep(0.01)
+        return payload
+
+    monkeypatch.setattr(app.yahoo, 'chart', chart)
+    monkeypatch.setattr(asgi.async_yahoo, 'chart', async_chart)
+    return state
+
+
+def wait_coalesced(app, before):
+    for _ in range(500):
+        if app._refresh_flight.stats()['coalesced'] > before:
+            return
+        threading.Event().wait(0.01)
+    raise AssertionError("nadie se unió a la descarga en curso")
+
+
+def test_view_waits_for_async_prefetch(app, flight):
+    coalesced = app._refresh_flight.stats()['coalesced']
+    results = []
+
+    async def scenario():
+        task = asyncio.create_task(asgi.prefetch(TICKER))
+        await asyncio.to_thread(flight['started'].wait, 5)
+        view = threading.Thread(target=lambda: results.append(app.refresh_ticker(TICKER)))
+        view.start()
+        await asyncio.to_thread(wait_coalesced, app, coalesced)
+        flight['release'].set()
+        await task
+        await asyncio.to_thread(view.join, 5)
+
+    asyncio.run(scenario())
+    assert (flight['async'], flight['sync']) == (1, 0)
+    assert results == [f'{TICKER} Synthetic Inc.']
+    assert app.has_history(TICKER)
+
+
+def test_prefetch_waits_for_view(app, flight):
+    coalesced = app._refresh_flight.stats()['coalesced']
+    view = threading.Thread(target=app.refresh_ticker, args=(TICKER,))
+    view.start()
+    flight['started'].wait(5)
+
+    async def scenario():
+        task = asyncio.create_task(asgi.prefetch(TICKER))
+        await asyncio.to_thread(wait_coalesced, app, coalesced)
+        flight['release'].set()
+        await task
+
+    asyncio.run(scenario())
+    view.join(5)
+    assert (flight['async'], flight['sync']) == (0, 1)
+    assert app._refresh_flight.in_flight() == 0
+
+
+def test_cancelled_prefetch_fails_waiting_views(app, flight):
+    errors = []
+
+    def view():
+        try:
+            app.refresh_ticker(TICKER)
+        except Exception as exc:
+            errors.append(exc)
+
+    async def scenario():
+        task = asyncio.create_task(asgi.prefetch(TICKER))
+        await asyncio.to_thread(flight['started'].wait, 5)
+        coalesced = app._refresh_flight.stats()['coalesced']
+        thread = threading.Thread(target=view)
+        thread.start()
+        await asyncio.to_thread(wait_coalesced, app, coalesced)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+        await asyncio.to_thread(thread.join, 5)
+
+    asyncio.run(scenario())
+    assert [type(e).__name__ for e in errors] == ['UpstreamError']
+    assert app._refresh_flight.in_flight() == 0
+
+
+@pytest.fixture
+def failing(app, monkeypatch):
+    """Yahoo falla en el camino asíncrono con `state['error']`; el síncrono cuenta sus llamadas."""
+    state = {'sync': 0, 'error': UpstreamError("Yahoo respondió 503")}
+    monkeypatch.setattr(app, '_prefetch_failures', {})
+
+    def chart(ticker, params):
+        state['sync'] += 1
+        return chart_payload(TICKER, points=30)
+
+    async def async_chart(ticker, params):
+        raise state['error']
+
+    monkeypatch.setattr(app.yahoo, 'chart', chart)
+    monkeypatch.setattr(asgi.async_yahoo, 'chart', async_chart)
+    return state
+
+
+def test_failed_prefetch_is_not_repeated_by_the_view(app, failing):
+    asyncio.run(asgi.prefetch(TICKER))
+    with pytest.raises(UpstreamError) as error:
+        app.refresh_ticker(TICKER)
+    assert error.value is failing['error']
+    assert failing['sync'] == 0
+    assert not app.has_history(TICKER)
+
+
+def test_open_async_circuit_lets_the_view_download(app, failing):
+    failing['error'] = CircuitOpenError("Yahoo no disponible temporalmente")
+    asyncio.run(asgi.prefetch(TICKER))
+    assert app.refresh_ticker(TICKER) == f'{TICKER} Synthetic Inc.'
+    assert failing['sync'] == 1
@@ -0,0 +1,170 @@
+import datetime
+import multiprocessing
+import threading
+
+import pytest
+
+from chart import HistoryColumns
+from colstore import ColumnStore
+
+TICKER = 'COL'
+POINTS = 300
+
+
+@pytest.fixture
+def columnar(app, tmp_path, seeded_ticker):
+    """La aplicación con TICKER guardado y los dos almacenamientos disponibles."""
+    store = app.colstore
+    app.colstore = ColumnStore(str(tmp_path / 'colstore'))
+    seeded_ticker(TICKER, points=POINTS, seed=3, null_every=40)
+    yield app
+    app.colstore = store
+
+
+def ingest_more(seeded_ticker, extra=5):
+    """Los mismos días de `columnar` y `extra` más: el upsert solo cambia los nuevos."""
+    return seeded_ticker(TICKER, points=POINTS + extra, seed=3, null_every=40)
+
+
+def sql_days(app):
+    with app.get_db() as conn:
+        return conn.execute("SELECT COUNT(*) FROM history WHERE ticker = ?", (TICKER,)).fetchone()[0]
+
+
+def with_backend(app, backend, fn, *args, **kwargs):
+    app.HISTORY_BACKEND = backend
+    return fn(*args, **kwargs)
+
+
+def walk(app, sort_column, order, range_):
+    """Todas las páginas hacia delante y luego hacia atrás, como al seguir los enlaces de /company."""
+    pages, after = [], None
+    while True:
+        rows, after, before = app.get_history_page(TICKER, sort_column, order, limit=37, after=after, range_=range_)
+        pages.append(rows)
+        if after is None:
+            break
+    while before is not None:
+        rows, _, before = app.get_history_page(TICKER, sort_column, order, limit=37, before=before, range_=range_)
+        pages.append(rows)
+    return pages
+
+
+@pytest.mark.parametrize('sort_column', ['date', 'close', 'volume'])
+@pytest.mark.parametrize('order', ['ASC', 'DESC'])
+@pytest.mark.parametrize('range_', ['max', '6mo'])
+def test_company_pages_match_sqlite(columnar, sort_column, order, range_):
+    expected = with_backend(columnar, 'sqlite', walk, columnar, sort_column, order, range_)
+    assert with_backend(columnar, 'columnar', walk, columnar, sort_column, order, range_) == expected
+    assert columnar.colstore.exists(TICKER)
+
+
+@pytest.mark.parametrize('sort_column, order', [('date', 'DESC'), ('high', 'ASC')])
+def test_download_matches_sqlite(columnar, sort_column, order):
+    expected = list(with_backend(columnar, 'sqlite', columnar.iter_history, TICKER, sort_column, order, range_='1y'))
+    rows = list(with_backend(columnar, 'columnar', columnar.iter_history, TICKER, sort_column, order, range_='1y'))
+    assert rows == expected
+
+
+def test_rows_without_prices_are_not_copied(columnar):
+    with columnar.get_db(immediate=True) as conn:
+        conn.execute("INSERT INTO history (ticker, date) VALUES (?, ?)", (TICKER, '1999-01-04'))
+    columnar.HISTORY_BACKEND = 'columnar'
+    series = columnar.columnar_history(TICKER)
+    assert len(series) == POINTS - POINTS // 40
+    assert series.dates(0, 1)[0] != '1999-01-04'
+
+
+def test_build_racing_an_ingest_is_rebuilt(columnar, seeded_ticker, monkeypatch):
+    replace = columnar.colstore.replace
+
+    def ingest_then_replace(ticker, history, version):
+        # La ingesta confirma después de que la construcción leyó la tabla y antes de guardar.
+        monkeypatch.setattr(columnar.colstore, 'replace', replace)
+        ingest_more(seeded_ticker)
+        replace(ticker, history, version)
+
+    monkeypatch.setattr(columnar.colstore, 'replace', ingest_then_replace)
+    columnar.HISTORY_BACKEND = 'columnar'
+    stale = columnar.columnar_history(TICKER)
+    assert len(stale) < sql_days(columnar)
+    series = columnar.columnar_history(TICKER)
+    assert len(series) == sql_days(columnar)
+    assert series.version == columnar.get_data_version(TICKER)
+
+
+def test_ingest_keeps_the_copy_in_sync_under_any_backend(columnar, seeded_ticker, monkeypatch):
+    columnar.HISTORY_BACKEND = 'columnar'
+    columnar.columnar_history(TICKER)
+    columnar.HISTORY_BACKEND = 'sqlite'
+    ingest_more(seeded_ticker)
+
+    def no_rebuild(*args):
+        raise AssertionError("la copia debía estar al día")
+
+    monkeypatch.setattr(columnar.colstore, 'replace', no_rebuild)
+    columnar.HISTORY_BACKEND = 'columnar'
+    expected = with_backend(columnar, 'sqlite', columnar.get_history_from_db, TICKER)
+    assert with_backend(columnar, 'columnar', columnar.get_history_from_db, TICKER) == expected
+
+
+def test_stale_copy_is_dropped_by_ingest(columnar, seeded_ticker):
+    columnar.HISTORY_BACKEND = 'columnar'
+    columnar.columnar_history(TICKER)
+    # Un cambio que no pasó por la copia: la siguiente ingesta no puede combinarse con ella.
+    with columnar.get_db(immediate=True) as conn:
+        columnar._touch_data_version(conn.cursor(), TICKER)
+    ingest_more(seeded_ticker)
+    assert not columnar.colstore.exists(TICKER)
+    assert len(columnar.columnar_history(TICKER)) == sql_days(columnar)
+
+
+def constant_history(start, n, value):
+    """`n` días seguidos desde 2000-01-01 + `start` días, con precios y volumen iguales a `value`."""
+    first = datetime.date(2000, 1, 1) + datetime.timedelta(days=start)
+    dates = [(first + datetime.timedelta(days=i)).isoformat() for i in range(n)]
+    values = [float(value)] * n
+    return HistoryColumns(dates, values, values, values, values, values, [value] * n)
+
+
+def test_readers_never_see_a_partial_write(tmp_path):
+    store = ColumnStore(str(tmp_path))
+    store.save(TICKER, constant_history(0, 50, 0))
+    done, errors = threading.Event(), []
+
+    def read():
+        while not done.is_set():
+            series = store.load(TICKER)
+            closes, volumes = series.close.tolist(), series.volume.tolist()
+            if len(closes) != len(series.day) or len(set(closes)) != 1 or set(volumes) != {int(closes[0])}:
+                errors.append((len(series.day), set(closes), set(volumes)))
+
+    reader = threading.Thread(target=read)
+    reader.start()
+    try:
+        for k in range(1, 200):
+            store.save(TICKER, constant_history(0, 50 + k, k))
+    finally:
+        done.set()
+        reader.join()
+    assert errors == []
+    assert len(store.load(TICKER)) == 249
+
+
+def append_days(root, first, count):
+    store = ColumnStore(root)
+    for i in range(first, first + count):
+        store.save(TICKER, constant_history(i, 1, i))
+
+
+@pytest.mark.skipif('fork' not in multiprocessing.get_all_start_methods(), reason="requiere fork")
+def test_writers_in_several_processes_do_not_lose_days(tmp_path):
+    context = multiprocessing.get_context('fork')
+    writers = [context.Process(target=append_days, args=(str(tmp_path), n * 40, 40)) for n in range(4)]
+    for writer in writers:
+        writer.start()
+    for writer in writers:
+        writer.join(60)
+    assert [writer.exitcode for writer in writers] == [0] * 4
+    series = ColumnStore(str(tmp_path)).load(TICKER)
+    assert series.close.tolist() == [float(i) for i in range(160)]
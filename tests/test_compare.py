@@ -0,0 +1,41 @@
+import threading
+
+import pytest
+
+from compare import compare_series
+
+TICKERS = ['MSFT', 'AAPL', 'IBM']
+
+
+@pytest.fixture
+def seeded(app, seeded_ticker):
+    for n, ticker in enumerate(TICKERS):
+        seeded_ticker(ticker, seed=n)
+    app._comparisons.clear()
+    yield app
+    app._comparisons.clear()
+
+
+def test_a_full_comparison_loads_concurrently(app, monkeypatch):
+    # Cada descarga espera a las demás: solo terminan si las MAX_COMPARE_TICKERS corren a la vez.
+    barrier = threading.Barrier(app.MAX_COMPARE_TICKERS, timeout=5)
+
+    def load_ticker(ticker, range_):
+        barrier.wait()
+        return f'{ticker} Inc.'
+
+    monkeypatch.setattr(app, 'load_ticker', load_ticker)
+    tickers = [f'C{n}' for n in range(app.MAX_COMPARE_TICKERS)]
+    assert app.load_tickers(tickers) == {t: f'{t} Inc.' for t in tickers}
+
+
+def test_cache_is_shared_across_ticker_orders(seeded):
+    app = seeded
+    first = app.get_comparison(TICKERS, 'max')
+    reversed_tickers = TICKERS[::-1]
+    second = app.get_comparison(reversed_tickers, 'max')
+    assert len(app._comparisons) == 1
+
+    series = {t: app.get_close_series(t, 'max') for t in TICKERS}
+    assert first == compare_series(TICKERS, series)
+    assert second == compare_series(reversed_tickers, series)
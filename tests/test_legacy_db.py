@@ -0,0 +1,83 @@
+import datetime
+import sqlite3
+
+import pytest
+
+import app as finquery
+
+DAYS = 40
+
+
+def legacy_rows(ticker):
+    """Velas diarias de una base antigua, con días vacíos de Yahoo (todo null) y volúmenes null."""
+    base = datetime.date(2024, 1, 1)
+    rows = []
+    for i in range(DAYS):
+        date = (base + datetime.timedelta(days=i)).isoformat()
+        price = 100.0 + i
+        if i % 7 == 3:
+            rows.append((ticker, date, None, None, None, None, None, None))
+        else:
+            rows.append((ticker, date, price, price + 1, price - 1, price, price, None if i % 5 == 0 else 1000 + i))
+    return rows
+
+
+@pytest.fixture
+def legacy_db(tmp_path):
+    """Abre la aplicación sobre `create(conn)`, una base creada antes de init_db."""
+    database = finquery.DATABASE
+    finquery.REFRESH_ENABLED = False
+
+    def open_app(create):
+        finquery.DATABASE = str(tmp_path / 'legacy.db')
+        with sqlite3.connect(finquery.DATABASE) as conn:
+            create(conn)
+        conn.close()
+        finquery.close_db_pool()
+        finquery.init_db()
+        return finquery
+
+    yield open_app
+    finquery.query_log.discard()
+    finquery.close_db_pool()
+    finquery.DATABASE = database
+
+
+def test_migration_drops_empty_rows(legacy_db):
+    def create(conn):
+        conn.execute('''
+            CREATE TABLE history (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                ticker TEXT, date TEXT, open REAL, high REAL, low REAL,
+                close REAL, adj_close REAL, volume INTEGER
+            )
+        ''')
+        conn.executemany(
+            "INSERT INTO history (ticker, date, open, high, low, close, adj_close, volume) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            legacy_rows('OLD')
+        )
+
+    app = legacy_db(create)
+    with app.get_db() as conn:
+        nulls = conn.execute("SELECT COUNT(*) FROM history WHERE close IS NULL").fetchone()[0]
+        days = conn.execute("SELECT COUNT(*) FROM history WHERE ticker = 'OLD'").fetchone()[0]
+        indicators = conn.execute("SELECT COUNT(*) FROM indicators WHERE ticker = 'OLD'").fetchone()[0]
+    assert nulls == 0
+    assert days == indicators == sum(1 for row in legacy_rows('OLD') if row[5] is not None)
+
+
+def test_indicator_backfill_skips_empty_rows(legacy_db):
+    def create(conn):
+        conn.execute('''
+            CREATE TABLE history (
+                ticker TEXT NOT NULL, date TEXT NOT NULL, open REAL, high REAL, low REAL,
+                close REAL, adj_close REAL, volume INTEGER,
+                PRIMARY KEY (ticker, date)
+            ) WITHOUT ROWID
+        ''')
+        conn.executemany("INSERT INTO history VALUES (?, ?, ?, ?, ?, ?, ?, ?)", legacy_rows('NUL'))
+
+    app = legacy_db(create)
+    rows = app.get_indicators('NUL')
+    assert len(rows) == sum(1 for row in legacy_rows('NUL') if row[6] is not None)
+    assert rows[-1][1] is not None
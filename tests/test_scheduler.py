@@ -0,0 +1,52 @@
+import threading
+import time
+
+from scheduler import RefreshScheduler
+
+
+def make_scheduler(refreshed, workers=1, budget_per_minute=60):
+    return RefreshScheduler(refreshed.append, lambda: [], workers=workers, interval=3600,
+                            budget_per_minute=budget_per_minute)
+
+
+def scheduler_threads():
+    return [t for t in threading.enumerate() if t.name.startswith('refresh-') and t.is_alive()]
+
+
+def test_stop_while_waiting_for_budget_releases_ticker():
+    refreshed = []
+    scheduler = make_scheduler(refreshed, budget_per_minute=1)
+    while scheduler.budget.try_acquire():
+        pass
+    scheduler.start()
+    try:
+        assert scheduler.enqueue('WAIT')
+        for _ in range(100):
+            if not scheduler._queue.qsize():
+                break
+            time.sleep(0.01)
+    finally:
+        scheduler.stop()
+    assert refreshed == []
+    assert scheduler.status()['queued'] == []
+    assert scheduler.enqueue('WAIT')
+
+
+def test_concurrent_start_runs_one_set_of_threads():
+    scheduler = make_scheduler([], workers=3)
+    barrier = threading.Barrier(8)
+
+    def start():
+        barrier.wait()
+        scheduler.start()
+
+    starters = [threading.Thread(target=start) for _ in range(8)]
+    for thread in starters:
+        thread.start()
+    for thread in starters:
+        thread.join()
+    try:
+        assert len(scheduler_threads()) == 4
+    finally:
+        scheduler.stop()
+    assert scheduler_threads() == []
@@ -0,0 +1,23 @@
+import html
+import re
+
+import pytest
+
+
+@pytest.fixture
+def client(app, seeded_ticker):
+    for n, ticker in enumerate(['SCRA', 'SCRB']):
+        seeded_ticker(ticker, points=60, seed=n)
+    return app.app.test_client()
+
+
+@pytest.mark.parametrize('query', ['', '?preset=gainers', '?format=html&sort=volume', '?format=&order=asc'])
+def test_json_link_keeps_the_query(client, query):
+    response = client.get('/screener' + query)
+    assert response.status_code == 200
+    links = re.findall(r'href="([^"]*format=json[^"]*)"', response.get_data(as_text=True))
+    assert len(links) == 1
+    data = client.get(html.unescape(links[0])).json
+    assert data['rows']
+    if 'sort=volume' in query:
+        assert data['sort'] == 'volume'
@@ -0,0 +1,66 @@
+import threading
+import time
+
+from benchmarks.synthetic import chart_payload
+from upstream import UpstreamError
+
+HERD = 20
+
+
+def wait_for_herd(app, before, timeout=5):
+    """Bloquea al líder hasta que los demás hilos estén esperando su resultado."""
+    deadline = time.monotonic() + timeout
+    while app._refresh_flight.stats()['coalesced'] - before < HERD - 1:
+        if time.monotonic() > deadline:
+            raise AssertionError("los hilos no llegaron a agruparse")
+        time.sleep(0.001)
+
+
+def run_herd(app, monkeypatch, chart):
+    before = app._refresh_flight.stats()
+    calls = []
+
+    def stub(ticker, params):
+        calls.append(ticker)
+        wait_for_herd(app, before['coalesced'])
+        return chart(ticker, params)
+
+    monkeypatch.setattr(app.yahoo, 'chart', stub)
+    results, start = [None] * HERD, threading.Barrier(HERD)
+
+    def worker(n):
+        start.wait()
+        try:
+            results[n] = app.refresh_ticker('HERD')
+        except Exception as exc:
+            results[n] = exc
+
+    threads = [threading.Thread(target=worker, args=(n,)) for n in range(HERD)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join(10)
+    after = app._refresh_flight.stats()
+    return calls, results, after['leaders'] - before['leaders'], after['coalesced'] - before['coalesced']
+
+
+def test_thundering_herd_makes_one_fetch(app, monkeypatch):
+    calls, results, leaders, coalesced = run_herd(app, monkeypatch, lambda t, p: chart_payload(t, points=30))
+    assert calls == ['HERD']
+    assert (leaders, coalesced) == (1, HERD - 1)
+    assert results == ['HERD Synthetic Inc.'] * HERD
+    assert app.has_history('HERD', '1d')
+    assert app._refresh_flight.in_flight() == 0
+
+
+def test_leader_error_reaches_every_waiter(app, monkeypatch):
+    def fail(ticker, params):
+        raise UpstreamError("Yahoo respondió 503")
+
+    calls, results, leaders, coalesced = run_herd(app, monkeypatch, fail)
+    assert calls == ['HERD']
+    assert (leaders, coalesced) == (1, HERD - 1)
+    assert all(isinstance(r, UpstreamError) for r in results)
+    assert len({id(r) for r in results}) == 1
+    assert not app.has_history('HERD', '1d')
+    assert app._refresh_flight.in_flight() == 0
@@ -0,0 +1,201 @@
+import asyncio
+import time
+
+import pytest
+import requests
+
+from benchmarks.fake_yahoo import FakeYahoo
+from upstream import AsyncYahooClient, CircuitBreaker, CircuitOpenError, UpstreamError, YahooClient
+
+RESET = 0.05
+
+
+@pytest.fixture
+def fake():
+    server = FakeYahoo(points=5).start()
+    yield server
+    server.stop()
+
+
+def make_client(fake, retries=0, threshold=2):
+    return YahooClient(base_url=fake.base_url, retries=retries, backoff=0, rate=1000, burst=1000,
+                       breaker=CircuitBreaker(failure_threshold=threshold, reset_timeout=RESET))
+
+
+def open_circuit(client, fake):
+    fake.error_rate = 1.0
+    for _ in range(client.breaker.failure_threshold):
+        with pytest.raises(UpstreamError):
+            client.chart('AAPL', {'range': '5d'})
+    assert client.breaker.state == CircuitBreaker.OPEN
+
+
+def wait_half_open(client):
+    time.sleep(RESET * 1.5)
+    assert client.breaker.state == CircuitBreaker.HALF_OPEN
+
+
+def test_retries_then_fails(fake):
+    fake.error_rate = 1.0
+    client = make_client(fake, retries=2, threshold=5)
+    with pytest.raises(UpstreamError, match='503'):
+        client.chart('AAPL', {'range': '5d'})
+    assert fake.requests == 3
+    assert client.counters['retries'] == 2
+    assert client.counters['failures'] == 1
+    assert client.breaker.state == CircuitBreaker.CLOSED
+
+
+def test_unknown_ticker_is_not_a_failure(fake):
+    fake.unknown = {'NOPE'}
+    client = make_client(fake)
+    data = client.chart('NOPE', {'range': '5d'})
+    assert data['chart']['error']['code'] == 'Not Found'
+    assert client.counters['failures'] == 0
+
+
+def test_breaker_opens_rejects_and_recovers(fake):
+    client = make_client(fake)
+    open_circuit(client, fake)
+    requests_before = fake.requests
+    with pytest.raises(CircuitOpenError):
+        client.chart('AAPL', {'range': '5d'})
+    assert fake.requests == requests_before
+    assert client.counters['rejected'] == 1
+
+    wait_half_open(client)
+    fake.error_rate = 0.0
+    assert client.chart('AAPL', {'range': '5d'})['chart']['result']
+    assert client.breaker.state == CircuitBreaker.CLOSED
+
+
+def test_failed_probe_reopens(fake):
+    client = make_client(fake)
+    open_circuit(client, fake)
+    wait_half_open(client)
+    with pytest.raises(UpstreamError):
+        client.chart('AAPL', {'range': '5d'})
+    assert client.breaker.state == CircuitBreaker.OPEN
+
+
+@pytest.mark.parametrize('error', [requests.exceptions.ChunkedEncodingError('corte'),
+                                   requests.exceptions.TooManyRedirects('bucle'),
+                                   RuntimeError('inesperado')])
+def test_any_probe_error_reopens_instead_of_sticking(fake, monkeypatch, error):
+    client = make_client(fake)
+    open_circuit(client, fake)
+    wait_half_open(client)
+
+    def broken(*args, **kwargs):
+        raise error
+
+    monkeypatch.setattr(client.session, 'get', broken)
+    with pytest.raises(type(error) if isinstance(error, RuntimeError) else UpstreamError):
+        client.chart('AAPL', {'range': '5d'})
+    assert client.breaker.state == CircuitBreaker.OPEN
+    assert not client.breaker._probing
+
+    monkeypatch.undo()
+    fake.error_rate = 0.0
+    wait_half_open(client)
+    assert client.chart('AAPL', {'range': '5d'})['chart']['result']
+    assert client.breaker.state == CircuitBreaker.CLOSED
+
+
+def make_async_client(client):
+    return AsyncYahooClient(client, breaker=CircuitBreaker(failure_threshold=2, reset_timeout=RESET))
+
+
+def test_async_client_retries_and_recovers(fake):
+    client = make_client(fake, retries=1)
+
+    async def scenario():
+        async_client = make_async_client(client)
+        try:
+            fake.error_rate = 1.0
+            for _ in range(2):
+                with pytest.raises(UpstreamError):
+                    await async_client.chart('AAPL', {'range': '5d'})
+            assert fake.requests == 4
+            assert async_client.breaker.state == CircuitBreaker.OPEN
+            with pytest.raises(CircuitOpenError):
+                await async_client.chart('AAPL', {'range': '5d'})
+
+            await asyncio.sleep(RESET * 1.5)
+            fake.error_rate = 0.0
+            data = await async_client.chart('AAPL', {'range': '5d'})
+            assert data['chart']['result']
+            assert async_client.breaker.state == CircuitBreaker.CLOSED
+        finally:
+            await async_client.close()
+
+    asyncio.run(scenario())
+
+
+def test_async_failures_leave_the_sync_circuit_closed(fake):
+    client = make_client(fake)
+
+    async def scenario():
+        async_client = make_async_client(client)
+        fake.error_rate = 1.0
+        for _ in range(2):
+            with pytest.raises(UpstreamError):
+                await async_client.chart('AAPL', {'range': '5d'})
+        assert async_client.breaker.state == CircuitBreaker.OPEN
+        await async_client.close()
+
+    asyncio.run(scenario())
+    assert client.breaker.state == CircuitBreaker.CLOSED
+    fake.error_rate = 0.0
+    assert client.chart('AAPL', {'range': '5d'})['chart']['result']
+
+
+def test_async_client_follows_redirects_and_proxies(fake, monkeypatch):
+    client = make_client(fake)
+
+    async def chart():
+        async_client = AsyncYahooClient(client)
+        try:
+            return await async_client.chart('AAPL', {'range': '5d'})
+        finally:
+            await async_client.close()
+
+    client.base_url = fake.base_url.replace('/v8/', '/moved/v8/')
+    assert asyncio.run(chart())['chart']['result']
+    assert fake.requests == 1
+
+    # Un host que no existe: la petición solo llega si pasa por el proxy de HTTP_PROXY.
+    for name in ('NO_PROXY', 'no_proxy', 'ALL_PROXY', 'all_proxy', 'http_proxy'):
+        monkeypatch.delenv(name, raising=False)
+    host, port = fake.server_address[:2]
+    monkeypatch.setenv('HTTP_PROXY', f'http://{host}:{port}')
+    client.base_url = 'http://yahoo.invalid/v8/finance/chart/{ticker}'
+    assert asyncio.run(chart())['chart']['result']
+    assert fake.requests == 2
+
+
+def test_async_cancelled_probe_releases_breaker(fake):
+    client = make_client(fake)
+
+    async def scenario():
+        async_client = make_async_client(client)
+        fake.error_rate = 1.0
+        for _ in range(2):
+            with pytest.raises(UpstreamError):
+                await async_client.chart('AAPL', {'range': '5d'})
+        await asyncio.sleep(RESET * 1.5)
+        fake.error_rate, fake.latency = 0.0, 1.0
+        task = asyncio.create_task(async_client.chart('AAPL', {'range': '5d'}))
+        await asyncio.sleep(0.1)
+        assert async_client.breaker._probing
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+        assert not async_client.breaker._probing
+        assert async_client.breaker.state == CircuitBreaker.HALF_OPEN
+        fake.latency = 0.0
+        assert (await async_client.chart('AAPL', {'range': '5d'}))['chart']['result']
+        assert async_client.breaker.state == CircuitBreaker.CLOSED
+        await async_client.close()
+
+    asyncio.run(scenario())
@@ -0,0 +1,35 @@
+import threading
+
+from writebehind import WriteBehindCounter
+
+
+def make_counter():
+    written, done = [], threading.Event()
+
+    def write(entries):
+        written.append(entries)
+        done.set()
+
+    return WriteBehindCounter(write, interval=0.02), written, done
+
+
+def test_stop_writes_pending_hits():
+    counter, written, _ = make_counter()
+    counter.hit('A', 1)
+    counter.stop()
+    assert not counter.running
+    assert {'A': (1, 1)} in written
+
+
+def test_hits_after_stop_restart_the_writer():
+    counter, written, done = make_counter()
+    counter.hit('A', 1)
+    counter.stop()
+    done.clear()
+
+    counter.hit('B', 2)
+    assert counter.running
+    assert done.wait(2)
+    assert written[-1] == {'B': (2, 1)}
+    counter.stop()
+    assert counter.pending() == {}
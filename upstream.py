@@ -0,0 +1,319 @@
+"""
+Cliente HTTP para el endpoint de gráficos de Yahoo Finance.
+
+Reúne en un solo lugar la política de acceso a Yahoo: sesión con conexiones
+persistentes, timeouts de conexión y lectura, reintentos acotados con espera
+exponencial aleatoria ante 429/5xx, un limitador de tasa por token bucket y un
+circuit breaker que deja de llamar a Yahoo mientras falla de forma sostenida.
+AsyncYahooClient aplica la misma política con asyncio y httpx, para servir
+desde un event loop sin ocupar un hilo por cada descarga en curso.
+"""
+import asyncio
+import logging
+import random
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+
+try:
+    import httpx
+except ImportError:  # Solo lo necesita AsyncYahooClient (asgi.py).
+    httpx = None
+
+logger = logging.getLogger(__name__)
+
+YAHOO_CHART_URL = "https://query1.finance.yahoo.com/v8/finance/chart/{ticker}"
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+class UpstreamError(Exception):
+    """Yahoo no respondió correctamente tras agotar los reintentos."""
+
+
+class CircuitOpenError(UpstreamError):
+    """El circuit breaker está abierto: no se llama a Yahoo hasta que pase el tiempo de espera."""
+
+
+class TokenBucket:
+    """
+    Limitador de tasa: `rate` fichas por segundo con un máximo acumulado de `capacity`.
+    """
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def try_acquire(self, tokens=1):
+        with self._lock:
+            self._refill()
+            if self._tokens >= tokens:
+                self._tokens -= tokens
+                return True
+            return False
+
+    def acquire(self, tokens=1):
+        """Bloquea hasta obtener las fichas pedidas."""
+        while not self.try_acquire(tokens):
+            time.sleep(self.wait_time(tokens))
+
+    def wait_time(self, tokens=1):
+        with self._lock:
+            self._refill()
+            missing = tokens - self._tokens
+            return max(0.0, missing / self.rate) if self.rate else float('inf')
+
+    def available(self):
+        with self._lock:
+            self._refill()
+            return self._tokens
+
+
+class CircuitBreaker:
+    """
+    Tras `failure_threshold` fallos seguidos el circuito se abre y rechaza llamadas
+    durante `reset_timeout` segundos; luego deja pasar una llamada de prueba
+    (semiabierto) y se cierra si tiene éxito o vuelve a abrirse si falla.
+    """
+
+    CLOSED, OPEN, HALF_OPEN = 'closed', 'open', 'half_open'
+
+    def __init__(self, failure_threshold=5, reset_timeout=30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._failures = 0
+        self._opened_at = None
+        self._probing = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        with self._lock:
+            return self._state()
+
+    def _state(self):
+        if self._opened_at is None:
+            return self.CLOSED
+        if time.monotonic() - self._opened_at >= self.reset_timeout:
+            return self.HALF_OPEN
+        return self.OPEN
+
+    def allow(self):
+        with self._lock:
+            state = self._state()
+            if state == self.CLOSED:
+                return True
+            if state == self.HALF_OPEN and not self._probing:
+                self._probing = True
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._probing = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._probing or self._failures >= self.failure_threshold:
+                self._opened_at = time.monotonic()
+            self._probing = False
+
+    def release(self):
+        """Libera la llamada de prueba sin contarla como éxito ni fallo (p. ej. si se canceló)."""
+        with self._lock:
+            self._probing = False
+
+
+class YahooClient:
+    """
+    Cliente reutilizable y seguro entre hilos para /v8/finance/chart.
+
+    `chart(ticker, params)` retorna el JSON decodificado. Las respuestas 4xx
+    (salvo 429) se devuelven tal cual porque Yahoo informa los tickers
+    inexistentes con un 404 y un `chart.error`; el resto de errores se reintenta
+    y, si persiste, lanza UpstreamError.
+    """
+
+    def __init__(self, base_url=YAHOO_CHART_URL, connect_timeout=3.05, read_timeout=10.0,
+                 retries=3, backoff=0.5, max_backoff=8.0, rate=5.0, burst=10,
+                 pool_size=10, breaker=None):
+        self.base_url = base_url
+        self.timeout = (connect_timeout, read_timeout)
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.limiter = TokenBucket(rate, burst)
+        self.breaker = breaker or CircuitBreaker()
+        self.session = requests.Session()
+        self.session.headers['User-Agent'] = 'Mozilla/5.0'
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+        self._lock = threading.Lock()
+        self.counters = {'requests': 0, 'retries': 0, 'failures': 0, 'rejected': 0}
+
+    def _count(self, name):
+        with self._lock:
+            self.counters[name] += 1
+
+    def backoff_delay(self, attempt, retry_after=None):
+        if retry_after is not None:
+            return min(self.max_backoff, retry_after)
+        return random.uniform(0, min(self.max_backoff, self.backoff * 2 ** attempt))
+
+    def chart(self, ticker, params):
+        if not self.breaker.allow():
+            self._count('rejected')
+            raise CircuitOpenError(f"Yahoo no disponible temporalmente ({ticker})")
+        # Cualquier salida cierra la cuenta del circuit breaker, también la de una llamada de prueba.
+        try:
+            data = self._fetch(ticker, params)
+        except Exception:
+            self._count('failures')
+            self.breaker.record_failure()
+            raise
+        except BaseException:
+            self.breaker.release()
+            raise
+        self.breaker.record_success()
+        return data
+
+    def _fetch(self, ticker, params):
+        url = self.base_url.format(ticker=ticker)
+        error = None
+        for attempt in range(self.retries + 1):
+            if attempt:
+                self._count('retries')
+            self.limiter.acquire()
+            self._count('requests')
+            retry_after = None
+            try:
+                response = self.session.get(url, params=params, timeout=self.timeout)
+            except requests.RequestException as exc:
+                error = exc
+            else:
+                if response.status_code not in RETRY_STATUSES:
+                    try:
+                        return response.json()
+                    except ValueError:
+                        raise UpstreamError(f"Respuesta no JSON de Yahoo ({response.status_code})") from None
+                error = UpstreamError(f"Yahoo respondió {response.status_code}")
+                header = response.headers.get('Retry-After')
+                if header and header.isdigit():
+                    retry_after = float(header)
+            if attempt < self.retries:
+                logger.warning("Reintentando %s tras error: %s", ticker, error)
+                time.sleep(self.backoff_delay(attempt, retry_after))
+
+        if isinstance(error, UpstreamError):
+            raise error
+        raise UpstreamError(str(error) or type(error).__name__) from error
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self.counters)
+        stats['circuit'] = self.breaker.state
+        stats['tokens_available'] = round(self.limiter.available(), 2)
+        return stats
+
+
+class AsyncYahooClient:
+    """
+    Versión asyncio de YahooClient.chart sobre httpx.AsyncClient. Comparte con
+    `client` el limitador, los contadores, los timeouts, los reintentos y el
+    User-Agent, pero tiene su propio circuit breaker: un fallo que solo ocurre
+    en el camino asíncrono no corta también las descargas síncronas. Como
+    requests, httpx usa los proxies de HTTP_PROXY/HTTPS_PROXY/NO_PROXY y sigue
+    las redirecciones. Puede haber hasta `max_connections` descargas en curso
+    sin ocupar ningún hilo, y se conservan hasta `max_idle` conexiones libres.
+    Cada instancia debe usarse desde un único event loop.
+    """
+
+    def __init__(self, client, max_connections=256, max_idle=32, breaker=None):
+        if httpx is None:
+            raise RuntimeError("AsyncYahooClient requiere httpx (pip install httpx)")
+        self.client = client
+        self.max_connections = max_connections
+        self.max_idle = max_idle
+        self.breaker = breaker or CircuitBreaker(client.breaker.failure_threshold, client.breaker.reset_timeout)
+        self._http = None
+
+    async def chart(self, ticker, params):
+        client = self.client
+        if not self.breaker.allow():
+            client._count('rejected')
+            raise CircuitOpenError(f"Yahoo no disponible temporalmente ({ticker})")
+        try:
+            data = await self._fetch(ticker, params)
+        except Exception:
+            client._count('failures')
+            self.breaker.record_failure()
+            raise
+        except BaseException:
+            # asyncio.CancelledError: la petición se abandonó, Yahoo no falló.
+            self.breaker.release()
+            raise
+        self.breaker.record_success()
+        return data
+
+    def _session(self):
+        if self._http is None:
+            connect, read = self.client.timeout
+            self._http = httpx.AsyncClient(
+                headers={'User-Agent': self.client.session.headers['User-Agent']},
+                # Sin límite de espera por una conexión libre: las descargas hacen cola.
+                timeout=httpx.Timeout(read, connect=connect, pool=None),
+                limits=httpx.Limits(max_connections=self.max_connections, max_keepalive_connections=self.max_idle),
+                follow_redirects=True,
+            )
+        return self._http
+
+    async def _fetch(self, ticker, params):
+        client = self.client
+        url = client.base_url.format(ticker=ticker)
+        error = None
+        for attempt in range(client.retries + 1):
+            if attempt:
+                client._count('retries')
+            while not client.limiter.try_acquire():
+                await asyncio.sleep(client.limiter.wait_time())
+            client._count('requests')
+            retry_after = None
+            try:
+                response = await self._session().get(url, params=params)
+            except httpx.HTTPError as exc:
+                error = exc
+            else:
+                if response.status_code not in RETRY_STATUSES:
+                    try:
+                        return response.json()
+                    except ValueError:
+                        raise UpstreamError(f"Respuesta no JSON de Yahoo ({response.status_code})") from None
+                error = UpstreamError(f"Yahoo respondió {response.status_code}")
+                header = response.headers.get('Retry-After')
+                if header and header.isdigit():
+                    retry_after = float(header)
+            if attempt < client.retries:
+                logger.warning("Reintentando %s tras error: %s", ticker, error)
+                await asyncio.sleep(client.backoff_delay(attempt, retry_after))
+
+        if isinstance(error, UpstreamError):
+            raise error
+        raise UpstreamError(str(error) or type(error).__name__) from error
+
+    async def close(self):
+        if self._http is not None:
+            http, self._http = self._http, None
+            await http.aclose()
@@ -0,0 +1,115 @@
+"""
+Búfer de escritura diferida (write-behind) para contadores por clave.
+
+Cada `hit(key, at)` solo actualiza un diccionario en memoria: las visitas
+repetidas a la misma clave se combinan en (último momento, número de visitas).
+Un hilo escribe el lote acumulado cada `interval` segundos, o antes si hay
+`max_pending` claves pendientes, llamando a `write(entries)`. `stop()` hace una
+última escritura; la siguiente visita vuelve a arrancar el hilo.
+"""
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+
+class WriteBehindCounter:
+    def __init__(self, write, interval=2.0, max_pending=100):
+        self.write = write
+        self.interval = interval
+        self.max_pending = max_pending
+        self._pending = {}
+        self._lock = threading.Lock()
+        # Serializa las escrituras con discard() para que un lote ya retirado del
+        # búfer no se escriba después de borrar sus claves.
+        self._flush_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+        self.counters = {'hits': 0, 'flushes': 0, 'flushed_keys': 0, 'errors': 0}
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self):
+        with self._lock:
+            if self.running:
+                return
+            # Cada hilo tiene su propio evento de parada: un start() justo después de
+            # stop() no puede reactivar el hilo que se está deteniendo.
+            self._stop = threading.Event()
+            self._thread = threading.Thread(target=self._loop, args=(self._stop,), name='write-behind',
+                                            daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout=5):
+        with self._lock:
+            thread, stop, self._thread = self._thread, self._stop, None
+        stop.set()
+        self._wake.set()
+        if thread is not None:
+            thread.join(timeout)
+        self.flush()
+
+    def hit(self, key, at):
+        """Registra una visita a `key` en el momento `at` (cualquier valor comparable)."""
+        if not self.running:
+            self.start()
+        with self._lock:
+            entry = self._pending.get(key)
+            self._pending[key] = (at, 1) if entry is None else (max(entry[0], at), entry[1] + 1)
+            self.counters['hits'] += 1
+            full = len(self._pending) >= self.max_pending
+        if full:
+            self._wake.set()
+
+    def pending(self):
+        """Copia de las visitas aún no escritas: {clave: (último momento, visitas)}."""
+        with self._lock:
+            return dict(self._pending)
+
+    def discard(self, key=None):
+        """Descarta las visitas pendientes de `key` (o todas), esperando a la escritura en curso."""
+        with self._flush_lock, self._lock:
+            if key is None:
+                self._pending.clear()
+            else:
+                self._pending.pop(key, None)
+
+    def flush(self):
+        """Escribe las visitas pendientes; si la escritura falla vuelven al búfer."""
+        with self._flush_lock:
+            with self._lock:
+                entries, self._pending = self._pending, {}
+            if not entries:
+                return 0
+            try:
+                self.write(entries)
+            except Exception:
+                with self._lock:
+                    self.counters['errors'] += 1
+                    for key, (at, count) in entries.items():
+                        entry = self._pending.get(key)
+                        self._pending[key] = (at, count) if entry is None else (max(entry[0], at), entry[1] + count)
+                raise
+            with self._lock:
+                self.counters['flushes'] += 1
+                self.counters['flushed_keys'] += len(entries)
+            return len(entries)
+
+    def _loop(self, stop):
+        while not stop.is_set():
+            self._wake.wait(self.interval)
+            self._wake.clear()
+            try:
+                self.flush()
+            except Exception:
+                logger.exception("Error al escribir el búfer diferido")
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self.counters)
+            stats['pending'] = len(self._pending)
+        stats['running'] = self.running
+        return stats